@@ -0,0 +1,128 @@
+"""
+Usage: python -m benchmarks [OPTIONS]
+
+Generates a synthetic library and times the hot paths against it,
+writing the results as JSON.
+
+    --count=N           Number of comics to generate (default 20).
+    --pages=N           Pages per comic (default 20).
+    --size=WxH          Page image size (default 1200x1800).
+    --formats=LIST      Comma separated, any of cbz, cbr and folder
+                        (default cbz).  CBR needs the rar executable.
+    --compression=TYPE  stored or deflated, for cbz (default stored).
+    --tags=LIST         Tags already in the comics; comma separated, any
+                        of cix, cbi and comet, or none (default cix).
+    --repeat=N          Times to run each benchmark (default 3).
+    --only=LIST         Only run these benchmarks: construct, pages,
+                        read_cix, write_cix, export, hash,
+                        parse_filename, cix_roundtrip and cli.
+    --library=DIR       Generate the library in DIR and keep it; an
+                        existing library in DIR is used as is.
+-o, --output=FILE       Write the results to FILE instead of stdout.
+-h, --help              Display this message.
+"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import getopt
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from .bench import BenchmarkContext, report, run_benchmarks
+from .library import LibrarySpec, generate_library
+
+
+def usage_and_quit(msg=None):
+    if msg is not None:
+        print(msg, file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(2 if msg is not None else 0)
+
+
+def main():
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:],
+            "ho:",
+            ["help", "count=", "pages=", "size=", "formats=", "compression=", "tags=", "repeat=", "only=", "library=", "output="],
+        )
+    except getopt.GetoptError as err:
+        usage_and_quit(str(err))
+
+    spec = LibrarySpec()
+    repeat = 3
+    only = None
+    library_dir = None
+    output = None
+    try:
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                usage_and_quit()
+            if o == "--count":
+                spec.count = int(a)
+            if o == "--pages":
+                spec.pages = int(a)
+            if o == "--size":
+                spec.width, spec.height = [int(x) for x in a.lower().split("x")]
+            if o == "--formats":
+                spec.formats = a.split(",")
+            if o == "--compression":
+                spec.compression = a
+            if o == "--tags":
+                spec.tags = [] if a == "none" else a.split(",")
+            if o == "--repeat":
+                repeat = int(a)
+            if o == "--only":
+                only = a.split(",")
+            if o == "--library":
+                library_dir = a
+            if o in ("-o", "--output"):
+                output = a
+    except ValueError as e:
+        usage_and_quit("Invalid value: {0}".format(e))
+
+    if not set(spec.formats) <= {"cbz", "cbr", "folder"}:
+        usage_and_quit("Unknown format in {0}".format(",".join(spec.formats)))
+    if spec.compression not in ["stored", "deflated"]:
+        usage_and_quit("Unknown compression {0}".format(spec.compression))
+
+    scratch = tempfile.mkdtemp(prefix="ctbench")
+    try:
+        library = spec.asDict()
+        if library_dir is not None and os.path.isdir(library_dir) and os.listdir(library_dir):
+            paths = sorted(os.path.join(library_dir, name) for name in os.listdir(library_dir))
+            library = {"path": os.path.abspath(library_dir)}
+        else:
+            paths, skipped = generate_library(library_dir or os.path.join(scratch, "library"), spec)
+            library["skipped_formats"] = skipped
+        library["files"] = len(paths)
+
+        ctx = BenchmarkContext(paths, scratch, repeat)
+        results = report(run_benchmarks(ctx, only), library)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+main()
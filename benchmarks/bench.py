@@ -0,0 +1,306 @@
+"""Times the hot paths against a generated library"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+from comicapi.comicarchive import ComicArchive, FolderArchiver
+from comicapi.comicinfoxml import ComicInfoXml
+from comicapi.filenameparser import FileNameParser
+from comictaggerlib import ctversion
+from comictaggerlib.imagehasher import ImageHasher
+from comictaggerlib.settings import ComicTaggerSettings
+
+from .library import find_rar, library_format
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BenchmarkContext:
+
+    """The library under test, plus a scratch folder for anything that writes"""
+
+    def __init__(self, paths, scratch, repeat=3):
+        self.paths = paths
+        self.scratch = scratch
+        self.repeat = repeat
+        self.rar_exe = find_rar()
+        self.default_image = ComicTaggerSettings.getGraphic("nocover.png")
+
+    def pathsFor(self, fmt):
+        return [p for p in self.paths if library_format(p) == fmt]
+
+    def formats(self):
+        return sorted(set(library_format(p) for p in self.paths))
+
+    def openArchive(self, path):
+        ca = ComicArchive(path, self.rar_exe, self.default_image)
+        if os.path.isdir(path):
+            # ComicArchive doesn't pick the folder archiver by itself
+            ca.archive_type = ComicArchive.ArchiveType.Folder
+            ca.archiver = FolderArchiver(path)
+        return ca
+
+    def copyLibrary(self, name, paths):
+        """A writable copy of paths, in a scratch folder of its own"""
+        folder = os.path.join(self.scratch, name)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+        copies = []
+        for path in paths:
+            copy = os.path.join(folder, os.path.basename(path))
+            if os.path.isdir(path):
+                shutil.copytree(path, copy)
+            else:
+                shutil.copyfile(path, copy)
+            copies.append(copy)
+        return copies
+
+
+def measure(name, fmt, items, repeat, run, setup=None):
+    """
+    Calls setup() (untimed) and then run(state) repeat times, and returns
+    the timings; items is how many things each run() goes through.
+    """
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+
+    return {
+        "name": name,
+        "format": fmt,
+        "items": items,
+        "repeat": repeat,
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "per_item": min(times) / items if items else None,
+    }
+
+
+def bench_construct(ctx):
+    results = []
+    for fmt in ctx.formats():
+        if fmt == "folder":
+            continue
+        paths = ctx.pathsFor(fmt)
+
+        def run(state):
+            for path in paths:
+                ComicArchive(path, ctx.rar_exe, ctx.default_image)
+
+        # start from an empty type cache, like a fresh run would
+        results.append(measure("ComicArchive", fmt, len(paths), ctx.repeat, run, ComicArchive._sniffArchiveType.cache_clear))
+    return results
+
+
+def bench_page_list(ctx):
+    results = []
+    for fmt in ctx.formats():
+        paths = ctx.pathsFor(fmt)
+
+        def run(archives):
+            for ca in archives:
+                ca.getPageNameList()
+
+        results.append(measure("getPageNameList", fmt, len(paths), ctx.repeat, run, lambda: [ctx.openArchive(p) for p in paths]))
+    return results
+
+
+def bench_read_cix(ctx):
+    results = []
+    for fmt in ctx.formats():
+        paths = ctx.pathsFor(fmt)
+
+        def run(archives):
+            for ca in archives:
+                ca.readCIX()
+
+        results.append(measure("readCIX", fmt, len(paths), ctx.repeat, run, lambda: [ctx.openArchive(p) for p in paths]))
+    return results
+
+
+def bench_write_cix(ctx):
+    results = []
+    for fmt in ctx.formats():
+        if fmt == "cbr" and ctx.rar_exe is None:
+            continue
+        paths = ctx.copyLibrary("write_cix", ctx.pathsFor(fmt))
+
+        def setup():
+            archives = [ctx.openArchive(p) for p in paths]
+            return [(ca, ca.readCIX()) for ca in archives]
+
+        def run(state):
+            for ca, md in state:
+                ca.writeCIX(md)
+
+        results.append(measure("writeCIX", fmt, len(paths), ctx.repeat, run, setup))
+    return results
+
+
+def bench_export(ctx):
+    results = []
+    for fmt in ctx.formats():
+        # a zip has nothing to export
+        if fmt == "cbz":
+            continue
+        paths = ctx.pathsFor(fmt)
+        out = os.path.join(ctx.scratch, "export")
+
+        def setup():
+            shutil.rmtree(out, ignore_errors=True)
+            os.makedirs(out)
+            return [ctx.openArchive(p) for p in paths]
+
+        def run(archives):
+            for ca in archives:
+                ca.exportAsZip(os.path.join(out, os.path.basename(ca.path) + ".cbz"))
+
+        results.append(measure("exportAsZip", fmt, len(paths), ctx.repeat, run, setup))
+    return results
+
+
+def bench_average_hash(ctx):
+    covers = []
+    for path in ctx.paths:
+        ca = ctx.openArchive(path)
+        if ca.getNumberOfPages() > 0:
+            covers.append(ca.getPage(0))
+
+    def run(state):
+        for data in covers:
+            ImageHasher(data=data).average_hash()
+
+    return [measure("ImageHasher.average_hash", None, len(covers), ctx.repeat, run)]
+
+
+def bench_parse_filename(ctx, loops=100):
+    names = [os.path.basename(p) for p in ctx.paths] * loops
+
+    def run(state):
+        for name in names:
+            FileNameParser().parseFilename(name)
+
+    return [measure("FileNameParser.parseFilename", None, len(names), ctx.repeat, run)]
+
+
+def bench_cix_roundtrip(ctx, loops=10):
+    metadata = [ctx.openArchive(p).readCIX() for p in ctx.paths] * loops
+
+    def run(state):
+        for md in metadata:
+            ComicInfoXml().metadataFromString(ComicInfoXml().stringFromMetadata(md))
+
+    return [measure("ComicInfoXml round-trip", None, len(metadata), ctx.repeat, run)]
+
+
+class CliFailed(Exception):
+    pass
+
+
+def run_cli(ctx, args):
+    env = dict(os.environ)
+    # keep the settings and caches away from the user's own
+    home = os.path.join(ctx.scratch, "home")
+    os.makedirs(home, exist_ok=True)
+    env["HOME"] = home
+    env["APPDATA"] = home
+    proc = subprocess.run(
+        [sys.executable, os.path.join(repo_dir, "comictagger.py")] + args,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    if proc.returncode != 0:
+        lines = proc.stdout.decode("utf-8", "replace").strip().splitlines()
+        raise CliFailed("exited with {0}: {1}".format(proc.returncode, lines[-1] if lines else ""))
+
+
+def measure_cli(ctx, name, items, args, setup=None):
+    """
+    Times the CLI run with args(state); a run that fails is recorded as
+    the benchmark's error instead of a timing.
+    """
+    try:
+        return measure(name, None, items, ctx.repeat, lambda state: run_cli(ctx, args(state)), setup)
+    except CliFailed as e:
+        print("{0} failed: {1}".format(name, e), file=sys.stderr)
+        return {"name": name, "format": None, "items": items, "repeat": ctx.repeat, "error": str(e)}
+
+
+def bench_cli(ctx):
+    # the CLI only takes files
+    paths = [p for p in ctx.paths if not os.path.isdir(p)]
+    results = [measure_cli(ctx, "cli --version", 1, lambda state: ["--version"])]
+    results.append(measure_cli(ctx, "cli -p", len(paths), lambda state: ["-p"] + paths))
+
+    # a fresh copy for every run, or every run after the first finds the
+    # tags already there and writes nothing
+    results.append(
+        measure_cli(
+            ctx,
+            "cli -s",
+            len(paths),
+            lambda copies: ["-s", "-t", "cr", "-m", "notes=benchmark run"] + copies,
+            lambda: ctx.copyLibrary("cli_save", paths),
+        )
+    )
+    return results
+
+
+benchmarks = [
+    ("construct", bench_construct),
+    ("pages", bench_page_list),
+    ("read_cix", bench_read_cix),
+    ("write_cix", bench_write_cix),
+    ("export", bench_export),
+    ("hash", bench_average_hash),
+    ("parse_filename", bench_parse_filename),
+    ("cix_roundtrip", bench_cix_roundtrip),
+    ("cli", bench_cli),
+]
+
+
+def run_benchmarks(ctx, only=None):
+    results = []
+    for name, func in benchmarks:
+        if only and name not in only:
+            continue
+        print("running", name, file=sys.stderr)
+        results.extend(func(ctx))
+    return results
+
+
+def report(results, library):
+    return {
+        "comictagger_version": ctversion.version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "library": library,
+        "results": results,
+    }
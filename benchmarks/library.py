@@ -0,0 +1,209 @@
+"""Generates synthetic comic libraries to benchmark against"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from PIL import Image, ImageDraw
+
+from comicapi.comet import CoMet
+from comicapi.comicbookinfo import ComicBookInfo
+from comicapi.comicinfoxml import ComicInfoXml
+from comicapi.genericmetadata import GenericMetadata
+
+series_names = ["Plastic Man", "The Spirit", "Blackhawk", "Doll Man", "Kid Eternity", "Uncle Sam", "Phantom Lady", "Torchy"]
+publishers = ["Quality Comics", "DC Comics", "Fawcett"]
+
+# a few ways people name their files, so the filename parser sees some variety
+name_templates = [
+    "{series} #{issue:03} ({year}).{ext}",
+    "{series} v{volume} {issue:03} ({year}) (digital).{ext}",
+    "{series} {issue} (of {count}) ({year}) [scan].{ext}",
+    "{series}_{issue:03}_({year}).{ext}",
+]
+
+
+class LibrarySpec:
+
+    """What to put in a generated library"""
+
+    def __init__(self):
+        self.count = 20
+        self.pages = 20
+        self.width = 1200
+        self.height = 1800
+        # any of cbz, cbr, folder
+        self.formats = ["cbz"]
+        # stored or deflated, for cbz; rar always uses its default method
+        self.compression = "stored"
+        # any of cix, cbi, comet
+        self.tags = ["cix"]
+        self.seed = 1
+
+    def asDict(self):
+        return dict(vars(self))
+
+
+def find_rar():
+    return shutil.which("rar")
+
+
+def make_page_images(spec, rng, count=8):
+    """A handful of JPEGs to use as pages; noise keeps them from compressing to nothing"""
+    images = []
+    for i in range(count):
+        img = Image.effect_noise((spec.width, spec.height), 40 + i * 5).convert("RGB")
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x, y = rng.randrange(spec.width), rng.randrange(spec.height)
+            color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            draw.rectangle([x, y, x + spec.width // 4, y + spec.height // 6], fill=color)
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+def make_metadata(rng, index):
+    md = GenericMetadata()
+    md.isEmpty = False
+    md.series = series_names[index % len(series_names)]
+    md.issue = str(index // len(series_names) + 1)
+    md.issueCount = 50
+    md.volume = 1 + index % 3
+    md.year = 1940 + index % 20
+    md.month = 1 + index % 12
+    md.publisher = publishers[index % len(publishers)]
+    md.title = "Story {0}".format(index)
+    md.comments = "A synthetic issue for benchmarking. " * 5
+    md.characters = ", ".join(rng.sample(["Plastic Man", "Woozy Winks", "The Spirit", "Ebony", "Commissioner Dolan"], 3))
+    md.addCredit("Jack Cole", "Writer", True)
+    md.addCredit("Jack Cole", "Penciller")
+    md.addCredit("Will Eisner", "Editor")
+    return md
+
+
+def file_name(spec, md, index):
+    ext = "cbr" if spec.formats[index % len(spec.formats)] == "cbr" else "cbz"
+    template = name_templates[index % len(name_templates)]
+    name = template.format(series=md.series, issue=int(md.issue), volume=md.volume, year=md.year, count=md.issueCount, ext=ext)
+    if spec.formats[index % len(spec.formats)] == "folder":
+        name = os.path.splitext(name)[0]
+    return name
+
+
+def tag_files(spec, md):
+    """(archive member name, data) for the tags, and the zip comment"""
+    members = []
+    comment = None
+    if "cix" in spec.tags:
+        members.append(("ComicInfo.xml", ComicInfoXml().stringFromMetadata(md).encode("utf-8")))
+    if "comet" in spec.tags:
+        members.append(("CoMet.xml", CoMet().stringFromMetadata(md).encode("utf-8")))
+    if "cbi" in spec.tags:
+        comment = ComicBookInfo().stringFromMetadata(md).encode("utf-8")
+    return members, comment
+
+
+def page_names(spec):
+    return ["page{0:03}.jpg".format(i + 1) for i in range(spec.pages)]
+
+
+def write_folder(path, spec, images, md):
+    os.makedirs(path)
+    for i, name in enumerate(page_names(spec)):
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(images[i % len(images)])
+    members, comment = tag_files(spec, md)
+    for name, data in members:
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(data)
+    if comment is not None:
+        with open(os.path.join(path, "ComicTaggerFolderComment.txt"), "wb") as f:
+            f.write(comment)
+
+
+def write_cbz(path, spec, images, md):
+    compression = zipfile.ZIP_DEFLATED if spec.compression == "deflated" else zipfile.ZIP_STORED
+    with zipfile.ZipFile(path, "w", compression=compression) as zf:
+        for i, name in enumerate(page_names(spec)):
+            zf.writestr(name, images[i % len(images)])
+        members, comment = tag_files(spec, md)
+        for name, data in members:
+            zf.writestr(name, data)
+        if comment is not None:
+            zf.comment = comment
+
+
+def write_cbr(path, spec, images, md, rar_exe):
+    work = tempfile.mkdtemp()
+    try:
+        folder = os.path.join(work, "pages")
+        write_folder(folder, spec, images, md)
+        comment_file = os.path.join(folder, "ComicTaggerFolderComment.txt")
+        args = [rar_exe, "a", "-idq", "-ep1", "-r"]
+        if os.path.exists(comment_file):
+            os.rename(comment_file, os.path.join(work, "comment.txt"))
+            args.append("-z" + os.path.join(work, "comment.txt"))
+        subprocess.run(args + [os.path.abspath(path), os.path.join(folder, "*")], check=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def generate_library(folder, spec):
+    """
+    Fills folder with spec.count comics, spread evenly over spec.formats.
+    Returns the list of paths and the formats that were skipped, e.g. cbr
+    when there's no rar executable.
+    """
+    rng = random.Random(spec.seed)
+    images = make_page_images(spec, rng)
+    rar_exe = find_rar()
+
+    skipped = []
+    if "cbr" in spec.formats and rar_exe is None:
+        print("rar not found, no CBR files will be generated", file=sys.stderr)
+        skipped.append("cbr")
+
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for index in range(spec.count):
+        fmt = spec.formats[index % len(spec.formats)]
+        if fmt in skipped:
+            continue
+        md = make_metadata(rng, index)
+        path = os.path.join(folder, file_name(spec, md, index))
+        if fmt == "folder":
+            write_folder(path, spec, images, md)
+        elif fmt == "cbr":
+            write_cbr(path, spec, images, md, rar_exe)
+        else:
+            write_cbz(path, spec, images, md)
+        paths.append(path)
+
+    return paths, skipped
+
+
+def library_format(path):
+    if os.path.isdir(path):
+        return "folder"
+    return os.path.splitext(path)[1].lower()[1:]
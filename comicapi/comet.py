@@ -36,15 +36,17 @@ class CoMet:
 
     def metadataFromString(self, string):
 
-        tree = ET.ElementTree(ET.fromstring(string))
-        return self.convertXMLToMetadata(tree)
+        parser = ET.XMLPullParser(events=("start", "end"))
+        parser.feed(string)
+        parser.close()
+        return self.convertEventsToMetadata(parser.read_events())
 
     def stringFromMetadata(self, metadata):
 
         header = '<?xml version="1.0" encoding="UTF-8"?>\n'
 
         tree = self.convertMetadataToXML(self, metadata)
-        return header + ET.tostring(tree.getroot())
+        return header + ET.tostring(tree.getroot()).decode()
 
     def indent(self, elem, level=0):
         # for making the XML output readable
@@ -157,23 +159,50 @@ class CoMet:
         return tree
 
     def convertXMLToMetadata(self, tree):
-
-        root = tree.getroot()
-
-        if root.tag != "comet":
-            raise 1
-            return None
+        return self.metadataFromString(ET.tostring(tree.getroot()))
+
+    # CoMet credit elements, and the role they're read in as
+    credit_roles = {
+        "writer": "Writer",
+        "penciller": "Penciller",
+        "inker": "Inker",
+        "colorist": "Colorist",
+        "letterer": "Letterer",
+        "editor": "Editor",
+        "coverDesigner": "Cover",
+    }
+
+    def convertEventsToMetadata(self, events):
+        """
+        Fills in the metadata in one walk over the (start, end) parser
+        events.  For a field that appears more than once, the first one
+        wins; characters and credits are read in document order.
+        """
+
+        values = dict()
+        char_list = []
+        credits = []
+        depth = 0
+        for event, node in events:
+            if event == "start":
+                depth += 1
+                if depth == 1 and node.tag != "comet":
+                    raise ValueError("Not CoMet XML: root element is " + node.tag)
+            else:
+                depth -= 1
+                if depth == 1:
+                    if node.tag not in values:
+                        values[node.tag] = node.text
+                    if node.text is not None:
+                        if node.tag == "character":
+                            char_list.append(node.text.strip())
+                        elif node.tag in self.credit_roles:
+                            credits.append((node.text.strip(), self.credit_roles[node.tag]))
 
         metadata = GenericMetadata()
         md = metadata
 
-        # Helper function
-        def xlate(tag):
-            node = root.find(tag)
-            if node is not None:
-                return node.text
-            else:
-                return None
+        xlate = values.get
 
         md.series = xlate("series")
         md.title = xlate("title")
@@ -206,20 +235,10 @@ class CoMet:
         if readingDirection is not None and readingDirection == "rtl":
             md.manga = "YesAndRightToLeft"
 
-        # loop for character tags
-        char_list = []
-        for n in root:
-            if n.tag == "character":
-                char_list.append(n.text.strip())
         md.characters = utils.listToString(char_list)
 
-        # Now extract the credit info
-        for n in root:
-            if n.tag == "writer" or n.tag == "penciller" or n.tag == "inker" or n.tag == "colorist" or n.tag == "letterer" or n.tag == "editor":
-                metadata.addCredit(n.text.strip(), n.tag.title())
-
-            if n.tag == "coverDesigner":
-                metadata.addCredit(n.text.strip(), "Cover")
+        for name, role in credits:
+            metadata.addCredit(name, role)
 
         metadata.isEmpty = False
 
@@ -227,15 +246,8 @@ class CoMet:
 
     # verify that the string actually contains CoMet data in XML format
     def validateString(self, string):
-        try:
-            tree = ET.ElementTree(ET.fromstring(string))
-            root = tree.getroot()
-            if root.tag != "comet":
-                raise Exception
-        except:
-            return False
-
-        return True
+        # the root element is enough to tell, so don't parse the rest
+        return utils.xml_root_tag(string) == "comet"
 
     def writeToExternalFile(self, filename, metadata):
 
@@ -245,5 +257,4 @@ class CoMet:
 
     def readFromExternalFile(self, filename):
 
-        tree = ET.parse(filename)
-        return self.convertXMLToMetadata(tree)
+        return self.convertEventsToMetadata(ET.iterparse(filename, events=("start", "end")))
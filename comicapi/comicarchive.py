@@ -20,20 +20,29 @@ try:
 except ImportError:
     pil_available = False
 
+import collections
+import functools
 import io
+import json
 import os
 import platform
+import re
+import stat
 import struct
 import subprocess
 import sys
 import tempfile
+import threading
 import time
+import xml.etree.ElementTree as ET
 import zipfile
 
 import natsort
 
 from unrar.cffi import rarfile
+from unrar.cffi.unrarlib import BadRarFile, RarArchive
 
+from . import stats, utils
 from .comet import CoMet
 from .comicbookinfo import ComicBookInfo
 from .comicinfoxml import ComicInfoXml
@@ -42,6 +51,9 @@ from .genericmetadata import GenericMetadata, PageType
 
 sys.path.insert(0, os.path.abspath("."))
 
+# RAR file header flag: the member's data depends on the members before it
+RHDF_SOLID = 0x10
+
 
 class MetaDataStyle:
     CBI = 0
@@ -69,6 +81,7 @@ class ZipArchiver:
         zf.close()
         return True
 
+    @stats.timing("zip.read")
     def readArchiveFile(self, archive_file):
         data = ""
         zf = zipfile.ZipFile(self.path, "r")
@@ -87,6 +100,17 @@ class ZipArchiver:
             zf.close()
         return data
 
+    @stats.timing("zip.read_head")
+    def readArchiveFileHead(self, archive_file, size):
+        """The first size bytes of the file, without inflating the rest of it"""
+        try:
+            with zipfile.ZipFile(self.path, "r") as zf, zf.open(archive_file) as f:
+                return f.read(size)
+        except Exception as e:
+            print("bad zipfile [{0}]: {1} :: {2}".format(e, self.path, archive_file), file=sys.stderr)
+            raise IOError
+
+    @stats.timing("zip.remove")
     def removeArchiveFile(self, archive_file):
         try:
             self.rebuildZipFile([archive_file])
@@ -95,6 +119,7 @@ class ZipArchiver:
         else:
             return True
 
+    @stats.timing("zip.write")
     def writeArchiveFile(self, archive_file, data):
         #  At the moment, no other option but to rebuild the whole
         #  zip archive w/o the indicated file. Very sucky, but maybe
@@ -110,6 +135,7 @@ class ZipArchiver:
         except:
             return False
 
+    @stats.timing("zip.list")
     def getArchiveFilenameList(self):
         try:
             zf = zipfile.ZipFile(self.path, "r")
@@ -156,68 +182,98 @@ class ZipArchiver:
         see: http://en.wikipedia.org/wiki/Zip_(file_format)#Structure
         """
 
-        # get file size
-        statinfo = os.stat(filename)
-        file_length = statinfo.st_size
+        if isinstance(comment, str):
+            comment = comment.encode("utf-8")
 
         try:
-            fo = open(filename, "r+b")
-
-            # the starting position, relative to EOF
-            pos = -4
-
-            found = False
-            value = bytearray()
-
-            # walk backwards to find the "End of Central Directory" record
-            while (not found) and (-pos != file_length):
-                # seek, relative to EOF
-                fo.seek(pos, 2)
-
-                value = fo.read(4)
-
-                # look for the end of central directory signature
-                if bytearray(value) == bytearray([0x50, 0x4B, 0x05, 0x06]):
-                    found = True
-                else:
-                    # not found, step back another byte
-                    pos = pos - 1
-                # print pos,"{1} int: {0:x}".format(bytearray(value)[0], value)
-
-            if found:
-
-                # now skip forward 20 bytes to the comment length word
-                pos += 20
-                fo.seek(pos, 2)
-
-                # Pack the length of the comment string
-                format = "H"  # one 2-byte integer
-                comment_length = struct.pack(format, len(comment))  # pack integer in a binary string
-
-                # write out the length
-                fo.write(comment_length)
-                fo.seek(pos + 2, 2)
-
-                # write out the comment itself
-                fo.write(bytes(comment))
+            with open(filename, "r+b") as fo:
+                eocd_pos = self.findEndOfCentralDirectory(fo)
+                if eocd_pos is None:
+                    raise Exception("Failed to write comment to zip file!")
+
+                # skip forward 20 bytes to the comment length word, and write
+                # out the length followed by the comment itself
+                fo.seek(eocd_pos + 20)
+                fo.write(struct.pack("<H", len(comment)) + bytes(comment))
                 fo.truncate()
-                fo.close()
-            else:
-                raise Exception("Failed to write comment to zip file!")
         except Exception as e:
             return False
         else:
             return True
 
+    def findEndOfCentralDirectory(self, fo):
+        """
+        Returns the file offset of the "End of Central Directory" record, or
+        None if there isn't one.
+
+        The record is 22 bytes plus a comment of at most 64K, so it has to be
+        in the tail of the file; read that in once and search it backwards.
+        A candidate is accepted when its comment length runs exactly to the
+        end of the file, and, if it has ZIP64 placeholder values, when it is
+        preceded by a ZIP64 end of central directory locator.
+        """
+
+        eocd_sig = b"PK\x05\x06"
+        zip64_locator_sig = b"PK\x06\x07"
+        zip64_locator_size = 20
+
+        fo.seek(0, 2)
+        file_length = fo.tell()
+        tail_start = max(0, file_length - (22 + 65535 + zip64_locator_size))
+        fo.seek(tail_start)
+        tail = fo.read()
+
+        fallback = None
+        pos = tail.rfind(eocd_sig)
+        while pos != -1:
+            if pos + 22 <= len(tail):
+                entries, cd_size, cd_offset, comment_length = struct.unpack("<HLLH", tail[pos + 10 : pos + 22])
+
+                is_zip64 = entries == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF
+                locator_pos = pos - zip64_locator_size
+                if not is_zip64 or (locator_pos >= 0 and tail[locator_pos : locator_pos + 4] == zip64_locator_sig):
+                    if pos + 22 + comment_length == len(tail):
+                        return tail_start + pos
+                    # trailing junk after the comment; like the old byte-by-byte
+                    # search, settle for the last record if nothing better turns up
+                    if fallback is None and pos + 22 + comment_length < len(tail):
+                        fallback = tail_start + pos
+
+            pos = tail.rfind(eocd_sig, 0, pos)
+
+        return fallback
+
+    @stats.timing("zip.export")
     def copyFromArchive(self, otherArchive):
         """Replace the current zip with one copied from another archive"""
 
+        def zipInfoFor(filename, file_size, date_time=None):
+            if date_time is None:
+                date_time = time.localtime(time.time())[:6]
+            zinfo = zipfile.ZipInfo(filename, date_time=date_time)
+            zinfo.file_size = file_size
+            # stored, as before; the images are already compressed anyway
+            zinfo.compress_type = zipfile.ZIP_STORED
+            return zinfo
+
         try:
             zout = zipfile.ZipFile(self.path, "w", allowZip64=True)
-            for fname in otherArchive.getArchiveFilenameList():
-                data = otherArchive.readArchiveFile(fname)
-                if data is not None:
-                    zout.writestr(fname, data)
+            if isinstance(otherArchive, RarArchiver):
+                # stream every member straight from the decompressor into the
+                # zip, in one pass over the RAR
+
+                def openMember(rarinfo):
+                    if rarinfo.file_size == 0:
+                        return None
+                    zinfo = zipInfoFor(rarinfo.filename, rarinfo.file_size, rarinfo.date_time)
+                    return zout.open(zinfo, "w", force_zip64=rarinfo.file_size > zipfile.ZIP64_LIMIT)
+
+                otherArchive.extractArchiveFiles(openMember)
+            else:
+                for fname in otherArchive.getArchiveFilenameList():
+                    data = otherArchive.readArchiveFile(fname)
+                    if data is not None:
+                        zout.writestr(zipInfoFor(fname, len(data)), data)
             zout.close()
 
             # preserve the old comment
@@ -237,9 +293,29 @@ class RarArchiver:
 
     devnull = None
 
+    # Reads that fail with an OS error (e.g. on a flaky network share) are
+    # retried, waiting retry_delay seconds at first and doubling up to
+    # retry_delay_max.  Set max_tries to 1 to turn retrying off.
+    max_tries = 4
+    retry_delay = 0.25
+    retry_delay_max = 2.0
+
+    # In a solid archive, every member has to be decompressed to get to the
+    # ones after it, so when the members are being read in order, up to this
+    # many of the following ones (and this many bytes) are kept as well
+    solid_read_ahead = 8
+    solid_read_ahead_bytes = 32 * 1024 * 1024
+
     def __init__(self, path, rar_exe_path):
         self.path = path
         self.rar_exe_path = rar_exe_path
+        self.rarc = None
+        self.rarc_key = None
+        self.rarc_solid = None
+        # the read-ahead is shared by whichever threads read this archive
+        self.read_ahead_cache = collections.OrderedDict()
+        self.read_ahead_lock = threading.Lock()
+        self.last_read = None
 
         if RarArchiver.devnull is None:
             RarArchiver.devnull = open(os.devnull, "w")
@@ -280,52 +356,125 @@ class RarArchiver:
                 return False
             else:
                 return True
+            finally:
+                self.resetCache()
         else:
             return False
 
+    @stats.timing("rar.read")
     def readArchiveFile(self, archive_file):
-        entries = []
-
-        rarc = self.getRARObj()
+        try:
+            # this comes first, as it drops the read-ahead if the file has changed
+            rarc = self.getRARObj()
+            with self.read_ahead_lock:
+                data = self.read_ahead_cache.pop(archive_file, None)
+                if data is None:
+                    # out of order; what was read ahead won't be wanted
+                    self.read_ahead_cache.clear()
+                sequential = self.last_read is not None
+                last_read = self.last_read
+                self.last_read = archive_file
+            if data is not None:
+                stats.count("rar.read_ahead_hit")
+                return data
+
+            names = [archive_file]
+            if self.isSolid():
+                # grab the next few members while the decompressor is there
+                # anyway, if the member before this one was the last read
+                member_list = [info.filename for info in rarc.infolist() if info.file_size != 0]
+                if archive_file in member_list:
+                    idx = member_list.index(archive_file)
+                    if sequential and idx > 0 and member_list[idx - 1] == last_read:
+                        names.extend(member_list[idx + 1 : idx + 1 + self.solid_read_ahead])
+
+            entries = self.readArchiveFiles(names)
+        except (OSError, IOError, KeyError) as e:
+            print("readArchiveFile(): [{0}]  {1}:{2}".format(str(e), self.path, archive_file), file=sys.stderr)
+            raise IOError
+        except Exception as e:
+            print("Unexpected exception in readArchiveFile(): [{0}] for {1}:{2}".format(str(e), self.path, archive_file), file=sys.stderr)
+            raise IOError
 
-        tries = 0
-        while tries < 7:
-            try:
-                tries = tries + 1
-                data = rarc.open(archive_file).read()
-                entries = [(rarc.getinfo(archive_file), data)]
-
-                if entries[0][0].file_size != len(entries[0][1]):
-                    print(
-                        "readArchiveFile(): [file is not expected size: {0} vs {1}]  {2}:{3} [attempt # {4}]".format(
-                            entries[0][0].file_size, len(entries[0][1]), self.path, archive_file, tries
-                        ),
-                        file=sys.stderr,
-                    )
+        with self.read_ahead_lock:
+            total = 0
+            for name in names[1:]:
+                if name not in entries:
                     continue
+                total += len(entries[name])
+                if total > self.solid_read_ahead_bytes:
+                    break
+                self.read_ahead_cache[name] = entries[name]
 
-            except (OSError, IOError) as e:
-                print("readArchiveFile(): [{0}]  {1}:{2} attempt#{3}".format(str(e), self.path, archive_file, tries), file=sys.stderr)
-                time.sleep(1)
-            except Exception as e:
-                print(
-                    "Unexpected exception in readArchiveFile(): [{0}] for {1}:{2} attempt#{3}".format(str(e), self.path, archive_file, tries),
-                    file=sys.stderr,
-                )
-                break
+        return entries[archive_file]
 
-            else:
-                # Success"
-                # entries is a list of of tuples:  ( rarinfo, filedata)
-                if tries > 1:
-                    print("Attempted read_files() {0} times".format(tries), file=sys.stderr)
-                if len(entries) == 1:
-                    return entries[0][1]
-                else:
-                    raise IOError
+    def dropReadAhead(self):
+        with self.read_ahead_lock:
+            self.read_ahead_cache.clear()
+            self.last_read = None
+
+    def readArchiveFileHead(self, archive_file, size):
+        # unrar can't stop partway through a member, so this is no cheaper
+        return self.readArchiveFile(archive_file)[:size]
+
+    def readArchiveFiles(self, archive_files):
+        """Reads several members in one pass over the archive
+
+        Returns a dict of name -> data.  For a solid archive this costs one
+        decompression run instead of one per member.
+        """
+
+        rarc = self.getRARObj()
+        wanted = set(archive_files)
 
-        raise IOError
+        def read():
+            entries = dict()
+            try:
+                with RarArchive.open_for_processing(self.path) as rar:
+                    for header in rar.iterate_headers():
+                        name = header.FileNameW
+                        if name in wanted and name not in entries:
+                            chunks = []
+                            header.test(chunks.append)
+                            entries[name] = b"".join(chunks)
+                            if len(entries) == len(wanted):
+                                break
+                        else:
+                            header.skip()
+            except BadRarFile as e:
+                raise IOError(str(e))
+
+            for name, data in entries.items():
+                if rarc.getinfo(name).file_size != len(data):
+                    raise IOError("file is not expected size: {0} vs {1} for {2}".format(rarc.getinfo(name).file_size, len(data), name))
+            if len(entries) != len(wanted):
+                raise KeyError("not in archive: {0}".format(", ".join(sorted(wanted - set(entries)))))
+            return entries
+
+        return self.retry(read, "readArchiveFiles")
+
+    def extractArchiveFiles(self, open_func):
+        """Decompresses every member in one sequential pass
+
+        open_func(rarinfo) is called for each member, and should return a
+        writable file-like object (or None to skip the member).  The member's
+        data is written to it chunk by chunk as it comes out of the
+        decompressor, and then it's closed.
+        """
 
+        rarc = self.getRARObj()
+        with RarArchive.open_for_processing(self.path) as rar:
+            for header in rar.iterate_headers():
+                out = open_func(rarc.getinfo(header.FileNameW))
+                if out is None:
+                    header.skip()
+                    continue
+                try:
+                    header.test(out.write)
+                finally:
+                    out.close()
+
+    @stats.timing("rar.write")
     def writeArchiveFile(self, archive_file, data):
 
         if self.rar_exe_path is not None:
@@ -359,9 +508,12 @@ class RarArchiver:
                 return False
             else:
                 return True
+            finally:
+                self.resetCache()
         else:
             return False
 
+    @stats.timing("rar.remove")
     def removeArchiveFile(self, archive_file):
         if self.rar_exe_path is not None:
             try:
@@ -380,46 +532,60 @@ class RarArchiver:
                 return False
             else:
                 return True
+            finally:
+                self.resetCache()
         else:
             return False
 
+    @stats.timing("rar.list")
     def getArchiveFilenameList(self):
         rarc = self.getRARObj()
-        tries = 0
-        while tries < 7:
-            try:
-                tries = tries + 1
-                namelist = []
-                for item in rarc.infolist():
-                    if item.file_size != 0:
-                        namelist.append(item.filename)
+        namelist = []
+        for item in rarc.infolist():
+            if item.file_size != 0:
+                namelist.append(item.filename)
 
-            except (OSError, IOError) as e:
-                print("getArchiveFilenameList(): [{0}] {1} attempt#{2}".format(str(e), self.path, tries), file=sys.stderr)
-                time.sleep(1)
+        return namelist
 
-            else:
-                # Success"
-                return namelist
-
-        raise e
+    def isSolid(self):
+        rarc = self.getRARObj()
+        if self.rarc_solid is None:
+            self.rarc_solid = any(item.flag_bits & RHDF_SOLID for item in rarc.infolist())
+        return self.rarc_solid
 
     def getRARObj(self):
-        tries = 0
-        while tries < 7:
-            try:
-                tries = tries + 1
-                rarc = rarfile.RarFile(self.path)
+        """Returns a RarFile for the archive, reusing the last one as long as
+        the file hasn't changed on disk"""
 
-            except (OSError, IOError) as e:
-                print("getRARObj(): [{0}] {1} attempt#{2}".format(str(e), self.path, tries), file=sys.stderr)
-                time.sleep(1)
+        st = self.retry(lambda: os.stat(self.path), "getRARObj")
+        key = (self.path, st.st_size, st.st_mtime_ns)
+        if self.rarc is None or self.rarc_key != key:
+            self.dropReadAhead()
+            self.rarc = self.retry(lambda: rarfile.RarFile(self.path), "getRARObj")
+            self.rarc_key = key
+            self.rarc_solid = None
 
-            else:
-                # Success"
-                return rarc
+        return self.rarc
 
-        raise e
+    def resetCache(self):
+        self.rarc = None
+        self.rarc_key = None
+        self.rarc_solid = None
+        self.dropReadAhead()
+
+    def retry(self, func, desc):
+        delay = self.retry_delay
+        tries = 0
+        while True:
+            tries += 1
+            try:
+                return func()
+            except (OSError, IOError) as e:
+                print("{0}(): [{1}] {2} attempt#{3}".format(desc, str(e), self.path, tries), file=sys.stderr)
+                if tries >= self.max_tries:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_delay_max)
 
 
 class FolderArchiver:
@@ -436,6 +602,7 @@ class FolderArchiver:
     def setArchiveComment(self, comment):
         return self.writeArchiveFile(self.comment_file_name, comment)
 
+    @stats.timing("folder.read")
     def readArchiveFile(self, archive_file):
 
         data = ""
@@ -449,6 +616,19 @@ class FolderArchiver:
 
         return data
 
+    def readArchiveFileHead(self, archive_file, size):
+
+        data = ""
+        fname = os.path.join(self.path, archive_file)
+        try:
+            with open(fname, "rb") as f:
+                data = f.read(size)
+        except IOError:
+            pass
+
+        return data
+
+    @stats.timing("folder.write")
     def writeArchiveFile(self, archive_file, data):
 
         fname = os.path.join(self.path, archive_file)
@@ -461,6 +641,7 @@ class FolderArchiver:
         else:
             return True
 
+    @stats.timing("folder.remove")
     def removeArchiveFile(self, archive_file):
 
         fname = os.path.join(self.path, archive_file)
@@ -471,6 +652,7 @@ class FolderArchiver:
         else:
             return True
 
+    @stats.timing("folder.list")
     def getArchiveFilenameList(self):
         return self.listFiles(self.path)
 
@@ -502,6 +684,9 @@ class UnknownArchiver:
     def readArchiveFile(self):
         return ""
 
+    def readArchiveFileHead(self, archive_file, size):
+        return ""
+
     def writeArchiveFile(self, archive_file, data):
         return False
 
@@ -516,7 +701,13 @@ class ComicArchive:
     logo_data = None
 
     class ArchiveType:
-        Zip, Rar, Folder, Pdf, Unknown = list(range(5))
+        Zip, Rar, Folder, Pdf, Unknown, SevenZip = list(range(6))
+
+    # How much of each end of the file sniffArchiveType() looks at.  The tail
+    # covers the largest possible zip comment plus the end of central
+    # directory record, so zips with data prepended are still recognized.
+    sniff_head_size = 4096
+    sniff_tail_size = 65535 + 22
 
     def __init__(self, path, rar_exe_path=None, default_image_path=None):
         self.path = path
@@ -527,31 +718,16 @@ class ComicArchive:
         self.resetCache()
         self.default_image_path = default_image_path
 
-        # Use file extension to decide which archive test we do first
-        ext = os.path.splitext(path)[1].lower()
-
-        self.archive_type = self.ArchiveType.Unknown
-        self.archiver = UnknownArchiver(self.path)
+        self.archive_type = self.sniffArchiveType(self.path)
 
-        if ext == ".cbr" or ext == ".rar":
-            if self.rarTest():
-                self.archive_type = self.ArchiveType.Rar
-                self.archiver = RarArchiver(self.path, rar_exe_path=self.rar_exe_path)
-
-            elif self.zipTest():
-                self.archive_type = self.ArchiveType.Zip
-                self.archiver = ZipArchiver(self.path)
+        # there are no archivers for PDF or 7z, so those are only classified
+        if self.archive_type == self.ArchiveType.Zip:
+            self.archiver = ZipArchiver(self.path)
+        elif self.archive_type == self.ArchiveType.Rar:
+            self.archiver = RarArchiver(self.path, rar_exe_path=self.rar_exe_path)
         else:
-            if self.zipTest():
-                self.archive_type = self.ArchiveType.Zip
-                self.archiver = ZipArchiver(self.path)
-
-            elif self.rarTest():
-                self.archive_type = self.ArchiveType.Rar
-                self.archiver = RarArchiver(self.path, rar_exe_path=self.rar_exe_path)
-            elif os.path.basename(self.path)[-3:] == "pdf":
-                self.archive_type = self.ArchiveType.Pdf
-                self.archiver = PdfArchiver(self.path)
+            self.archive_type = self.ArchiveType.Unknown
+            self.archiver = UnknownArchiver(self.path)
 
         if ComicArchive.logo_data is None:
             # fname = ComicTaggerSettings.getGraphic('nocover.png')
@@ -559,6 +735,63 @@ class ComicArchive:
             with open(fname, "rb") as fd:
                 ComicArchive.logo_data = fd.read()
 
+    @staticmethod
+    def sniffArchiveType(path):
+        """Classify a file by its magic bytes, with one open and at most two reads
+
+        Results are cached by path, and invalidated when the file's size or
+        modification time changes.
+        """
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            return ComicArchive.ArchiveType.Unknown
+
+        if stat.S_ISDIR(st.st_mode):
+            return ComicArchive.ArchiveType.Unknown
+
+        return ComicArchive._sniffArchiveType(path, st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _sniffArchiveType(path, size, mtime):
+        try:
+            with open(path, "rb") as f:
+                head = f.read(ComicArchive.sniff_head_size)
+
+                if head.startswith(b"PK\x03\x04") or head.startswith(b"PK\x05\x06"):
+                    return ComicArchive.ArchiveType.Zip
+                # RAR4 is "Rar!\x1a\x07\x00", RAR5 is "Rar!\x1a\x07\x01\x00"
+                if head.startswith(b"Rar!\x1a\x07\x00") or head.startswith(b"Rar!\x1a\x07\x01\x00"):
+                    return ComicArchive.ArchiveType.Rar
+                if head.startswith(b"%PDF"):
+                    return ComicArchive.ArchiveType.Pdf
+                if head.startswith(b"7z\xbc\xaf\x27\x1c"):
+                    return ComicArchive.ArchiveType.SevenZip
+
+                # zip with something prepended (e.g. self-extracting); look
+                # for the "End of Central Directory" record at the end
+                start = max(size - ComicArchive.sniff_tail_size, len(head))
+                f.seek(start)
+                tail = f.read()
+                if start == len(head):
+                    tail = head + tail
+        except (OSError, IOError):
+            return ComicArchive.ArchiveType.Unknown
+
+        pos = tail.rfind(b"PK\x05\x06")
+        while pos != -1:
+            # the record and its comment have to run exactly to the end of the
+            # file, or any stray signature in the data would count
+            if pos + 22 <= len(tail):
+                (comment_length,) = struct.unpack("<H", tail[pos + 20 : pos + 22])
+                if pos + 22 + comment_length == len(tail):
+                    return ComicArchive.ArchiveType.Zip
+            pos = tail.rfind(b"PK\x05\x06", 0, pos)
+
+        return ComicArchive.ArchiveType.Unknown
+
     def resetCache(self):
         """Clears the cached data"""
 
@@ -566,12 +799,19 @@ class ComicArchive:
         self.has_cbi = None
         self.has_comet = None
         self.comet_filename = None
+        self.xml_roots = None
         self.page_count = None
         self.page_list = None
         self.cix_md = None
         self.cbi_md = None
         self.comet_md = None
 
+    def dropReadAhead(self):
+        """Frees any members read ahead of the last one read"""
+
+        if self.isRar():
+            self.archiver.dropReadAhead()
+
     def loadCache(self, style_list):
         for style in style_list:
             self.readMetadata(style)
@@ -644,6 +884,80 @@ class ComicArchive:
         else:
             return GenericMetadata()
 
+    def tagString(self, metadata, style):
+        """Fills in the archive info in metadata, and returns it as it would be written in style"""
+
+        if style == MetaDataStyle.CIX:
+            self.applyArchiveInfoToMetadata(metadata, calc_page_sizes=True)
+            return ComicInfoXml().stringFromMetadata(metadata)
+        elif style == MetaDataStyle.CBI:
+            self.applyArchiveInfoToMetadata(metadata)
+            return ComicBookInfo().stringFromMetadata(metadata)
+        elif style == MetaDataStyle.COMET:
+            self.applyArchiveInfoToMetadata(metadata)
+            # Set the coverImage value, if it's not the first page
+            cover_idx = int(metadata.getCoverPageIndexList()[0])
+            if cover_idx != 0:
+                metadata.coverImage = self.getPageName(cover_idx)
+            return CoMet().stringFromMetadata(metadata)
+        return None
+
+    def tagsUnchanged(self, metadata, style):
+        """
+        True if writing metadata in style would leave the tags as they are.
+
+        The XML tags are compared canonicalized with empty elements
+        dropped, and CBI without its lastModified stamp; the date and
+        version in the Comic Vine import note are ignored.  Like a write,
+        this fills in the archive info in metadata.
+        """
+
+        if not self.hasMetadata(style):
+            return False
+
+        new_string = self.tagString(metadata, style)
+        if style == MetaDataStyle.CIX:
+            old_string = self.readRawCIX()
+        elif style == MetaDataStyle.CBI:
+            old_string = self.readRawCBI()
+        else:
+            old_string = self.readRawCoMet()
+
+        if style == MetaDataStyle.CBI:
+            old, new = self.cbiPayload(old_string), self.cbiPayload(new_string)
+        else:
+            old, new = self.canonicalXML(old_string), self.canonicalXML(new_string)
+        return old is not None and old == new
+
+    # the note a Comic Vine import leaves; the version and date change on every run
+    cv_note_pattern = re.compile(r"Tagged with ComicTagger \S+ using info from Comic Vine on [\d-]+ [\d:]+\.")
+
+    @staticmethod
+    def canonicalXML(xml_data):
+        # a field read back as empty is written as an empty element, so
+        # tags from other writers only compare equal without them
+        try:
+            root = ET.fromstring(xml_data)
+            ComicArchive.dropEmptyElements(root)
+            canonical = ET.canonicalize(ET.tostring(root, encoding="unicode"), strip_text=True)
+        except Exception:
+            return None
+        return ComicArchive.cv_note_pattern.sub("Tagged with ComicTagger using info from Comic Vine.", canonical)
+
+    @staticmethod
+    def dropEmptyElements(element):
+        for child in list(element):
+            ComicArchive.dropEmptyElements(child)
+            if len(child) == 0 and len(child.attrib) == 0 and (child.text is None or child.text.strip() == ""):
+                element.remove(child)
+
+    @staticmethod
+    def cbiPayload(cbi_data):
+        try:
+            return json.loads(cbi_data)["ComicBookInfo/1.0"]
+        except Exception:
+            return None
+
     def writeMetadata(self, metadata, style):
         retcode = None
         if style == MetaDataStyle.CIX:
@@ -813,8 +1127,7 @@ class ComicArchive:
 
     def writeCBI(self, metadata):
         if metadata is not None:
-            self.applyArchiveInfoToMetadata(metadata)
-            cbi_string = ComicBookInfo().stringFromMetadata(metadata)
+            cbi_string = self.tagString(metadata, MetaDataStyle.CBI)
             write_success = self.archiver.setArchiveComment(cbi_string)
             if write_success:
                 self.has_cbi = True
@@ -840,7 +1153,11 @@ class ComicArchive:
             if raw_cix is None or raw_cix == "":
                 self.cix_md = GenericMetadata()
             else:
-                self.cix_md = ComicInfoXml().metadataFromString(raw_cix)
+                try:
+                    self.cix_md = ComicInfoXml().metadataFromString(raw_cix)
+                except (ET.ParseError, ValueError) as e:
+                    print("Error parsing ComicInfo.xml in {0}: {1}".format(self.path, e), file=sys.stderr)
+                    self.cix_md = GenericMetadata()
 
             # validate the existing page list (make sure count is correct)
             if len(self.cix_md.pages) != 0:
@@ -866,8 +1183,7 @@ class ComicArchive:
 
     def writeCIX(self, metadata):
         if metadata is not None:
-            self.applyArchiveInfoToMetadata(metadata, calc_page_sizes=True)
-            cix_string = ComicInfoXml().stringFromMetadata(metadata)
+            cix_string = self.tagString(metadata, MetaDataStyle.CIX)
             write_success = self.archiver.writeArchiveFile(self.ci_xml_filename, cix_string)
             if write_success:
                 self.has_cix = True
@@ -904,7 +1220,11 @@ class ComicArchive:
             if raw_comet is None or raw_comet == "":
                 self.comet_md = GenericMetadata()
             else:
-                self.comet_md = CoMet().metadataFromString(raw_comet)
+                try:
+                    self.comet_md = CoMet().metadataFromString(raw_comet)
+                except (ET.ParseError, ValueError) as e:
+                    print("Error parsing {0} in {1}: {2}".format(self.comet_filename, self.path, e), file=sys.stderr)
+                    self.comet_md = GenericMetadata()
 
             self.comet_md.setDefaultPageList(self.getNumberOfPages())
             # use the coverImage value from the comet_data to mark the cover in this struct
@@ -940,13 +1260,7 @@ class ComicArchive:
             if not self.hasCoMet():
                 self.comet_filename = self.comet_default_filename
 
-            self.applyArchiveInfoToMetadata(metadata)
-            # Set the coverImage value, if it's not the first page
-            cover_idx = int(metadata.getCoverPageIndexList()[0])
-            if cover_idx != 0:
-                metadata.coverImage = self.getPageName(cover_idx)
-
-            comet_string = CoMet().stringFromMetadata(metadata)
+            comet_string = self.tagString(metadata, MetaDataStyle.COMET)
             write_success = self.archiver.writeArchiveFile(self.comet_filename, comet_string)
             if write_success:
                 self.has_comet = True
@@ -974,21 +1288,42 @@ class ComicArchive:
 
             # look at all xml files in root, and search for CoMet data, get
             # first
+            for n, root_tag in self.getXMLRoots().items():
+                if root_tag == "comet":
+                    self.comet_filename = n
+                    self.has_comet = True
+                    break
+
+        return self.has_comet
+
+    # enough of a file to get past an XML declaration and a comment or two
+    xml_head_size = 512
+
+    def getXMLRoots(self):
+        """
+        Maps each XML file in the root of the archive to the tag of its root
+        element (None if it isn't XML).  Only the start of each file is read,
+        except for a CoMet file, which has to parse as a whole to count.
+        """
+        if self.xml_roots is None:
+            self.xml_roots = dict()
             for n in self.archiver.getArchiveFilenameList():
                 if os.path.dirname(n) == "" and os.path.splitext(n)[1].lower() == ".xml":
-                    # read in XML file, and validate it
                     try:
-                        data = self.archiver.readArchiveFile(n)
+                        data = self.archiver.readArchiveFileHead(n, self.xml_head_size)
+                        root_tag = utils.xml_root_tag(data)
+                        if root_tag is None and len(data) == self.xml_head_size:
+                            # the root element is further in than usual
+                            root_tag = utils.xml_root_tag(self.archiver.readArchiveFile(n))
+                        if root_tag == "comet":
+                            ET.fromstring(self.archiver.readArchiveFile(n))
+                    except ET.ParseError:
+                        root_tag = None
                     except:
-                        data = ""
-                        print("Error reading in Comet XML for validation!", file=sys.stderr)
-                    if CoMet().validateString(data):
-                        # since we found it, save it!
-                        self.comet_filename = n
-                        self.has_comet = True
-                        break
-
-            return self.has_comet
+                        root_tag = None
+                        print("Error reading in XML file {0} for validation!".format(n), file=sys.stderr)
+                    self.xml_roots[n] = root_tag
+        return self.xml_roots
 
     def applyArchiveInfoToMetadata(self, md, calc_page_sizes=False):
         md.pageCount = self.getNumberOfPages()
@@ -48,8 +48,10 @@ class ComicInfoXml:
 
     def metadataFromString(self, string):
 
-        tree = ET.ElementTree(ET.fromstring(string))
-        return self.convertXMLToMetadata(tree)
+        parser = ET.XMLPullParser(events=("start", "end"))
+        parser.feed(string)
+        parser.close()
+        return self.convertEventsToMetadata(parser.read_events())
 
     def stringFromMetadata(self, metadata):
 
@@ -192,7 +194,7 @@ class ComicInfoXml:
             pages_node = ET.SubElement(root, "Pages")
             for page_dict in md.pages:
                 page_node = ET.SubElement(pages_node, "Page")
-                page_node.attrib = page_dict
+                page_node.attrib = dict(page_dict)
 
         # self pretty-print
         self.indent(root)
@@ -202,18 +204,51 @@ class ComicInfoXml:
         return tree
 
     def convertXMLToMetadata(self, tree):
-
-        root = tree.getroot()
-
-        if root.tag != "ComicInfo":
-            raise 1
-            return None
+        return self.metadataFromString(ET.tostring(tree.getroot()))
+
+    # ComicInfo credit elements, and the role they're read in as
+    credit_roles = {
+        "Writer": "Writer",
+        "Penciller": "Penciller",
+        "Inker": "Inker",
+        "Colorist": "Colorist",
+        "Letterer": "Letterer",
+        "Editor": "Editor",
+        "CoverArtist": "Cover",
+    }
+
+    def convertEventsToMetadata(self, events):
+        """
+        Fills in the metadata in one walk over the (start, end) parser
+        events.  For a field that appears more than once, the first one
+        wins; credits are read in document order.
+        """
+
+        values = dict()
+        credits = []
+        pages = []
+        depth = 0
+        section = None
+        for event, node in events:
+            if event == "start":
+                depth += 1
+                if depth == 1 and node.tag != "ComicInfo":
+                    raise ValueError("Not ComicInfo XML: root element is " + node.tag)
+                # only the first Pages element counts
+                if depth == 3 and "Pages" not in values and section == "Pages":
+                    pages.append(node.attrib)
+                if depth == 2:
+                    section = node.tag
+            else:
+                depth -= 1
+                if depth == 1:
+                    if node.tag not in values:
+                        values[node.tag] = node.text
+                    if node.tag in self.credit_roles and node.text is not None:
+                        credits.append((node.text, self.credit_roles[node.tag]))
 
         def get(name):
-            tag = root.find(name)
-            if tag is None:
-                return None
-            return tag.text
+            return values.get(name)
 
         md = GenericMetadata()
 
@@ -250,24 +285,12 @@ class ComicInfoXml:
         tmp = utils.xlate(get("BlackAndWhite"))
         if tmp is not None and tmp.lower() in ["yes", "true", "1"]:
             md.blackAndWhite = True
-        # Now extract the credit info
-        for n in root:
-            if n.tag == "Writer" or n.tag == "Penciller" or n.tag == "Inker" or n.tag == "Colorist" or n.tag == "Letterer" or n.tag == "Editor":
-                if n.text is not None:
-                    for name in n.text.split(","):
-                        md.addCredit(name.strip(), n.tag)
-
-            if n.tag == "CoverArtist":
-                if n.text is not None:
-                    for name in n.text.split(","):
-                        md.addCredit(name.strip(), "Cover")
-
-        # parse page data now
-        pages_node = root.find("Pages")
-        if pages_node is not None:
-            for page in pages_node:
-                md.pages.append(page.attrib)
-                # print page.attrib
+
+        for text, role in credits:
+            for name in text.split(","):
+                md.addCredit(name.strip(), role)
+
+        md.pages = pages
 
         md.isEmpty = False
 
@@ -281,5 +304,4 @@ class ComicInfoXml:
 
     def readFromExternalFile(self, filename):
 
-        tree = ET.parse(filename)
-        return self.convertXMLToMetadata(tree)
+        return self.convertEventsToMetadata(ET.iterparse(filename, events=("start", "end")))
@@ -20,6 +20,8 @@ possible, however lossy it might be
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections.abc
+
 from . import utils
 
 
@@ -43,19 +45,123 @@ class PageType:
     Deleted = "Deleted"
 
 
-"""
-class PageInfo:
-	Image = 0
-	Type = PageType.Story
-	DoublePage = False
-	ImageSize = 0
-	Key = ""
-	ImageWidth = 0
-	ImageHeight = 0
-"""
+class PageInfo(collections.abc.MutableMapping):
+
+    """
+    One entry in a page list, with the attributes of a CIX Page element
+
+    It reads and writes like a dict of those attributes, with string values,
+    but the numbers are kept as ints, e.g. p["ImageSize"] is "1234" and
+    p.ImageSize is 1234.  A field that isn't set is None.
+    """
+
+    fields = ("Image", "Type", "DoublePage", "ImageSize", "Key", "Bookmark", "ImageWidth", "ImageHeight")
+    int_fields = frozenset(("Image", "ImageSize", "ImageWidth", "ImageHeight"))
+
+    # extra holds any attributes we don't know about, so they survive a round trip
+    __slots__ = fields + ("extra",)
+
+    def __init__(self, attribs=None):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        if attribs is not None:
+            for key, value in attribs.items():
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value if isinstance(value, str) else str(value)
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.fields:
+            # keep anything that wouldn't come back out the same as a string
+            if key in self.int_fields and isinstance(value, str) and value.isdecimal() and str(int(value)) == value:
+                value = int(value)
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = dict()
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.fields:
+            if getattr(self, key) is None:
+                raise KeyError(key)
+            setattr(self, key, None)
+        else:
+            if self.extra is None:
+                raise KeyError(key)
+            del self.extra[key]
+
+    def __iter__(self):
+        for name in self.fields:
+            if getattr(self, name) is not None:
+                yield name
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for name in self)
+
+    def __repr__(self):
+        return repr(dict(self))
 
 
 class GenericMetadata:
+
+    __slots__ = (
+        "isEmpty",
+        "tagOrigin",
+        "series",
+        "issue",
+        "title",
+        "publisher",
+        "seriesYear",
+        "month",
+        "year",
+        "day",
+        "issueCount",
+        "volume",
+        "genre",
+        "language",
+        "comments",
+        "volumeCount",
+        "criticalRating",
+        "country",
+        "alternateSeries",
+        "alternateNumber",
+        "alternateCount",
+        "imprint",
+        "notes",
+        "webLink",
+        "format",
+        "manga",
+        "blackAndWhite",
+        "pageCount",
+        "maturityRating",
+        "storyArc",
+        "seriesGroup",
+        "scanInfo",
+        "characters",
+        "teams",
+        "locations",
+        "credits",
+        "tags",
+        "_pages",
+        "price",
+        "isVersionOf",
+        "rights",
+        "identifier",
+        "lastMark",
+        "coverImage",
+    )
+
     def __init__(self):
 
         self.isEmpty = True
@@ -111,6 +217,21 @@ class GenericMetadata:
         self.lastMark = None
         self.coverImage = None
 
+    @property
+    def pages(self):
+        return self._pages
+
+    @pages.setter
+    def pages(self, pages):
+        # page dicts, e.g. the attributes of CIX Page elements, are converted
+        self._pages = [p if isinstance(p, PageInfo) else PageInfo(p) for p in pages]
+
+    def asDict(self):
+        """All the fields by name, as vars() would give them"""
+        values = {name: getattr(self, name) for name in self.__slots__ if name != "_pages"}
+        values["pages"] = self.pages
+        return values
+
     def overlay(self, new_md):
         """Overlay a metadata object on this one
 
@@ -200,11 +321,11 @@ class GenericMetadata:
     def setDefaultPageList(self, count):
         # generate a default page list, with the first page marked as the cover
         for i in range(count):
-            page_dict = dict()
-            page_dict["Image"] = str(i)
+            page = PageInfo()
+            page.Image = i
             if i == 0:
-                page_dict["Type"] = PageType.FrontCover
-            self.pages.append(page_dict)
+                page.Type = PageType.FrontCover
+            self.pages.append(page)
 
     def getArchivePageIndex(self, pagenum):
         # convert the displayed page number to the page index of the file in
@@ -0,0 +1,199 @@
+"""Counters and timers for finding out where the time goes
+
+Usage:
+
+    from comicapi import stats
+
+    with stats.timed("zip.read"):
+        ...
+
+    @stats.timing("hash")
+    def calculateHash(self, image_data):
+        ...
+
+    stats.count("image.cache_hit")
+
+Nothing is recorded until enable() is called.  Timers are inclusive, so
+e.g. "identify" includes the "cv.request" time spent inside it.  While a
+file is being processed (begin_file/end_file), what's recorded is also
+added up for that file, and written as one JSON line to the trace file,
+if there is one.
+"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import json
+import sys
+import threading
+import time
+
+
+class Stats:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        # name -> count
+        self.counters = dict()
+        # name -> [count, total seconds, max seconds]
+        self.timers = dict()
+        self.trace_file = None
+        self.current_file = None
+        self.file_start = None
+        self.file_counters = dict()
+        self.file_timers = dict()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            if self.current_file is not None:
+                self.file_counters[name] = self.file_counters.get(name, 0) + n
+
+    def addTime(self, name, elapsed):
+        with self.lock:
+            self.addTo(self.timers, name, elapsed)
+            if self.current_file is not None:
+                self.addTo(self.file_timers, name, elapsed)
+
+    @staticmethod
+    def addTo(timers, name, elapsed):
+        timer = timers.get(name)
+        if timer is None:
+            timers[name] = [1, elapsed, elapsed]
+        else:
+            timer[0] += 1
+            timer[1] += elapsed
+            timer[2] = max(timer[2], elapsed)
+
+    def beginFile(self, path):
+        with self.lock:
+            self.current_file = path
+            self.file_start = time.perf_counter()
+            self.file_counters = dict()
+            self.file_timers = dict()
+
+    def endFile(self):
+        with self.lock:
+            if self.current_file is None:
+                return
+            elapsed = time.perf_counter() - self.file_start
+            self.addTo(self.timers, "file", elapsed)
+            if self.trace_file is not None:
+                entry = {
+                    "file": self.current_file,
+                    "elapsed": elapsed,
+                    "timers": {name: {"count": t[0], "total": t[1]} for name, t in self.file_timers.items()},
+                    "counters": self.file_counters,
+                }
+                self.trace_file.write(json.dumps(entry) + "\n")
+                self.trace_file.flush()
+            self.current_file = None
+
+    def summary(self):
+        lines = []
+        if self.timers:
+            lines.append("{0:<28} {1:>8} {2:>10} {3:>10} {4:>10}".format("timer", "count", "total s", "mean ms", "max ms"))
+            for name, (count, total, longest) in sorted(self.timers.items(), key=lambda t: -t[1][1]):
+                lines.append("{0:<28} {1:>8} {2:>10.3f} {3:>10.2f} {4:>10.2f}".format(name, count, total, total / count * 1000, longest * 1000))
+        if self.counters:
+            lines.append("")
+            lines.append("{0:<28} {1:>8}".format("counter", "count"))
+            for name, count in sorted(self.counters.items()):
+                lines.append("{0:<28} {1:>8}".format(name, count))
+        return "\n".join(lines)
+
+
+class Timer:
+
+    """Adds the time spent in a with block to a timer"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _stats.addTime(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_stats = Stats()
+_null_timer = NullTimer()
+
+
+def enable(trace_path=None):
+    _stats.enabled = True
+    if trace_path is not None:
+        _stats.trace_file = open(trace_path, "w")
+
+
+def timed(name):
+    if not _stats.enabled:
+        return _null_timer
+    return Timer(name)
+
+
+def timing(name):
+    """A decorator that times every call of the function"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _stats.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _stats.addTime(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, n=1):
+    if _stats.enabled:
+        _stats.count(name, n)
+
+
+def begin_file(path):
+    if _stats.enabled:
+        _stats.beginFile(path)
+
+
+def end_file():
+    if _stats.enabled:
+        _stats.endFile()
+
+
+def print_summary(file=sys.stderr):
+    print(_stats.summary(), file=file)
+
+
+def close():
+    if _stats.trace_file is not None:
+        _stats.trace_file.close()
+        _stats.trace_file = None
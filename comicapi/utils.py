@@ -21,6 +21,7 @@ import os
 import platform
 import re
 import sys
+import xml.etree.ElementTree as ET
 
 
 class UtilsVars:
@@ -46,36 +47,127 @@ def fix_output_encoding():
         UtilsVars.already_fixed_encoding = True
 
 
-def get_recursive_filelist(pathlist):
-    """Get a recursive list of of all files under all path items in the list"""
+# Extensions that are always handed on to ComicArchive without sniffing
+comic_archive_exts = [".cbz", ".zip", ".cbr", ".rar"]
+
+# Extensions that are never comic archives (sidecar images, scanner notes, etc.)
+non_comic_exts = [
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".gif",
+    ".webp",
+    ".bmp",
+    ".nfo",
+    ".txt",
+    ".xml",
+    ".json",
+    ".sfv",
+    ".md5",
+    ".url",
+    ".db",
+    ".ini",
+]
+
+# Leading bytes of the archive formats ComicArchive can open
+archive_magic = [
+    b"PK\x03\x04",  # zip, local file header
+    b"PK\x05\x06",  # zip, empty archive
+    b"Rar!\x1a\x07",  # rar, both RAR4 and RAR5
+]
+
+
+def has_archive_magic(path):
+    """Checks the first few bytes of a file for a zip or rar signature"""
+
+    try:
+        with open(path, "rb") as f:
+            header = f.read(8)
+    except (OSError, IOError):
+        return False
+
+    for magic in archive_magic:
+        if header.startswith(magic):
+            return True
+    return False
+
+
+def is_comic_archive_candidate(path):
+    """Cheap test to weed out files that can't be comic archives
+
+    Known comic extensions are accepted without touching the file (ComicArchive
+    will verify them anyway), known sidecar extensions are rejected, and
+    everything else gets its magic number checked.
+    """
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in comic_archive_exts:
+        return True
+    if ext in non_comic_exts:
+        return False
+    return has_archive_magic(path)
+
+
+def _scan_dir(folder, comics_only):
+    """Lists a single folder, returning (files, sub_folders)
+
+    Like os.walk(), unreadable folders are silently skipped and symlinked
+    folders are not followed.
+    """
+
+    files = []
+    sub_folders = []
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink():
+                        sub_folders.append(entry.path)
+                elif not comics_only or is_comic_archive_candidate(entry.path):
+                    files.append(entry.path)
+    except OSError:
+        pass
+
+    return files, sub_folders
+
+
+def _walk_folder(top, comics_only):
+    pending = [top]
+    while pending:
+        files, sub_folders = _scan_dir(pending.pop(), comics_only)
+        yield from files
+        # reversed, so that folders get visited in listing order
+        pending.extend(reversed(sub_folders))
+
+
+def iter_recursive_filelist(pathlist, comics_only=False):
+    """Generates all files under all path items in the list
+
+    Files are yielded as soon as their folder has been listed, so callers can
+    start work before the whole tree has been walked.  With comics_only, files
+    that can't be comic archives are dropped during the walk (explicitly
+    listed files are always passed through).
+    """
 
-    filename_encoding = sys.getfilesystemencoding()
-    filelist = []
     for p in pathlist:
-        # if path is a folder, walk it recursively, and all files underneath
-        if isinstance(p, str):
-            # make sure string is unicode
-            # p = p.decode(filename_encoding)  # , 'replace')
-            pass
-        elif not isinstance(p, str):
-            # it's probably a QString
-            p = str(p)
+        # it's probably a QString
+        p = str(p)
 
+        # if path is a folder, walk it recursively, and all files underneath
         if os.path.isdir(p):
-            for root, dirs, files in os.walk(p):
-                for f in files:
-                    if isinstance(f, str):
-                        # make sure string is unicode
-                        # f = f.decode(filename_encoding, 'replace')
-                        pass
-                    elif not isinstance(f, str):
-                        # it's probably a QString
-                        f = str(f)
-                    filelist.append(os.path.join(root, f))
+            yield from _walk_folder(p, comics_only)
         else:
-            filelist.append(p)
+            yield p
+
+
+def get_recursive_filelist(pathlist):
+    """Get a recursive list of of all files under all path items in the list"""
 
-    return filelist
+    return list(iter_recursive_filelist(pathlist))
 
 
 def listToString(l):
@@ -119,24 +211,43 @@ def which(program):
     return None
 
 
-def xlate(data, isInt=False):
-    class Default(dict):
-        def __missing__(self, key):
-            return None
+class _DigitsOnly(dict):
+    # a str.translate() table that drops everything but digits
+    def __missing__(self, key):
+        return None
+
+
+_digits_only = _DigitsOnly(zip((ord(c) for c in "1234567890"), "1234567890"))
 
+
+def xlate(data, isInt=False):
     if data is None or data == "":
         return None
     if isInt:
-        i = str(data).translate(Default(zip((ord(c) for c in "1234567890"), "1234567890")))
+        i = str(data).translate(_digits_only)
         if i == "0":
             return "0"
-        if i is "":
+        if i == "":
             return None
         return int(i)
     else:
         return str(data)
 
 
+def xml_root_tag(data, chunk_size=1024):
+    """The tag of the root element, without parsing any further than that; None if it isn't XML"""
+
+    parser = ET.XMLPullParser(events=("start",))
+    try:
+        for start in range(0, len(data), chunk_size):
+            parser.feed(data[start : start + chunk_size])
+            for event, node in parser.read_events():
+                return node.tag
+    except ET.ParseError:
+        pass
+    return None
+
+
 def removearticles(text):
     text = text.lower()
     articles = ["and", "a", "&", "issue", "the"]
@@ -0,0 +1,114 @@
+"""A PyQt5 class to open and probe comic archives in a background thread"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import os
+import sys
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import pyqtSignal
+
+from . import utils
+from .comicarchive import ComicArchive
+
+
+class ArchiveProbe:
+    """The result of opening one file: the archive and its flag columns"""
+
+    def __init__(self, path, ca=None, known=False):
+        self.path = path
+        self.ca = ca
+        self.known = known
+        self.writable = False
+
+
+class ArchiveLoader(QtCore.QThread):
+
+    """
+    Walks the given paths and opens each comic archive on a pool of
+    worker threads, emitting archiveLoaded once per file as results come
+    in.  Paths in known_paths are reported without being opened again.
+    If the client class wants to stop the thread, they should mark it as
+    "abandoned"; pending files are dropped and no more signals are issued.
+    """
+
+    archiveLoaded = pyqtSignal(object)
+
+    workers = min(8, (os.cpu_count() or 1) * 2)
+
+    def __init__(self, pathlist, rar_exe_path, default_image_path, known_paths=()):
+        QtCore.QThread.__init__(self)
+        self.pathlist = pathlist
+        self.rar_exe_path = rar_exe_path
+        self.default_image_path = default_image_path
+        self.known_paths = frozenset(known_paths)
+        self.abandoned = False
+
+    def abandon(self):
+        self.abandoned = True
+
+    def probe(self, path):
+        if self.abandoned:
+            return ArchiveProbe(path)
+
+        try:
+            ca = ComicArchive(path, self.rar_exe_path, self.default_image_path)
+            if not ca.seemsToBeAComicArchive():
+                return ArchiveProbe(path)
+
+            result = ArchiveProbe(path, ca)
+            # Reading these will force them into the ComicArchive's cache
+            ca.hasCIX()
+            ca.readCIX()
+            ca.hasCBI()
+            result.writable = ca.isWritable()
+        except Exception as e:
+            print("Error opening {0}:".format(path), e, file=sys.stderr)
+            return ArchiveProbe(path)
+        return result
+
+    def run(self):
+        # keep a bounded number of files in flight so a huge folder doesn't
+        # queue up a future per file before the first result comes back
+        max_pending = self.workers * 4
+        pending = set()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for path in utils.iter_recursive_filelist(self.pathlist, comics_only=True):
+                if self.abandoned:
+                    break
+                path = os.path.abspath(path)
+                if path in self.known_paths:
+                    self.archiveLoaded.emit(ArchiveProbe(path, known=True))
+                    continue
+
+                pending.add(pool.submit(self.probe, path))
+                if len(pending) >= max_pending:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    self.emitResults(done)
+
+            while pending and not self.abandoned:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                self.emitResults(done)
+
+            for f in pending:
+                f.cancel()
+
+    def emitResults(self, futures):
+        for f in futures:
+            if self.abandoned:
+                return
+            self.archiveLoaded.emit(f.result())
@@ -44,6 +44,7 @@ class AutoTagStartWindow(QtWidgets.QDialog):
         self.cbxSpecifySearchString.setCheckState(QtCore.Qt.Unchecked)
         self.cbxAutoImprint.setCheckState(QtCore.Qt.Unchecked)
         self.leNameLengthMatchTolerance.setText(str(self.settings.id_length_delta_thresh))
+        self.sbWorkers.setValue(self.settings.autotag_workers)
         self.leSearchString.setEnabled(False)
 
         if self.settings.save_on_low_confidence:
@@ -90,6 +91,7 @@ class AutoTagStartWindow(QtWidgets.QDialog):
         self.waitAndRetryOnRateLimit = False
         self.searchString = None
         self.nameLengthMatchTolerance = self.settings.id_length_delta_thresh
+        self.workers = self.settings.autotag_workers
 
     def searchStringToggle(self):
         enable = self.cbxSpecifySearchString.isChecked()
@@ -105,6 +107,7 @@ class AutoTagStartWindow(QtWidgets.QDialog):
         self.removeAfterSuccess = self.cbxRemoveAfterSuccess.isChecked()
         self.nameLengthMatchTolerance = int(self.leNameLengthMatchTolerance.text())
         self.waitAndRetryOnRateLimit = self.cbxWaitForRateLimit.isChecked()
+        self.workers = self.sbWorkers.value()
 
         # persist some settings
         self.settings.save_on_low_confidence = self.autoSaveOnLow
@@ -113,6 +116,7 @@ class AutoTagStartWindow(QtWidgets.QDialog):
         self.settings.ignore_leading_numbers_in_filename = self.ignoreLeadingDigitsInFilename
         self.settings.remove_archive_after_successful_match = self.removeAfterSuccess
         self.settings.wait_and_retry_on_rate_limit = self.waitAndRetryOnRateLimit
+        self.settings.autotag_workers = self.workers
 
         if self.cbxSpecifySearchString.isChecked():
             self.searchString = str(self.leSearchString.text())
@@ -0,0 +1,282 @@
+"""A PyQt5 thread to auto-tag a list of archives on a pool of workers"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import re
+import sys
+import threading
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import pyqtSignal
+
+from .cbltransformer import CBLTransformer
+from .cli import MultipleMatch, OnlineMatchResults
+from .comicarchive import MetaDataStyle
+from .comicvinetalker import ComicVineTalker, ComicVineTalkerException
+from .issueidentifier import IssueIdentifier
+
+
+class AutoTagThread(QtCore.QThread):
+
+    """
+    Identifies and tags each archive in ca_list, several at a time.
+
+    The log of each archive is sent as one block when it's done, so output
+    from archives being worked on at the same time doesn't interleave.
+    Call abandon() to stop: archives not yet started are skipped, and the
+    searches in progress give up at their next check.  When the thread
+    finishes, match_results and archives_to_remove hold the outcome in the
+    order of ca_list.
+
+    The tags are written on the GUI thread (see writeMetadata), since the
+    window may be using the same ComicArchive objects.
+    """
+
+    progressUpdate = pyqtSignal(int, int, str)
+    logMsg = pyqtSignal(str)
+    archiveImage = pyqtSignal(object)
+    testImage = pyqtSignal(object)
+
+    # (ComicArchive, metadata, list to append the result to)
+    writeRequest = pyqtSignal(object, object, object)
+
+    def __init__(self, ca_list, settings, style, dlg):
+        QtCore.QThread.__init__(self)
+        self.ca_list = ca_list
+        self.settings = settings
+        self.style = style
+
+        # take a copy of the options so the dialog can go away
+        self.autoSaveOnLow = dlg.autoSaveOnLow
+        self.dontUseYear = dlg.dontUseYear
+        self.assumeIssueOne = dlg.assumeIssueOne
+        self.ignoreLeadingDigitsInFilename = dlg.ignoreLeadingDigitsInFilename
+        self.removeAfterSuccess = dlg.removeAfterSuccess
+        self.waitAndRetryOnRateLimit = dlg.waitAndRetryOnRateLimit
+        self.searchString = dlg.searchString
+        self.nameLengthMatchTolerance = dlg.nameLengthMatchTolerance
+
+        self.workers = max(1, dlg.workers)
+        self.abandoned = False
+        self.identifiers = set()
+        self.mutex = threading.Lock()
+
+        self.match_results = OnlineMatchResults()
+        self.archives_to_remove = []
+
+        # this object lives on the GUI thread, so the slot runs there, and
+        # the worker that emits waits for it
+        self.writeRequest.connect(self.writeOnGuiThread, QtCore.Qt.BlockingQueuedConnection)
+
+    def abandon(self):
+        self.abandoned = True
+        with self.mutex:
+            for ii in self.identifiers:
+                ii.cancel = True
+
+    def run(self):
+        results = [None] * len(self.ca_list)
+        done_count = 0
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.tagArchive, i, ca): i for i, ca in enumerate(self.ca_list)}
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except concurrent.futures.CancelledError:
+                    continue
+                except Exception as e:
+                    print("Error auto-tagging {0}:".format(self.ca_list[i].path), e, file=sys.stderr)
+
+                if self.abandoned:
+                    for f in futures:
+                        f.cancel()
+                    continue
+
+                done_count += 1
+                self.progressUpdate.emit(done_count, len(self.ca_list), self.ca_list[i].path)
+
+        for i, result in enumerate(results):
+            if result is None:
+                continue
+            success, match_results = result
+            self.match_results.extend(match_results)
+            if success and self.removeAfterSuccess:
+                self.archives_to_remove.append(self.ca_list[i])
+
+    def tagArchive(self, i, ca):
+        match_results = OnlineMatchResults()
+        if self.abandoned:
+            return None
+
+        log = []
+        log.append("==========================================================================\n")
+        log.append("Auto-Tagging {0} of {1}\n".format(i + 1, len(self.ca_list)))
+        log.append("{0}\n".format(ca.path))
+
+        success = False
+        try:
+            cover_idx = ca.readMetadata(self.style).getCoverPageIndexList()[0]
+            self.archiveImage.emit(ca.getPage(cover_idx))
+            self.testImage.emit(None)
+
+            if ca.isWritable():
+                success = self.identifyAndTagSingleArchive(ca, match_results, log.append)
+        finally:
+            self.logMsg.emit("".join(log))
+
+        return success, match_results
+
+    def writeMetadata(self, ca, md):
+        result = []
+        self.writeRequest.emit(ca, md, result)
+        return len(result) > 0 and result[0]
+
+    def writeOnGuiThread(self, ca, md, result):
+        result.append(ca.writeMetadata(md, self.style))
+        ca.loadCache([MetaDataStyle.CBI, MetaDataStyle.CIX])
+
+    def actualIssueDataFetch(self, match):
+
+        # now get the particular issue data
+        cv_md = None
+
+        try:
+            comicVine = ComicVineTalker()
+            comicVine.wait_for_rate_limit = self.waitAndRetryOnRateLimit
+            cv_md = comicVine.fetchIssueData(match["volume_id"], match["issue_number"], self.settings)
+        except ComicVineTalkerException:
+            print("Network error while getting issue details. Save aborted")
+
+        if cv_md is not None:
+            if self.settings.apply_cbl_transform_on_cv_import:
+                cv_md = CBLTransformer(cv_md, self.settings).apply()
+
+        return cv_md
+
+    def identifyAndTagSingleArchive(self, ca, match_results, log):
+        success = False
+        ii = IssueIdentifier(ca, self.settings)
+
+        # read in metadata, and parse file name if not there
+        md = ca.readMetadata(self.style)
+        if md.isEmpty:
+            md = ca.metadataFromFilename(self.settings.parse_scan_info)
+            if self.ignoreLeadingDigitsInFilename and md.series is not None:
+                # remove all leading numbers
+                md.series = re.sub("([\d.]*)(.*)", "\\2", md.series)
+
+        # use the dialog specified search string
+        if self.searchString is not None:
+            md.series = self.searchString
+
+        if md is None or md.isEmpty:
+            print("No metadata given to search online with!")
+            return False
+
+        if self.dontUseYear:
+            md.year = None
+        if self.assumeIssueOne and (md.issue is None or md.issue == ""):
+            md.issue = "1"
+        ii.setAdditionalMetadata(md)
+        ii.onlyUseAdditionalMetaData = True
+        ii.waitAndRetryOnRateLimit = self.waitAndRetryOnRateLimit
+        # search() clears the cancel flag when it starts, so set it again
+        # from here in case we were abandoned in the meantime
+        def output(text):
+            log(text)
+            if self.abandoned:
+                ii.cancel = True
+
+        ii.setOutputFunction(output)
+        ii.cover_page_index = md.getCoverPageIndexList()[0]
+        ii.setCoverURLCallback(self.testImage.emit)
+        ii.setNameLengthDeltaThreshold(self.nameLengthMatchTolerance)
+
+        with self.mutex:
+            if self.abandoned:
+                return False
+            self.identifiers.add(ii)
+        try:
+            matches = ii.search()
+        finally:
+            with self.mutex:
+                self.identifiers.discard(ii)
+
+        if self.abandoned:
+            log("Auto-Tag cancelled\n")
+            return False
+
+        result = ii.search_result
+
+        found_match = False
+        choices = False
+        low_confidence = False
+
+        if result == ii.ResultNoMatches:
+            pass
+        elif result == ii.ResultFoundMatchButBadCoverScore:
+            low_confidence = True
+            found_match = True
+        elif result == ii.ResultFoundMatchButNotFirstPage:
+            found_match = True
+        elif result == ii.ResultMultipleMatchesWithBadImageScores:
+            low_confidence = True
+            choices = True
+        elif result == ii.ResultOneGoodMatch:
+            found_match = True
+        elif result == ii.ResultMultipleGoodMatches:
+            choices = True
+
+        if choices:
+            if low_confidence:
+                log("Online search: Multiple low-confidence matches.  Save aborted\n")
+                match_results.lowConfidenceMatches.append(MultipleMatch(ca.path, matches, ca))
+            else:
+                log("Online search: Multiple matches.  Save aborted\n")
+                match_results.multipleMatches.append(MultipleMatch(ca.path, matches, ca))
+        elif low_confidence and not self.autoSaveOnLow:
+            log("Online search: Low confidence match.  Save aborted\n")
+            match_results.lowConfidenceMatches.append(MultipleMatch(ca.path, matches, ca))
+        elif not found_match:
+            log("Online search: No match found.  Save aborted\n")
+            match_results.noMatches.append(ca.path)
+        else:
+            #  a single match!
+            if low_confidence:
+                log("Online search: Low confidence match, but saving anyways, as indicated...\n")
+
+            # now get the particular issue data
+            cv_md = self.actualIssueDataFetch(matches[0])
+            if cv_md is None:
+                match_results.fetchDataFailures.append(ca.path)
+
+            if cv_md is not None:
+                md.overlay(cv_md)
+
+                if self.settings.auto_imprint:
+                    md.fixPublisher()
+
+                if not self.writeMetadata(ca, md):
+                    match_results.writeFailures.append(ca.path)
+                    log("Save failed ;-(\n")
+                else:
+                    match_results.goodMatches.append(ca.path)
+                    success = True
+                    log("Save complete!\n")
+
+        return success
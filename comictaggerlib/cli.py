@@ -16,18 +16,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
 import json
 import os
 import sys
 from pprint import pprint
 
-from . import utils
+from . import stats, utils
 from .cbltransformer import CBLTransformer
 from .comicarchive import ComicArchive, MetaDataStyle
 from .comicvinetalker import ComicVineTalker, ComicVineTalkerException
-from .filerenamer import FileRenamer
+from .filerenamer import FileRenamer, RenamePlanner
 from .genericmetadata import GenericMetadata
-from .issueidentifier import IssueIdentifier
+from .issueidentifier import IdentificationPlanner, IssueIdentifier
 from .options import Options
 from .settings import ComicTaggerSettings
 
@@ -40,11 +41,16 @@ from .settings import ComicTaggerSettings
 
 filename_encoding = sys.getfilesystemencoding()
 
+# files read and planned for online identification at a time
+plan_window_size = 100
+
 
 class MultipleMatch:
-    def __init__(self, filename, match_list):
+    def __init__(self, filename, match_list, ca=None):
         self.filename = filename
         self.matches = match_list
+        # the GUI keeps the archive itself
+        self.ca = ca
 
 
 class OnlineMatchResults:
@@ -56,7 +62,16 @@ class OnlineMatchResults:
         self.writeFailures = []
         self.fetchDataFailures = []
 
+    def extend(self, other):
+        self.goodMatches.extend(other.goodMatches)
+        self.noMatches.extend(other.noMatches)
+        self.multipleMatches.extend(other.multipleMatches)
+        self.lowConfidenceMatches.extend(other.lowConfidenceMatches)
+        self.writeFailures.extend(other.writeFailures)
+        self.fetchDataFailures.extend(other.fetchDataFailures)
+
 
+@stats.timing("cv.issue_data")
 def actual_issue_data_fetch(match, settings, opts):
 
     # now get the particular issue data
@@ -74,9 +89,16 @@ def actual_issue_data_fetch(match, settings, opts):
     return cv_md
 
 
+@stats.timing("tags.write")
 def actual_metadata_save(ca, opts, md):
 
     if not opts.dryrun:
+        if ca.tagsUnchanged(md, opts.data_style):
+            # nothing new; leave the archive alone
+            stats.count("tags.unchanged")
+            print("Tags are unchanged, nothing written.", file=sys.stderr)
+            return True
+
         # write out the new data
         if not ca.writeMetadata(md, opts.data_style):
             print("The tag save seemed to fail!", file=sys.stderr)
@@ -175,15 +197,73 @@ def cli_mode(opts, settings):
 
     match_results = OnlineMatchResults()
 
-    for f in opts.file_list:
-        if isinstance(f, str):
-            pass
-        process_file_cli(f, opts, settings, match_results)
-        sys.stdout.flush()
+    file_list = opts.file_list
+    if opts.recursive:
+        file_list = utils.iter_recursive_filelist(opts.file_list, comics_only=True)
+
+    # shared across files, so renames in one batch don't collide
+    rename_planner = RenamePlanner()
+
+    batch_mode = opts.recursive or len(opts.file_list) > 1
+
+    identification_planner = None
+    if batch_mode and opts.save_tags and opts.search_online and opts.issue_id is None:
+        identification_planner = IdentificationPlanner(settings)
+        identification_planner.waitAndRetryOnRateLimit = opts.wait_and_retry_on_rate_limit
+
+        def myoutput(text):
+            if opts.verbose:
+                IssueIdentifier.defaultWriteOutput(text)
+
+        identification_planner.setOutputFunction(myoutput)
+
+    # plan a window of files at a time, so a recursive walk is never read
+    # into memory whole
+    file_iter = iter(file_list)
+    while True:
+        window = list(itertools.islice(file_iter, plan_window_size))
+        if len(window) == 0:
+            break
+
+        prepared = dict()
+        if identification_planner is not None:
+            prepared = plan_identification(window, identification_planner, opts, settings)
+
+        for f in window:
+            stats.begin_file(f)
+            try:
+                process_file_cli(f, opts, settings, match_results, rename_planner, identification_planner, prepared.get(f))
+            finally:
+                stats.end_file()
+            sys.stdout.flush()
 
     post_process_matches(match_results, opts, settings)
 
 
+@stats.timing("plan")
+def plan_identification(file_list, planner, opts, settings):
+    # read what we'd search with for every file up front, so each series is
+    # only searched for once however many of its issues are in the batch.
+    # returns filename -> (archive, metadata) to save reading them again
+    prepared = dict()
+    for filename in file_list:
+        if not os.path.lexists(filename):
+            continue
+        ca = ComicArchive(filename, settings.rar_exe_path, ComicTaggerSettings.getGraphic("nocover.png"))
+        if not ca.seemsToBeAComicArchive() or not ca.isWritable():
+            continue
+        has_desired_tags = ca.hasMetadata(opts.data_style)
+        if opts.no_overwrite and has_desired_tags:
+            continue
+        md = create_local_metadata(opts, ca, has_desired_tags)
+        planner.addFile(md)
+        prepared[filename] = (ca, md)
+
+    planner.resolve()
+    return prepared
+
+
+@stats.timing("tags.read")
 def create_local_metadata(opts, ca, has_desired_tags):
 
     md = GenericMetadata()
@@ -203,13 +283,18 @@ def create_local_metadata(opts, ca, has_desired_tags):
     return md
 
 
-def process_file_cli(filename, opts, settings, match_results):
+def process_file_cli(filename, opts, settings, match_results, rename_planner=None, identification_planner=None, prepared=None):
 
-    batch_mode = len(opts.file_list) > 1
+    batch_mode = opts.recursive or len(opts.file_list) > 1
 
     settings.auto_imprint = opts.auto_imprint
 
-    ca = ComicArchive(filename, settings.rar_exe_path, ComicTaggerSettings.getGraphic("nocover.png"))
+    # prepared is the (archive, metadata) the identification planner read
+    if prepared is not None:
+        ca, prepared_md = prepared
+    else:
+        with stats.timed("archive.open"):
+            ca = ComicArchive(filename, settings.rar_exe_path, ComicTaggerSettings.getGraphic("nocover.png"))
 
     if not os.path.lexists(filename):
         print("Cannot find " + filename, file=sys.stderr)
@@ -226,12 +311,13 @@ def process_file_cli(filename, opts, settings, match_results):
         return
 
     has = [False, False, False]
-    if ca.hasCIX():
-        has[MetaDataStyle.CIX] = True
-    if ca.hasCBI():
-        has[MetaDataStyle.CBI] = True
-    if ca.hasCoMet():
-        has[MetaDataStyle.COMET] = True
+    with stats.timed("tags.detect"):
+        if ca.hasCIX():
+            has[MetaDataStyle.CIX] = True
+        if ca.hasCBI():
+            has[MetaDataStyle.CBI] = True
+        if ca.hasCoMet():
+            has[MetaDataStyle.COMET] = True
 
     if opts.print_tags:
 
@@ -343,7 +429,10 @@ def process_file_cli(filename, opts, settings, match_results):
         if batch_mode:
             print("Processing {0}...".format(filename))
 
-        md = create_local_metadata(opts, ca, has[opts.data_style])
+        if prepared is not None:
+            md = prepared_md
+        else:
+            md = create_local_metadata(opts, ca, has[opts.data_style])
         if md.issue is None or md.issue == "":
             if opts.assume_issue_is_one_if_not_set:
                 md.issue = "1"
@@ -386,6 +475,8 @@ def process_file_cli(filename, opts, settings, match_results):
                 ii.waitAndRetryOnRateLimit = opts.wait_and_retry_on_rate_limit
                 ii.setOutputFunction(myoutput)
                 ii.cover_page_index = md.getCoverPageIndexList()[0]
+                if identification_planner is not None:
+                    ii.setSeriesCandidates(identification_planner.candidatesFor(md))
                 matches = ii.search()
 
                 result = ii.search_result
@@ -493,21 +584,23 @@ def process_file_cli(filename, opts, settings, match_results):
         if settings.rename_move_dir and len(settings.rename_dir.strip()) > 3:
             folder = settings.rename_dir.strip()
 
-        new_abs_path = utils.unique_file(os.path.join(folder, new_name))
+        if rename_planner is None:
+            rename_planner = RenamePlanner()
+        new_abs_path = rename_planner.plan(filename, os.path.join(folder, new_name))
 
-        if os.path.join(folder, new_name) == os.path.abspath(filename):
+        if new_abs_path is None:
             print(msg_hdr + "Filename is already good!", file=sys.stderr)
             return
 
         suffix = ""
         if not opts.dryrun:
             # rename the file
-            os.makedirs(os.path.dirname(new_abs_path), 0o777, True)
-            os.rename(filename, new_abs_path)
+            with stats.timed("rename"):
+                new_abs_path = RenamePlanner.apply(filename, new_abs_path)
         else:
             suffix = " (dry-run, no change)"
 
-        print("renamed '{0}' -> '{1}' {2}".format(os.path.basename(filename), new_name, suffix))
+        print("renamed '{0}' -> '{1}' {2}".format(os.path.basename(filename), os.path.relpath(new_abs_path, folder), suffix))
 
     elif opts.export_to_zip:
         msg_hdr = ""
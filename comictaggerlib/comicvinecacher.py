@@ -44,6 +44,8 @@ class ComicVineCacher:
 
         if not os.path.exists(self.db_file):
             self.create_cache_db()
+        else:
+            self.create_volume_issue_lists_table()
 
     def clearCache(self):
         try:
@@ -118,6 +120,22 @@ class ComicVineCacher:
                 + "PRIMARY KEY (id))"
             )
 
+        self.create_volume_issue_lists_table()
+
+    def create_volume_issue_lists_table(self):
+
+        # the volumes whose whole issue list is in Issues, and when it was
+        # fetched; single issue updates don't make a list complete
+        con = lite.connect(self.db_file)
+        with con:
+            cur = con.cursor()
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS VolumeIssueLists("
+                + "volume_id INT,"
+                + "timestamp DATE DEFAULT (datetime('now','localtime')), "
+                + "PRIMARY KEY (volume_id))"
+            )
+
     def add_search_results(self, search_term, cv_search_results):
 
         con = lite.connect(self.db_file)
@@ -284,6 +302,8 @@ class ComicVineCacher:
                 }
                 self.upsert(cur, "issues", "id", issue["id"], data)
 
+            self.upsert(cur, "VolumeIssueLists", "volume_id", volume_id, {"timestamp": timestamp})
+
     def get_volume_info(self, volume_id):
 
         result = None
@@ -331,6 +351,13 @@ class ComicVineCacher:
             # much....
             a_week_ago = datetime.datetime.today() - datetime.timedelta(days=7)
             cur.execute("DELETE FROM Issues WHERE timestamp  < ?", [str(a_week_ago)])
+            cur.execute("DELETE FROM VolumeIssueLists WHERE timestamp  < ?", [str(a_week_ago)])
+
+            # only a list fetched whole in the last week is complete; its
+            # issues were all stored then or since, so none were purged
+            cur.execute("SELECT volume_id FROM VolumeIssueLists WHERE volume_id = ?", [volume_id])
+            if cur.fetchone() is None:
+                return result
 
             # fetch
             results = list()
@@ -356,9 +383,6 @@ class ComicVineCacher:
 
                 results.append(record)
 
-        if len(results) == 0:
-            return None
-
         return results
 
     def add_issue_select_details(self, issue_id, image_url, thumb_image_url, cover_date, site_detail_url):
@@ -14,20 +14,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
+import copy
 import datetime
+import functools
 import json
 import re
 import ssl
 import sys
+import threading
 import time
 import unicodedata
+import weakref
 
 import requests
 from bs4 import BeautifulSoup
 
-from . import ctversion, utils
+from . import ctversion, httptransport, stats, utils
 from .comicvinecacher import ComicVineCacher
 from .genericmetadata import GenericMetadata
+from .imagefetcher import ImageFetchService
 from .issuestring import IssueString
 
 # from pprint import pprint
@@ -35,7 +41,7 @@ from .issuestring import IssueString
 
 
 try:
-    from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest
+    from PyQt5.QtNetwork import QNetworkRequest
     from PyQt5.QtCore import QUrl, pyqtSignal, QObject, QByteArray
 except ImportError:
     # No Qt, so define a few dummy QObjects to help us compile
@@ -76,10 +82,78 @@ class ComicVineTalkerException(Exception):
             return "CV error #{0}:  [{1}]. \n".format(self.code, self.desc)
 
 
+class SingleFlight:
+
+    """
+    Lets concurrent callers asking for the same thing share one call.  The
+    first caller for a key makes the call; anyone asking for the same key
+    while it's running waits for it and gets the same result (or
+    exception).  When the result was shared, every caller gets its own
+    copy, since callers patch up what they get back.
+    """
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = dict()
+
+    def do(self, key, func, *args):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = SingleFlight.Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            stats.count("cv.shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+
+        if shared:
+            return copy.deepcopy(call.result)
+        return call.result
+
+
 class ComicVineTalker(QObject):
 
     logo_url = "http://static.comicvine.com/bundles/comicvinesite/images/logo.png"
     api_key = ""
+    # pointed elsewhere (e.g. at cvstandin) for offline runs
+    api_base_url = "https://comicvine.gamespot.com/api"
+
+    # volumes per /issues query, and how many of those queries run at once
+    volume_chunk_size = 25
+    volume_chunk_workers = 4
+    # a chunk of volumes with at most this many issues in total is fetched
+    # whole and cached, so later lookups in those volumes stay local
+    volume_chunk_max_issues = 500
+
+    # identical requests in flight at the same time, shared by all instances
+    in_flight = SingleFlight()
+    # url -> [(weak handler, ...)] for the async requests the GUI makes
+    async_waiters = dict()
+    async_replies = dict()
 
     @staticmethod
     def getRateLimitMessage():
@@ -91,7 +165,6 @@ class ComicVineTalker(QObject):
     def __init__(self):
         QObject.__init__(self)
 
-        self.api_base_url = "https://comicvine.gamespot.com/api"
         self.wait_for_rate_limit = False
 
         # key that is registered to comictagger
@@ -133,7 +206,7 @@ class ComicVineTalker(QObject):
         try:
             test_url = self.api_base_url + "/issue/1/?api_key=" + key + "&format=json&field_list=name"
 
-            cv_response = requests.get(test_url, headers={"user-agent": "comictagger/" + ctversion.version}).json()
+            cv_response = httptransport.get_transport().get(test_url, headers={"user-agent": "comictagger/" + ctversion.version}).json()
 
             # Bogus request, but if the key is wrong, you get error 100: "Invalid
             # API Key"
@@ -146,7 +219,14 @@ class ComicVineTalker(QObject):
     sleep for a bit and retry.
     """
 
+    @stats.timing("cv.request")
     def getCVContent(self, url, params):
+        # concurrent callers asking for the same thing share one request; one
+        # that would wait out a rate limit doesn't share with one that won't
+        key = (url, tuple(sorted((k, str(v)) for k, v in params.items())), bool(self.wait_for_rate_limit))
+        return ComicVineTalker.in_flight.do(key, self.fetchCVContent, url, dict(params))
+
+    def fetchCVContent(self, url, params):
         total_time_waited = 0
         limit_wait_time = 1
         counter = 0
@@ -155,7 +235,9 @@ class ComicVineTalker(QObject):
             cv_response = self.getUrlContent(url, params)
             if self.wait_for_rate_limit and cv_response["status_code"] == ComicVineTalkerException.RateLimit:
                 self.writeLog("Rate limit encountered.  Waiting for {0} minutes\n".format(limit_wait_time))
-                time.sleep(limit_wait_time * 60)
+                stats.count("cv.rate_limited")
+                with stats.timed("cv.rate_limit_wait"):
+                    time.sleep(limit_wait_time * 60)
                 total_time_waited += limit_wait_time
                 limit_wait_time = wait_times[counter]
                 if counter < 3:
@@ -171,6 +253,7 @@ class ComicVineTalker(QObject):
                 break
         return cv_response
 
+    @stats.timing("cv.http")
     def getUrlContent(self, url, params):
         # connect to server:
         #  if there is a 500 error, try a few more times before giving up
@@ -178,7 +261,7 @@ class ComicVineTalker(QObject):
         # print("---", url)
         for tries in range(3):
             try:
-                resp = requests.get(url, params=params, headers={"user-agent": "comictagger/" + ctversion.version})
+                resp = httptransport.get_transport().get(url, params=params, headers={"user-agent": "comictagger/" + ctversion.version})
                 if resp.status_code == 200:
                     return resp.json()
                 if resp.status_code == 500:
@@ -194,7 +277,7 @@ class ComicVineTalker(QObject):
 
         raise ComicVineTalkerException(ComicVineTalkerException.Unknown, "Error on Comic Vine server")
 
-    def literalSearchForSeries(self, series_name, callback=None):
+    def literalSearchForSeries(self, series_name, callback=None, page_callback=None):
 
         # normalize unicode and convert to ascii. Does not work for everything eg ½ to 1⁄2 not 1/2
         search_series_name = unicodedata.normalize("NFKD", series_name).encode("ascii", "ignore").decode("ascii")
@@ -235,6 +318,8 @@ class ComicVineTalker(QObject):
 
         if callback is not None:
             callback(current_result_count, total_result_count)
+        if page_callback is not None and page_callback(cv_response["results"]):
+            return search_results
 
         # see if we need to keep asking for more pages...
         while current_result_count < total_result_count:
@@ -250,10 +335,17 @@ class ComicVineTalker(QObject):
 
             if callback is not None:
                 callback(current_result_count, total_result_count)
+            if page_callback is not None and page_callback(cv_response["results"]):
+                break
 
         return search_results
 
-    def searchForSeries(self, series_name, callback=None, refresh_cache=False):
+    def searchForSeries(self, series_name, callback=None, refresh_cache=False, page_callback=None):
+        """
+        page_callback, if given, is called with each page of matching results
+        as it arrives (or once with the cached results).  If it returns True
+        no further pages are fetched and the partial results aren't cached.
+        """
 
         # normalize unicode and convert to ascii. Does not work for everything eg ½ to 1⁄2 not 1/2
         search_series_name = unicodedata.normalize("NFKD", series_name).encode("ascii", "ignore").decode("ascii")
@@ -269,6 +361,8 @@ class ComicVineTalker(QObject):
             cached_search_results = cvc.get_search_results(series_name)
 
             if len(cached_search_results) > 0:
+                if page_callback is not None:
+                    page_callback(cached_search_results)
                 return cached_search_results
 
         params = {
@@ -306,17 +400,18 @@ class ComicVineTalker(QObject):
 
         if callback is None:
             self.writeLog("Found {0} of {1} results\n".format(cv_response["number_of_page_results"], cv_response["number_of_total_results"]))
-        search_results.extend(cv_response["results"])
+        search_results.extend(self.filterSearchResults(search_series_name, cv_response["results"]))
+        last_result = cv_response["results"][-1]["name"] if cv_response["results"] else None
         page = 1
 
         if callback is not None:
             callback(current_result_count, total_result_count)
 
-        # see if we need to keep asking for more pages...
-        stop_searching = False
-        while current_result_count < total_result_count:
+        stopped = page_callback is not None and page_callback(search_results[:])
 
-            last_result = search_results[-1]["name"]
+        # see if we need to keep asking for more pages...
+        stop_searching = stopped or last_result is None
+        while not stop_searching and current_result_count < total_result_count:
 
             # normalize unicode and convert to ascii. Does not work for everything eg ½ to 1⁄2 not 1/2
             last_result = unicodedata.normalize("NFKD", last_result).encode("ascii", "ignore").decode("ascii")
@@ -354,27 +449,17 @@ class ComicVineTalker(QObject):
             params["page"] = page
             cv_response = self.getCVContent(self.api_base_url + "/search", params)
 
-            search_results.extend(cv_response["results"])
+            page_results = self.filterSearchResults(search_series_name, cv_response["results"])
+            search_results.extend(page_results)
+            if cv_response["results"]:
+                last_result = cv_response["results"][-1]["name"]
             current_result_count += cv_response["number_of_page_results"]
 
             if callback is not None:
                 callback(current_result_count, total_result_count)
-
-        # Remove any search results that don't contain all the search terms
-        # (iterate backwards for easy removal)
-        for i in range(len(search_results) - 1, -1, -1):
-            record = search_results[i]
-            for term in search_series_name.split():
-                # normalize unicode and convert to ascii. Does not work for everything eg ½ to 1⁄2 not 1/2
-                recordName = unicodedata.normalize("NFKD", record["name"]).encode("ascii", "ignore").decode("ascii")
-                # comicvine ignores punctuation and accents
-                recordName = re.sub(r"[^A-Za-z0-9]+", " ", recordName)
-                # remove extra space and articles and all lower case
-                recordName = utils.removearticles(recordName).lower().strip()
-
-                if term not in recordName:
-                    del search_results[i]
-                    break
+            if page_callback is not None and page_callback(page_results):
+                stopped = True
+                break
 
         # for record in search_results:
         # print(u"{0}: {1} ({2})".format(record['id'], record['name'] , record['start_year']))
@@ -382,11 +467,28 @@ class ComicVineTalker(QObject):
         # record['count_of_issues'] = record['count_of_isssues']
         # print(u"{0}: {1} ({2})".format(search_results['results'][0]['id'], search_results['results'][0]['name'] , search_results['results'][0]['start_year']))
 
-        # cache these search results
-        cvc.add_search_results(series_name, search_results)
+        # cache these search results, unless the caller cut the search short
+        if not stopped:
+            cvc.add_search_results(series_name, search_results)
 
         return search_results
 
+    def filterSearchResults(self, search_series_name, results):
+        # Remove any search results that don't contain all the search terms
+        terms = search_series_name.split()
+        filtered = []
+        for record in results:
+            # normalize unicode and convert to ascii. Does not work for everything eg ½ to 1⁄2 not 1/2
+            recordName = unicodedata.normalize("NFKD", record["name"]).encode("ascii", "ignore").decode("ascii")
+            # comicvine ignores punctuation and accents
+            recordName = re.sub(r"[^A-Za-z0-9]+", " ", recordName)
+            # remove extra space and articles and all lower case
+            recordName = utils.removearticles(recordName).lower().strip()
+
+            if all(term in recordName for term in terms):
+                filtered.append(record)
+        return filtered
+
     def fetchVolumeData(self, series_id):
 
         # before we search online, look in our cache, since we might already
@@ -456,11 +558,119 @@ class ComicVineTalker(QObject):
 
         return volume_issues_result
 
-    def fetchIssuesByVolumeIssueNumAndYear(self, volume_id_list, issue_number, year):
-        volume_filter = ""
+    def fetchIssuesByVolumeIssueNumAndYear(self, volume_id_list, issue_number, year, issue_counts=None):
+
+        # answer from the cache for every volume whose issue list we
+        # already have, and only go online for the rest
+        cvc = ComicVineCacher()
+        filtered_issues_result = list()
+        missing_volume_ids = list()
+        for vid in volume_id_list:
+            cached_volume_issues_result = cvc.get_volume_issues_info(vid)
+            if cached_volume_issues_result is not None:
+                filtered_issues_result.extend(self.withVolume(self.filterIssuesByNumAndYear(cached_volume_issues_result, issue_number, year), vid))
+            else:
+                missing_volume_ids.append(vid)
+
+        whole_chunks, large_volume_ids = self.chunkVolumesByIssueCount(missing_volume_ids, issue_counts)
+        size = self.volume_chunk_size
+        queries = [(self.fetchVolumeIssueLists, chunk) for chunk in whole_chunks]
+        queries += [(self.fetchIssuesByVolumeChunk, large_volume_ids[i : i + size]) for i in range(0, len(large_volume_ids), size)]
+        filtered_issues_result.extend(self.runVolumeQueries(queries, issue_number, year))
+
+        return filtered_issues_result
+
+    def prefetchIssuesByVolume(self, series_list):
+        """Fetch and cache the issue lists of any of these search results
+        not cached yet"""
+
+        cvc = ComicVineCacher()
+        missing_volume_ids = [series["id"] for series in series_list if cvc.get_volume_issues_info(series["id"]) is None]
+        issue_counts = dict((series["id"], series.get("count_of_issues")) for series in series_list)
+
+        # volumes too big to take whole are left to the lookups by number
+        whole_chunks, large_volume_ids = self.chunkVolumesByIssueCount(missing_volume_ids, issue_counts)
+        self.runVolumeQueries([(self.fetchVolumeIssueLists, chunk) for chunk in whole_chunks], None, None)
+
+    def chunkVolumesByIssueCount(self, volume_id_list, issue_counts):
+        # pack volumes into chunks of at most volume_chunk_size volumes and
+        # volume_chunk_max_issues issues, going by the count_of_issues in
+        # the search results; a volume with no count, or too many issues on
+        # its own, is looked up by issue number instead
+        if issue_counts is None:
+            issue_counts = dict()
+
+        chunks = list()
+        large_volume_ids = list()
+        chunk = list()
+        chunk_issues = 0
         for vid in volume_id_list:
-            volume_filter += str(vid) + "|"
-        filter = "volume:{},issue_number:{}".format(volume_filter, issue_number)
+            count = issue_counts.get(vid)
+            if count is None or count > self.volume_chunk_max_issues:
+                large_volume_ids.append(vid)
+                continue
+            if len(chunk) == self.volume_chunk_size or chunk_issues + count > self.volume_chunk_max_issues:
+                chunks.append(chunk)
+                chunk = list()
+                chunk_issues = 0
+            chunk.append(vid)
+            chunk_issues += count
+        if len(chunk) > 0:
+            chunks.append(chunk)
+
+        return chunks, large_volume_ids
+
+    def withVolume(self, issues, vid):
+        # the cached records carry no volume; tag copies, not the records
+        # the cacher handed out
+        result = list()
+        for issue in issues:
+            issue = dict(issue)
+            issue["volume"] = {"id": vid}
+            result.append(issue)
+        return result
+
+    def runVolumeQueries(self, queries, issue_number, year):
+        # queries is a list of (method, volume id chunk)
+        result = list()
+        if len(queries) == 1:
+            query, chunk = queries[0]
+            result.extend(query(chunk, issue_number, year))
+        elif len(queries) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.volume_chunk_workers, len(queries))) as pool:
+                for chunk_result in pool.map(lambda q: q[0](q[1], issue_number, year), queries):
+                    result.extend(chunk_result)
+        return result
+
+    def fetchVolumeIssueLists(self, volume_id_list, issue_number, year):
+
+        params = {
+            "api_key": self.api_key,
+            "format": "json",
+            "field_list": "id,volume,issue_number,name,image,cover_date,site_detail_url,description",
+            "filter": "volume:" + "|".join([str(vid) for vid in volume_id_list]),
+        }
+
+        # take the whole issue lists of these volumes and cache them, then
+        # pick out the issue locally
+        cv_response = self.getCVContent(self.api_base_url + "/issues/", params)
+        volume_issues_result = self.fetchRemainingIssuePages(params, cv_response)
+        self.repairUrls(volume_issues_result)
+
+        issues_by_volume = dict((vid, list()) for vid in volume_id_list)
+        for issue in volume_issues_result:
+            issues_by_volume.setdefault(issue["volume"]["id"], []).append(issue)
+        cvc = ComicVineCacher()
+        for vid, issues in issues_by_volume.items():
+            cvc.add_volume_issues_info(vid, issues)
+
+        if issue_number is None:
+            return []
+        return self.filterIssuesByNumAndYear(volume_issues_result, issue_number, year)
+
+    def fetchIssuesByVolumeChunk(self, volume_id_list, issue_number, year):
+
+        filter = "volume:{},issue_number:{}".format("|".join([str(vid) for vid in volume_id_list]), issue_number)
 
         intYear = utils.xlate(year, True)
         if intYear is not None:
@@ -473,35 +683,56 @@ class ComicVineTalker(QObject):
             "filter": filter,
         }
 
-        cv_response = self.getCVContent(self.api_base_url + "/issues", params)
+        cv_response = self.getCVContent(self.api_base_url + "/issues/", params)
+        filtered_issues_result = self.fetchRemainingIssuePages(params, cv_response)
+        self.repairUrls(filtered_issues_result)
 
-        # ------------------------------------
+        # these aren't complete volume lists, so only cache the cover details
+        for issue in filtered_issues_result:
+            self.cacheIssueSelectDetails(
+                issue["id"], issue["image"]["super_url"], issue["image"]["thumb_url"], issue["cover_date"], issue["site_detail_url"]
+            )
+
+        return filtered_issues_result
+
+    def fetchRemainingIssuePages(self, params, cv_response):
 
-        limit = cv_response["limit"]
         current_result_count = cv_response["number_of_page_results"]
         total_result_count = cv_response["number_of_total_results"]
-        # print("total_result_count", total_result_count)
 
-        # print("Found {0} of {1} results\n".format(cv_response['number_of_page_results'], cv_response['number_of_total_results']))
-        filtered_issues_result = cv_response["results"]
-        page = 1
+        issues_result = cv_response["results"]
         offset = 0
 
         # see if we need to keep asking for more pages...
         while current_result_count < total_result_count:
-            # print("getting another page of issue results {0} of {1}...\n".format(current_result_count, total_result_count))
-            page += 1
             offset += cv_response["number_of_page_results"]
 
             params["offset"] = offset
             cv_response = self.getCVContent(self.api_base_url + "/issues/", params)
 
-            filtered_issues_result.extend(cv_response["results"])
+            issues_result.extend(cv_response["results"])
             current_result_count += cv_response["number_of_page_results"]
 
-        self.repairUrls(filtered_issues_result)
+        return issues_result
 
-        return filtered_issues_result
+    def filterIssuesByNumAndYear(self, issues, issue_number, year):
+        # the same selection the /issues filter makes: the issue number, and
+        # a cover date from the start of the year to the start of the next
+        issue_number = IssueString(issue_number).asString().lower()
+
+        intYear = utils.xlate(year, True)
+        if intYear is not None:
+            start = "{0:04d}-01-01".format(intYear)
+            end = "{0:04d}-01-01".format(intYear + 1)
+
+        filtered = list()
+        for issue in issues:
+            if IssueString(issue["issue_number"]).asString().lower() != issue_number:
+                continue
+            if intYear is not None and (issue["cover_date"] is None or not start <= issue["cover_date"][:10] <= end):
+                continue
+            filtered.append(issue)
+        return filtered
 
     def fetchIssueData(self, series_id, issue_number, settings):
 
@@ -760,7 +991,7 @@ class ComicVineTalker(QObject):
             return url_list
 
         # scrape the CV issue page URL to get the alternate cover URLs
-        content = requests.get(issue_page_url, headers={"user-agent": "comictagger/" + ctversion.version}).text
+        content = httptransport.get_transport().get(issue_page_url, headers={"user-agent": "comictagger/" + ctversion.version}).text
         alt_cover_url_list = self.parseOutAltCoverUrls(content)
 
         # cache this alt cover URL list
@@ -825,14 +1056,9 @@ class ComicVineTalker(QObject):
             + self.api_key
             + "&format=json&field_list=image,cover_date,site_detail_url"
         )
-        self.nam = QNetworkAccessManager()
-        self.nam.finished.connect(self.asyncFetchIssueCoverURLComplete)
-        self.nam.get(QNetworkRequest(QUrl(issue_url)))
+        self.asyncGet(issue_url, self.asyncFetchIssueCoverURLComplete)
 
-    def asyncFetchIssueCoverURLComplete(self, reply):
-
-        # read in the response
-        data = reply.readAll()
+    def asyncFetchIssueCoverURLComplete(self, data):
 
         try:
             cv_response = json.loads(bytes(data))
@@ -864,13 +1090,11 @@ class ComicVineTalker(QObject):
             self.altUrlListFetchComplete.emit(url_list, int(self.issue_id))
             return
 
-        self.nam = QNetworkAccessManager()
-        self.nam.finished.connect(self.asyncFetchAlternateCoverURLsComplete)
-        self.nam.get(QNetworkRequest(QUrl(str(issue_page_url))))
+        self.asyncGet(str(issue_page_url), self.asyncFetchAlternateCoverURLsComplete)
 
-    def asyncFetchAlternateCoverURLsComplete(self, reply):
+    def asyncFetchAlternateCoverURLsComplete(self, data):
         # read in the response
-        html = str(reply.readAll())
+        html = str(data)
         alt_cover_url_list = self.parseOutAltCoverUrls(html)
 
         # cache this alt cover URL list
@@ -878,6 +1102,34 @@ class ComicVineTalker(QObject):
 
         self.altUrlListFetchComplete.emit(alt_cover_url_list, int(self.issue_id))
 
+    def asyncGet(self, url, handler):
+        """
+        Fetch url on the app's shared network manager and call handler with
+        the data.  Talkers asking for a URL that's already on its way share
+        the reply; a talker that's been thrown away in the meantime is
+        skipped, as if its request had been cancelled.
+        """
+        waiters = ComicVineTalker.async_waiters.get(url)
+        if waiters is not None:
+            waiters.append(weakref.WeakMethod(handler))
+            return
+
+        ComicVineTalker.async_waiters[url] = [weakref.WeakMethod(handler)]
+        reply = ImageFetchService.instance().nam.get(QNetworkRequest(QUrl(url)))
+        reply.finished.connect(functools.partial(ComicVineTalker.asyncGetComplete, url))
+        ComicVineTalker.async_replies[url] = reply
+
+    @staticmethod
+    def asyncGetComplete(url):
+        reply = ComicVineTalker.async_replies.pop(url)
+        data = reply.readAll()
+        reply.deleteLater()
+
+        for ref in ComicVineTalker.async_waiters.pop(url):
+            handler = ref()
+            if handler is not None:
+                handler(QByteArray(data))
+
     def repairUrls(self, issue_list):
         # make sure there are URLs for the image fields
         for issue in issue_list:
@@ -75,8 +75,11 @@ class CoverImageWidget(QWidget):
 
         self.mode = mode
         self.comicVine = ComicVineTalker()
-        self.page_loader = None
+        self.page_loader = PageLoader.instance()
+        self.page_loader.pageLoaded.connect(self.pageLoaded)
         self.showControls = True
+        # how many pages either side of the current one to load ahead
+        self.prefetchCount = 1
 
         self.btnLeft.setIcon(QIcon(ComicTaggerSettings.getGraphic("left.png")))
         self.btnRight.setIcon(QIcon(ComicTaggerSettings.getGraphic("right.png")))
@@ -97,9 +100,8 @@ class CoverImageWidget(QWidget):
         self.comicVine = None
         self.cover_fetcher = None
         self.url_list = []
-        if self.page_loader is not None:
-            self.page_loader.abandoned = True
-        self.page_loader = None
+        self.page_loader.cancel(self)
+        self.prefetch_pages = None
         self.imageIndex = -1
         self.imageCount = 1
         self.imageData = None
@@ -187,9 +189,10 @@ class CoverImageWidget(QWidget):
             self.imageCount = len(self.url_list)
         self.updateControls()
 
-    def setPage(self, pagenum):
+    def setPage(self, pagenum, prefetch_pages=None):
         if self.mode == CoverImageWidget.ArchiveMode:
             self.imageIndex = pagenum
+            self.prefetch_pages = prefetch_pages
             self.updateContent()
 
     def updateContent(self):
@@ -247,16 +250,31 @@ class CoverImageWidget(QWidget):
 
     def loadPage(self):
         if self.comic_archive is not None:
-            if self.page_loader is not None:
-                self.page_loader.abandoned = True
-            self.page_loader = PageLoader(self.comic_archive, self.imageIndex)
-            self.page_loader.loadComplete.connect(self.pageLoadComplete)
-            self.page_loader.start()
+            prefetch_pages = self.prefetch_pages
+            if prefetch_pages is None:
+                prefetch_pages = self.neighbourPages()
+            img = self.page_loader.request(self, self.comic_archive, self.imageIndex, prefetch_pages)
+            if img is not None:
+                self.pageLoadComplete(img)
+
+    def neighbourPages(self):
+        pages = []
+        if self.imageCount <= 1:
+            return pages
+        for i in range(1, self.prefetchCount + 1):
+            for p in ((self.imageIndex + i) % self.imageCount, (self.imageIndex - i) % self.imageCount):
+                if p != self.imageIndex and p not in pages:
+                    pages.append(p)
+        return pages
+
+    def pageLoaded(self, path, page_num, img):
+        if self.mode == CoverImageWidget.ArchiveMode and self.comic_archive is not None:
+            if path == self.comic_archive.path and page_num == self.imageIndex:
+                self.pageLoadComplete(img)
 
     def pageLoadComplete(self, img):
         self.current_pixmap = QPixmap(img)
         self.setDisplayPixmap(0, 0)
-        self.page_loader = None
 
     def loadDefault(self):
         self.current_pixmap = QPixmap(ComicTaggerSettings.getGraphic("nocover.png"))
@@ -0,0 +1,278 @@
+"""A local stand-in for the Comic Vine API, serving fixture data"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import getopt
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ComicVineStandIn:
+
+    """
+    Fixtures are a JSON file of the form:
+
+        {
+            "volumes": [{"id": 1, "name": "Foo", "start_year": "2001",
+                         "publisher": {"name": "Bar"}, "count_of_issues": 3}, ...],
+            "issues": [{"id": 10, "volume": {"id": 1}, "issue_number": "1",
+                        "cover_date": "2001-04-01", "name": "...",
+                        "alt_image_urls": [...]}, ...]
+        }
+
+    Records are returned the way Comic Vine would, with the fields the
+    talker expects filled in when the fixture leaves them out.  Images and
+    issue pages point back at the stand-in: /image/<file> serves files from
+    the image folder, and /page/4000-<id>/ is an issue page with the cover
+    and any alt_image_urls in it, for the alternate cover scraping.
+
+    Run it with:
+
+        python -m comictaggerlib.cvstandin [--port=PORT] [--images=DIR] fixtures.json
+
+    and pass the printed URL to comictagger with --cv-url.
+    """
+
+    def __init__(self, fixtures, host="127.0.0.1", port=0, image_dir=None):
+        self.image_dir = image_dir
+        self.server = ThreadingHTTPServer((host, port), StandInRequestHandler)
+        self.server.standin = self
+        self.thread = None
+
+        host, port = self.server.server_address[:2]
+        self.root_url = "http://{0}:{1}".format(host, port)
+        self.url = self.root_url + "/api"
+
+        self.volumes = dict()
+        self.issues = dict()
+        self.loadFixtures(fixtures)
+
+    @staticmethod
+    def readFixtures(path):
+        with open(path) as f:
+            return json.load(f)
+
+    def loadFixtures(self, fixtures):
+        for volume in fixtures.get("volumes", []):
+            volume = dict(volume)
+            volume.setdefault("name", "")
+            volume.setdefault("start_year", None)
+            volume.setdefault("publisher", None)
+            volume.setdefault("description", None)
+            volume.setdefault("image", None)
+            self.volumes[int(volume["id"])] = volume
+
+        for issue in fixtures.get("issues", []):
+            issue = dict(issue)
+            vid = int(issue["volume"]["id"])
+            issue["volume"] = {"id": vid, "name": self.volumes.get(vid, {}).get("name", "")}
+            for key in ["name", "description", "cover_date"]:
+                issue.setdefault(key, None)
+            for key in ["character_credits", "location_credits", "person_credits", "story_arc_credits", "team_credits"]:
+                issue.setdefault(key, [])
+            issue.setdefault("site_detail_url", "{0}/page/4000-{1}/".format(self.root_url, issue["id"]))
+            if "image" not in issue:
+                cover = "{0}/image/{1}.jpg".format(self.root_url, issue["id"])
+                issue["image"] = {"super_url": cover, "thumb_url": cover}
+            self.issues[int(issue["id"])] = issue
+
+        # the real thing counts them for us
+        for volume in self.volumes.values():
+            if "count_of_issues" not in volume:
+                volume["count_of_issues"] = len([i for i in self.issues.values() if i["volume"]["id"] == volume["id"]])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def search(self, params):
+        words = [w for w in re.split(r"\W+", params.get("query", "").lower()) if w]
+        matches = []
+        for volume in self.volumes.values():
+            name_words = set(re.split(r"\W+", volume["name"].lower()))
+            # terms are ORed, best matches first
+            hits = len([w for w in words if w in name_words])
+            if hits:
+                matches.append((-hits, volume["id"], volume))
+        matches.sort(key=lambda m: m[:2])
+        results = [m[2] for m in matches]
+
+        limit = int(params.get("limit", 10))
+        offset = (int(params.get("page", 1)) - 1) * limit
+        return self.listResponse(results, offset, limit, params)
+
+    def issueList(self, params):
+        filters = dict()
+        for f in params.get("filter", "").split(","):
+            if ":" in f:
+                name, value = f.split(":", 1)
+                filters[name] = value.split("|")
+
+        results = []
+        for issue in sorted(self.issues.values(), key=lambda i: i["id"]):
+            if "volume" in filters and str(issue["volume"]["id"]) not in filters["volume"]:
+                continue
+            if "issue_number" in filters and str(issue["issue_number"]).lower() not in [n.lower() for n in filters["issue_number"]]:
+                continue
+            if "cover_date" in filters:
+                if issue["cover_date"] is None:
+                    continue
+                start, end = [self.parseDate(d) for d in filters["cover_date"]]
+                if not start <= self.parseDate(issue["cover_date"]) <= end:
+                    continue
+            results.append(issue)
+
+        return self.listResponse(results, int(params.get("offset", 0)), 100, params)
+
+    @staticmethod
+    def parseDate(date_str):
+        return tuple(int(p) for p in date_str.split("-"))
+
+    def listResponse(self, results, offset, limit, params):
+        page = [self.selectFields(r, params) for r in results[offset : offset + limit]]
+        return {
+            "error": "OK",
+            "limit": limit,
+            "offset": offset,
+            "number_of_page_results": len(page),
+            "number_of_total_results": len(results),
+            "status_code": 1,
+            "results": page,
+        }
+
+    def detailResponse(self, record, params):
+        if record is None:
+            return {"error": "Object Not Found", "status_code": 101, "results": []}
+        return {
+            "error": "OK",
+            "limit": 1,
+            "offset": 0,
+            "number_of_page_results": 1,
+            "number_of_total_results": 1,
+            "status_code": 1,
+            "results": self.selectFields(record, params),
+        }
+
+    @staticmethod
+    def selectFields(record, params):
+        record = {k: v for k, v in record.items() if k != "alt_image_urls"}
+        if "field_list" not in params:
+            return record
+        fields = params["field_list"].split(",")
+        return {k: v for k, v in record.items() if k in fields}
+
+    def issuePage(self, issue_id):
+        issue = self.issues.get(issue_id)
+        if issue is None:
+            return None
+        covers = [issue["image"]["super_url"]] + issue.get("alt_image_urls", [])
+        divs = ['<div class="imgboxart issue-cover"><img src="{0}"></div>'.format(url) for url in covers]
+        return "<html><body>{0}</body></html>".format("".join(divs))
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        standin = self.server.standin
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts[:1] == ["api"] and len(parts) >= 2:
+            if parts[1] == "search":
+                return self.sendJSON(standin.search(params))
+            if parts[1] == "issues":
+                return self.sendJSON(standin.issueList(params))
+            if parts[1] in ["volume", "issue"] and len(parts) >= 3:
+                record_id = self.recordID(parts[2])
+                records = standin.volumes if parts[1] == "volume" else standin.issues
+                return self.sendJSON(standin.detailResponse(records.get(record_id), params))
+
+        if parts[:1] == ["page"] and len(parts) >= 2:
+            page = standin.issuePage(self.recordID(parts[1]))
+            if page is not None:
+                return self.send(200, "text/html", page.encode("utf-8"))
+
+        if parts[:1] == ["image"] and len(parts) == 2 and standin.image_dir is not None:
+            path = os.path.join(standin.image_dir, parts[1])
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                    return self.send(200, content_type, f.read())
+
+        self.send(404, "text/plain", b"Not Found")
+
+    @staticmethod
+    def recordID(part):
+        # e.g. 4050-1234
+        try:
+            return int(part.split("-")[-1])
+        except ValueError:
+            return None
+
+    def sendJSON(self, response):
+        self.send(200, "application/json", json.dumps(response).encode("utf-8"))
+
+    def send(self, code, content_type, content):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "", ["port=", "images="])
+    except getopt.GetoptError as err:
+        print(err, file=sys.stderr)
+        sys.exit(2)
+    if len(args) != 1:
+        print("usage: cvstandin [--port=PORT] [--images=DIR] fixtures.json", file=sys.stderr)
+        sys.exit(2)
+
+    port = 0
+    image_dir = None
+    for o, a in opts:
+        if o == "--port":
+            port = int(a)
+        if o == "--images":
+            image_dir = a
+
+    standin = ComicVineStandIn(ComicVineStandIn.readFixtures(args[0]), port=port, image_dir=image_dir)
+    print(standin.url)
+    sys.stdout.flush()
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""A PyQt5 thread to export archives as zips on a pool of processes"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import pyqtSignal
+
+from .comicarchive import ComicArchive
+
+
+def export_as_zip(path, export_name, rar_exe_path, default_image_path):
+    """Runs in a worker process; returns True if the zip was written"""
+    ca = ComicArchive(path, rar_exe_path, default_image_path)
+    if ca.exportAsZip(export_name):
+        return True
+
+    # the export failed, so remove the zip, if it exists
+    if os.path.lexists(export_name):
+        os.remove(export_name)
+    return False
+
+
+def unique_export_name(export_name, planned):
+    """Like utils.unique_file, but also avoids names already in planned"""
+    counter = 1
+    name_parts = os.path.splitext(export_name)
+    while os.path.lexists(export_name) or export_name in planned:
+        export_name = name_parts[0] + " (" + str(counter) + ")" + name_parts[1]
+        counter += 1
+    return export_name
+
+
+class ExportThread(QtCore.QThread):
+
+    """
+    Exports each (path, export_name) job on a pool of processes, emitting
+    archiveExported with the job index and the outcome as each one ends.
+    Call abandon() to stop; exports already running are allowed to finish
+    and are still reported.
+    """
+
+    archiveExported = pyqtSignal(int, bool)
+
+    def __init__(self, jobs, rar_exe_path, default_image_path, workers=None):
+        QtCore.QThread.__init__(self)
+        self.jobs = jobs
+        self.rar_exe_path = rar_exe_path
+        self.default_image_path = default_image_path
+        self.workers = workers or os.cpu_count() or 1
+        self.abandoned = False
+
+    def abandon(self):
+        self.abandoned = True
+
+    def run(self):
+        if len(self.jobs) == 0:
+            return
+
+        # spawn rather than fork; the GUI process has Qt threads running
+        ctx = multiprocessing.get_context("spawn")
+        workers = min(self.workers, len(self.jobs))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = dict()
+            for i, (path, export_name) in enumerate(self.jobs):
+                futures[pool.submit(export_as_zip, path, export_name, self.rar_exe_path, self.default_image_path)] = i
+
+            for future in concurrent.futures.as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    success = future.result()
+                except Exception as e:
+                    print("Error exporting {0}:".format(self.jobs[futures[future]][0]), e, file=sys.stderr)
+                    success = False
+
+                self.archiveExported.emit(futures[future], success)
+
+                if self.abandoned:
+                    for f in futures:
+                        f.cancel()
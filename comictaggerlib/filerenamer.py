@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import os
 import re
 import string
@@ -24,68 +25,130 @@ from pathvalidate import sanitize_filepath
 from . import utils
 from .issuestring import IssueString
 
+_formatter = string.Formatter()
+_conversions = {None: None, "s": str, "r": repr, "a": ascii}
 
-class MetadataFormatter(string.Formatter):
-    def __init__(self, smart_cleanup=False):
-        super().__init__()
-        self.smart_cleanup = smart_cleanup
+_field_first = re.compile(r"[^.[]*")
+_field_part = re.compile(r"\.([^.[]+)|\[([^\]]+)\]")
+
+
+def _split_field_name(field_name):
+    """Splits e.g. "md.credits[0]" into ("md", [(True, "credits"), (False, 0)]), like str.format does"""
+    first = _field_first.match(field_name).group()
+    pos = len(first)
+    rest = []
+    while pos < len(field_name):
+        match = _field_part.match(field_name, pos)
+        if match is None:
+            raise ValueError("Invalid field name {0}".format(field_name))
+        if match.group(1) is not None:
+            rest.append((True, match.group(1)))
+        else:
+            key = match.group(2)
+            rest.append((False, int(key) if key.isdigit() else key))
+        pos = match.end()
+
+    if first.isdigit():
+        first = int(first)
+    return first, rest
+
+
+class CompiledTemplate:
+    """
+    A rename template, parsed once and reused for every file.
 
-    def format_field(self, value, format_spec):
-        if value is None or value == "":
-            return ""
-        return super().format_field(value, format_spec)
+    Each path component is turned into a list of steps: the literal text
+    before a field (as is, and with the smart cleanup characters already
+    stripped), plus the field's name, its attribute/index chain, conversion
+    and format spec.  Formatting a file is then just lookups and format().
+    """
 
-    def _vformat(self, format_string, args, kwargs, used_args, recursion_depth, auto_arg_index=0):
+    def __init__(self, template, smart_cleanup=False):
+        self.smart_cleanup = smart_cleanup
+        self.components = [self.compile(component, 2) for component in template.split(os.sep)]
+
+    def compile(self, format_string, recursion_depth):
         if recursion_depth < 0:
             raise ValueError("Max string recursion exceeded")
+
+        steps = []
+        for literal_text, field_name, format_spec, conversion in _formatter.parse(format_string):
+            field = None
+            if field_name is not None:
+                first, rest = _split_field_name(field_name)
+                # there are never any positional arguments
+                if field_name == "" or isinstance(first, int):
+                    raise IndexError("Replacement index {0} out of range for positional args tuple".format(first or 0))
+                if conversion not in _conversions:
+                    raise ValueError("Unknown conversion specifier {0}".format(conversion))
+
+                spec = format_spec
+                if "{" in format_spec:
+                    spec = self.compile(format_spec, recursion_depth - 1)
+                field = (first, rest, _conversions[conversion], spec)
+
+            steps.append((literal_text, literal_text.lstrip("-_)}]#"), field))
+        return steps
+
+    def render(self, steps, values):
         result = []
         lstrip = False
-        for literal_text, field_name, format_spec, conversion in self.parse(format_string):
+        for literal_text, stripped_text, field in steps:
 
             # output the literal text
             if literal_text:
                 if lstrip:
-                    result.append(literal_text.lstrip("-_)}]#"))
+                    result.append(stripped_text)
                 else:
                     result.append(literal_text)
             lstrip = False
-            # if there's a field, output it
-            if field_name is not None:
-                # this is some markup, find the object and do
-                #  the formatting
-
-                # handle arg indexing when empty field_names are given.
-                if field_name == "":
-                    if auto_arg_index is False:
-                        raise ValueError("cannot switch from manual field specification to automatic field numbering")
-                    field_name = str(auto_arg_index)
-                    auto_arg_index += 1
-                elif field_name.isdigit():
-                    if auto_arg_index:
-                        raise ValueError("cannot switch from manual field specification to automatic field numbering")
-                    # disable auto arg incrementing, if it gets
-                    # used later on, then an exception will be raised
-                    auto_arg_index = False
-
-                # given the field_name, find the object it references
-                #  and the argument it came from
-                obj, arg_used = self.get_field(field_name, args, kwargs)
-                used_args.add(arg_used)
-
-                # do any conversion on the resulting object
-                obj = self.convert_field(obj, conversion)
-
-                # expand the format spec, if needed
-                format_spec, auto_arg_index = self._vformat(format_spec, args, kwargs, used_args, recursion_depth - 1, auto_arg_index=auto_arg_index)
-
-                # format the object and append to the result
-                fmtObj = self.format_field(obj, format_spec)
-                if fmtObj == "" and len(result) > 0 and self.smart_cleanup:
+
+            if field is not None:
+                first, rest, convert, spec = field
+
+                # unknown names are left in the output as they are
+                if first in values:
+                    obj = values[first]
+                else:
+                    obj = "{" + first + "}"
+                for is_attr, key in rest:
+                    if is_attr:
+                        obj = getattr(obj, key)
+                    else:
+                        obj = obj[key]
+
+                if convert is not None:
+                    obj = convert(obj)
+                if not isinstance(spec, str):
+                    spec = self.render(spec, values)
+
+                if obj is None or obj == "":
+                    text = ""
+                else:
+                    text = format(obj, spec)
+
+                if text == "" and len(result) > 0 and self.smart_cleanup:
                     lstrip = True
                     result.pop()
-                result.append(fmtObj)
+                result.append(text)
+
+        return "".join(result)
+
+    def format(self, values):
+        new_name = ""
+        for steps in self.components:
+            new_name = os.path.join(new_name, self.render(steps, values).replace("/", "-"))
+        return new_name
+
 
-        return "".join(result), auto_arg_index
+@functools.lru_cache(maxsize=16)
+def compile_template(template, smart_cleanup):
+    return CompiledTemplate(template, smart_cleanup)
+
+
+# pathvalidate builds a validator per call, which costs more than the
+# formatting itself; a re-run preview asks for the same names again
+_sanitize_filepath = functools.lru_cache(maxsize=4096)(sanitize_filepath)
 
 
 class FileRenamer:
@@ -109,23 +172,15 @@ class FileRenamer:
         self.template = template
 
     def determineName(self, filename, ext=None):
-        class Default(dict):
-            def __missing__(self, key):
-                return "{" + key + "}"
-
         md = self.metdata
 
-        # padding for issue
-        md.issue = IssueString(md.issue).asString(pad=self.issue_zero_padding)
+        template = compile_template(self.template, self.smart_cleanup)
 
-        template = self.template
-
-        pathComponents = template.split(os.sep)
-        new_name = ""
+        # padding for issue
+        values = md.asDict()
+        values["issue"] = IssueString(md.issue).asString(pad=self.issue_zero_padding)
 
-        fmt = MetadataFormatter(self.smart_cleanup)
-        for Component in pathComponents:
-            new_name = os.path.join(new_name, fmt.vformat(Component, args=[], kwargs=Default(vars(md))).replace("/", "-"))
+        new_name = template.format(values)
 
         if ext is None or ext == "":
             ext = os.path.splitext(filename)[1]
@@ -136,9 +191,69 @@ class FileRenamer:
         new_name = new_name.replace(": ", " - ")
         new_name = new_name.replace(":", "-")
 
-        # remove padding
-        md.issue = IssueString(md.issue).asString()
         if self.move:
-            return sanitize_filepath(new_name.strip())
+            return _sanitize_filepath(new_name.strip())
         else:
-            return os.path.basename(sanitize_filepath(new_name.strip()))
+            return os.path.basename(_sanitize_filepath(new_name.strip()))
+
+
+class RenamePlanner:
+    """
+    Works out where each file in a batch rename will end up.
+
+    Each target folder is listed once; after that, name collisions are
+    resolved against the names on disk plus the ones already planned in
+    this batch, the same way utils.unique_file would, without going back
+    to the filesystem for every candidate.
+    """
+
+    def __init__(self):
+        self.folder_names = dict()
+
+    def namesIn(self, folder):
+        names = self.folder_names.get(folder)
+        if names is None:
+            names = set()
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        names.add(os.path.normcase(entry.name))
+            except OSError:
+                pass
+            self.folder_names[folder] = names
+        return names
+
+    def plan(self, path, new_path):
+        """Returns the path to rename path to, or None if it's already there"""
+        path = os.path.abspath(path)
+        new_path = os.path.abspath(new_path)
+        if new_path == path:
+            return None
+        if os.path.normcase(new_path) == os.path.normcase(path):
+            # only the case is changing
+            return new_path
+
+        folder, name = os.path.split(new_path)
+        names = self.namesIn(folder)
+        base, ext = os.path.splitext(name)
+        counter = 1
+        while os.path.normcase(name) in names:
+            name = base + " (" + str(counter) + ")" + ext
+            counter += 1
+        names.add(os.path.normcase(name))
+
+        # the old name is free for later files in the batch
+        old_folder, old_name = os.path.split(path)
+        self.namesIn(old_folder).discard(os.path.normcase(old_name))
+
+        return os.path.join(folder, name)
+
+    @staticmethod
+    def apply(path, new_path):
+        """Renames path to new_path, creating folders as needed"""
+        os.makedirs(os.path.dirname(new_path), 0o777, True)
+        # something may have appeared there since the plan was made
+        if os.path.lexists(new_path):
+            new_path = utils.unique_file(new_path)
+        os.rename(path, new_path)
+        return new_path
@@ -15,11 +15,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import os
 import platform
 
 # import os
 import sys
+import weakref
+from array import array
 
 from PyQt5 import uic
 from PyQt5.QtCore import *
@@ -29,7 +32,7 @@ from PyQt5.QtWidgets import *
 
 from comictaggerlib.ui.qtutils import centerWindowOnParent, reduceWidgetFontSize
 
-from . import utils
+from .archiveloader import ArchiveLoader
 from .comicarchive import ComicArchive
 from .optionalmsgdialog import OptionalMessageDialog
 from .settings import ComicTaggerSettings
@@ -38,22 +41,22 @@ from .settings import ComicTaggerSettings
 # from genericmetadata import GenericMetadata, PageType
 
 
-class FileTableWidgetItem(QTableWidgetItem):
-    def __lt__(self, other):
-        # return (self.data(Qt.UserRole).toBool() <
-        #        other.data(Qt.UserRole).toBool())
-        return self.data(Qt.UserRole) < other.data(Qt.UserRole)
-
-
 class FileInfo:
     def __init__(self, ca):
         self.ca = ca
 
 
-class FileSelectionList(QWidget):
+class FileSelectionModel(QAbstractTableModel):
 
-    selectionChanged = pyqtSignal(QVariant)
-    listCleared = pyqtSignal()
+    """
+    Table model for the file list.
+
+    Rows are kept column-wise: a list of paths plus a byte each for the
+    archive type and the tag/read-only flags.  The view order is a list of
+    indexes into those, so sorting and filtering never touch the rows
+    themselves.  ComicArchive objects are only made when a row is asked
+    for, and the most recently used ones are kept around.
+    """
 
     fileColNum = 0
     CRFlagColNum = 1
@@ -61,8 +64,310 @@ class FileSelectionList(QWidget):
     typeColNum = 3
     readonlyColNum = 4
     folderColNum = 5
+
+    headers = [
+        ("File", "File Name"),
+        ("CR", "Has ComicRack Tags"),
+        ("CBL", "Has ComicBookLover Tags"),
+        ("Type", "Archive Type"),
+        ("R/O", "Read-Only"),
+        ("Folder", "File Location"),
+    ]
+
+    typeNone, typeZip, typeRar = list(range(3))
+    typeNames = ["", "ZIP", "RAR"]
+
+    cixFlag = 0x01
+    cbiFlag = 0x02
+    readonlyFlag = 0x04
+
+    archive_cache_size = 256
+
+    def __init__(self, settings, parent=None):
+        super(FileSelectionModel, self).__init__(parent)
+        self.settings = settings
+
+        # the store; removed rows leave a None path until the next compact
+        self.paths = []
+        self.types = array("B")
+        self.flagBits = array("B")
+        self.pathIndex = dict()
+        self.deadCount = 0
+
+        # view row -> store index
+        self.order = array("L")
+        # store index -> view row, -1 for removed or filtered out rows
+        self.rowOf = array("l")
+        self.sortColumn = None
+        self.sortOrder = Qt.AscendingOrder
+        self.filterText = ""
+
+        self.archives = collections.OrderedDict()
+        self.liveArchives = weakref.WeakValueDictionary()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.order)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation != Qt.Horizontal:
+            return QVariant()
+        if role == Qt.DisplayRole:
+            return self.headers[section][0]
+        if role == Qt.ToolTipRole:
+            return self.headers[section][1]
+        return QVariant()
+
+    def flags(self, index):
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+
+        i = self.order[index.row()]
+        col = index.column()
+
+        if col in (self.CRFlagColNum, self.CBLFlagColNum, self.readonlyColNum):
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if self.flagBits[i] & self.flagForColumn(col) else Qt.Unchecked
+            if role == Qt.TextAlignmentRole:
+                return Qt.AlignHCenter
+            return QVariant()
+
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            if col == self.fileColNum:
+                return os.path.basename(self.paths[i])
+            if col == self.folderColNum:
+                return os.path.dirname(self.paths[i])
+            if col == self.typeColNum:
+                return self.typeNames[self.types[i]]
+        return QVariant()
+
+    def flagForColumn(self, col):
+        if col == self.CRFlagColNum:
+            return self.cixFlag
+        if col == self.CBLFlagColNum:
+            return self.cbiFlag
+        return self.readonlyFlag
+
+    def sortKey(self, col):
+        paths = self.paths
+        if col == self.fileColNum:
+            return lambda i: os.path.basename(paths[i])
+        if col == self.folderColNum:
+            return lambda i: os.path.dirname(paths[i])
+        if col == self.typeColNum:
+            return lambda i: self.typeNames[self.types[i]]
+        flag = self.flagForColumn(col)
+        return lambda i: self.flagBits[i] & flag
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sortColumn = column
+        self.sortOrder = order
+
+        self.layoutAboutToBeChanged.emit()
+        old_order = self.order
+        self.order = self.sortedOrder(self.order)
+
+        self.reindexRows()
+
+        # keep the selection and current row pointing at the same files
+        old_list = self.persistentIndexList()
+        new_list = [self.index(self.rowOf[old_order[idx.row()]], idx.column()) for idx in old_list]
+        self.changePersistentIndexList(old_list, new_list)
+        self.layoutChanged.emit()
+
+    def sortedOrder(self, order):
+        if self.sortColumn is None:
+            return order
+        return array("L", sorted(order, key=self.sortKey(self.sortColumn), reverse=self.sortOrder == Qt.DescendingOrder))
+
+    def resort(self):
+        if self.sortColumn is not None:
+            self.sort(self.sortColumn, self.sortOrder)
+
+    def matchesFilter(self, i):
+        return self.filterText in self.paths[i].casefold()
+
+    def setFilter(self, text):
+        self.beginResetModel()
+        self.filterText = text.casefold()
+        live = (i for i in range(len(self.paths)) if self.paths[i] is not None)
+        if self.filterText:
+            live = (i for i in live if self.matchesFilter(i))
+        self.order = self.sortedOrder(array("L", live))
+        self.reindexRows()
+        self.endResetModel()
+
+    def reindexRows(self):
+        self.rowOf = array("l", [-1]) * len(self.paths)
+        for row, i in enumerate(self.order):
+            self.rowOf[i] = row
+
+    def storeIndex(self, path):
+        return self.pathIndex.get(path)
+
+    def rowForPath(self, path):
+        i = self.pathIndex.get(path)
+        if i is None:
+            return -1
+        return self.rowOf[i]
+
+    def rowsForPaths(self, paths):
+        rows = [self.rowForPath(path) for path in paths]
+        return [row for row in rows if row != -1]
+
+    def pathAt(self, row):
+        return self.paths[self.order[row]]
+
+    def archiveAt(self, row):
+        path = self.pathAt(row)
+        ca = self.archives.get(path)
+        if ca is None:
+            ca = self.liveArchives.get(path)
+            if ca is None:
+                ca = ComicArchive(path, self.settings.rar_exe_path, ComicTaggerSettings.getGraphic("nocover.png"))
+        self.cacheArchive(path, ca)
+        return ca
+
+    def cacheArchive(self, path, ca):
+        self.archives[path] = ca
+        self.archives.move_to_end(path)
+        self.liveArchives[path] = ca
+        while len(self.archives) > self.archive_cache_size:
+            evicted_path, evicted = self.archives.popitem(last=False)
+            evicted.dropReadAhead()
+
+    def addArchives(self, archives):
+        """Add (ComicArchive, writable) pairs; writable may be None"""
+        first_row = len(self.order)
+        added = array("L")
+        for ca, writable in archives:
+            if ca.path in self.pathIndex:
+                continue
+            i = len(self.paths)
+            self.paths.append(ca.path)
+            self.types.append(self.typeNone)
+            self.flagBits.append(0)
+            self.pathIndex[ca.path] = i
+            self.readArchiveFlags(i, ca, writable)
+            self.cacheArchive(ca.path, ca)
+            if not self.filterText or self.matchesFilter(i):
+                self.rowOf.append(first_row + len(added))
+                added.append(i)
+            else:
+                self.rowOf.append(-1)
+
+        if len(added) > 0:
+            self.beginInsertRows(QModelIndex(), first_row, first_row + len(added) - 1)
+            self.order.extend(added)
+            self.endInsertRows()
+
+    def readArchiveFlags(self, i, ca, writable=None):
+        if ca.isZip():
+            self.types[i] = self.typeZip
+        elif ca.isRar():
+            self.types[i] = self.typeRar
+        else:
+            self.types[i] = self.typeNone
+
+        if writable is None:
+            writable = ca.isWritable()
+        flags = 0
+        if ca.hasCIX():
+            flags |= self.cixFlag
+        if ca.hasCBI():
+            flags |= self.cbiFlag
+        if not writable:
+            flags |= self.readonlyFlag
+        self.flagBits[i] = flags
+
+        # Reading these will force them into the ComicArchive's cache
+        ca.readCIX()
+        ca.hasCBI()
+
+    def updateRow(self, row):
+        i = self.order[row]
+        ca = self.archiveAt(row)
+
+        # the archive may have been renamed since it was added
+        old_path = self.paths[i]
+        if ca.path != old_path:
+            del self.pathIndex[old_path]
+            self.archives.pop(old_path, None)
+            self.liveArchives.pop(old_path, None)
+            self.paths[i] = ca.path
+            self.pathIndex[ca.path] = i
+            self.cacheArchive(ca.path, ca)
+
+        self.readArchiveFlags(i, ca)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def removeRowList(self, row_list):
+        # remove runs of adjacent rows from the bottom up
+        rows = sorted(set(row_list), reverse=True)
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for i in self.order[first : last + 1]:
+                path = self.paths[i]
+                del self.pathIndex[path]
+                self.archives.pop(path, None)
+                self.paths[i] = None
+                self.deadCount += 1
+            del self.order[first : last + 1]
+            self.endRemoveRows()
+        self.reindexRows()
+
+        if self.deadCount > 1024 and self.deadCount > len(self.pathIndex):
+            self.compact()
+
+    def compact(self):
+        """Drop removed rows from the store; the view order doesn't change"""
+        remap = dict()
+        paths = []
+        types = array("B")
+        flags = array("B")
+        for i, path in enumerate(self.paths):
+            if path is not None:
+                remap[i] = len(paths)
+                paths.append(path)
+                types.append(self.types[i])
+                flags.append(self.flagBits[i])
+
+        self.paths, self.types, self.flagBits = paths, types, flags
+        self.pathIndex = {path: i for i, path in enumerate(paths)}
+        self.order = array("L", (remap[i] for i in self.order))
+        self.deadCount = 0
+        self.reindexRows()
+
+
+class FileSelectionList(QWidget):
+
+    selectionChanged = pyqtSignal(QVariant)
+    listCleared = pyqtSignal()
+
+    fileColNum = FileSelectionModel.fileColNum
+    CRFlagColNum = FileSelectionModel.CRFlagColNum
+    CBLFlagColNum = FileSelectionModel.CBLFlagColNum
+    typeColNum = FileSelectionModel.typeColNum
+    readonlyColNum = FileSelectionModel.readonlyColNum
+    folderColNum = FileSelectionModel.folderColNum
     dataColNum = fileColNum
 
+    # how often rows coming in from the loader are added to the model
+    add_batch_interval = 100
+
     def __init__(self, parent, settings):
         super(FileSelectionList, self).__init__(parent)
 
@@ -72,10 +377,12 @@ class FileSelectionList(QWidget):
 
         reduceWidgetFontSize(self.twList)
 
-        self.twList.setColumnCount(6)
-        # self.twlist.setHorizontalHeaderLabels (["File", "Folder", "CR", "CBL", ""])
-        # self.twList.horizontalHeader().setStretchLastSection(True)
-        self.twList.currentItemChanged.connect(self.currentItemChangedCB)
+        self.model = FileSelectionModel(settings, self)
+        self.twList.setModel(self.model)
+        self.twList.setSortingEnabled(True)
+        self.twList.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.twList.selectionModel().currentRowChanged.connect(self.currentItemChangedCB)
+        self.leFilter.textChanged.connect(self.setFilter)
 
         self.currentItem = None
         self.setContextMenuPolicy(Qt.ActionsContextMenu)
@@ -110,105 +417,127 @@ class FileSelectionList(QWidget):
     def setModifiedFlag(self, modified):
         self.modifiedFlag = modified
 
+    def setFilter(self, text):
+        # a filter change resets the view; put the current file back without
+        # telling anyone, since it's still the one loaded in the form
+        current_path = None
+        if self.twList.currentIndex().isValid():
+            current_path = self.model.pathAt(self.twList.currentIndex().row())
+
+        self.twList.selectionModel().currentRowChanged.disconnect(self.currentItemChangedCB)
+        self.model.setFilter(text)
+        if current_path is not None:
+            row = self.model.rowForPath(current_path)
+            if row != -1:
+                self.twList.selectRow(row)
+        self.twList.selectionModel().currentRowChanged.connect(self.currentItemChangedCB)
+
     def selectAll(self):
-        self.twList.setRangeSelected(QTableWidgetSelectionRange(0, 0, self.twList.rowCount() - 1, 5), True)
+        self.twList.selectAll()
 
     def deselectAll(self):
-        self.twList.setRangeSelected(QTableWidgetSelectionRange(0, 0, self.twList.rowCount() - 1, 5), False)
+        self.twList.clearSelection()
 
     def removeArchiveList(self, ca_list):
-        self.twList.setSortingEnabled(False)
-        for ca in ca_list:
-            for row in range(self.twList.rowCount()):
-                row_ca = self.getArchiveByRow(row)
-                if row_ca == ca:
-                    self.twList.removeRow(row)
-                    break
-        self.twList.setSortingEnabled(True)
+        self.model.removeRowList(self.model.rowsForPaths([ca.path for ca in ca_list]))
 
     def getArchiveByRow(self, row):
-        fi = self.twList.item(row, FileSelectionList.dataColNum).data(Qt.UserRole)
-        return fi.ca
+        return self.model.archiveAt(row)
 
     def getCurrentArchive(self):
-        return self.getArchiveByRow(self.twList.currentRow())
+        row = self.twList.currentIndex().row()
+        if row < 0:
+            return None
+        return self.getArchiveByRow(row)
+
+    def getSelectedRows(self):
+        return sorted(index.row() for index in self.twList.selectionModel().selectedRows())
 
     def removeSelection(self):
-        row_list = []
-        for item in self.twList.selectedItems():
-            if item.column() == 0:
-                row_list.append(item.row())
+        row_list = self.getSelectedRows()
 
         if len(row_list) == 0:
             return
 
-        if self.twList.currentRow() in row_list:
+        if self.twList.currentIndex().row() in row_list:
             if not self.modifiedFlagVerification("Remove Archive", "If you close this archive, data in the form will be lost.  Are you sure?"):
                 return
 
-        row_list.sort()
-        row_list.reverse()
-
-        self.twList.currentItemChanged.disconnect(self.currentItemChangedCB)
-        self.twList.setSortingEnabled(False)
+        self.twList.selectionModel().currentRowChanged.disconnect(self.currentItemChangedCB)
+        self.model.removeRowList(row_list)
+        self.twList.selectionModel().currentRowChanged.connect(self.currentItemChangedCB)
 
-        for i in row_list:
-            self.twList.removeRow(i)
-
-        self.twList.setSortingEnabled(True)
-        self.twList.currentItemChanged.connect(self.currentItemChangedCB)
-
-        if self.twList.rowCount() > 0:
+        if self.model.rowCount() > 0:
             # since on a removal, we select row 0, make sure callback occurs if
             # we're already there
-            if self.twList.currentRow() == 0:
-                self.currentItemChangedCB(self.twList.currentItem(), None)
+            if self.twList.currentIndex().row() == 0:
+                self.currentItemChangedCB(self.twList.currentIndex(), QModelIndex())
             self.twList.selectRow(0)
         else:
             self.listCleared.emit()
 
     def addPathList(self, pathlist):
 
-        filelist = utils.get_recursive_filelist(pathlist)
-        # we now have a list of files to add
+        # the folders are walked and the archives opened on a pool of worker
+        # threads; rows are added here in batches as the results come back
+        loader = ArchiveLoader(pathlist, self.settings.rar_exe_path, ComicTaggerSettings.getGraphic("nocover.png"), self.model.pathIndex.keys())
 
-        # Prog dialog on Linux flakes out for small range, so scale up
-        progdialog = QProgressDialog("", "Cancel", 0, len(filelist), parent=self)
+        # files are found as the folders are walked, so we don't know the
+        # total up front; use a busy indicator instead of a range
+        progdialog = QProgressDialog("", "Cancel", 0, 0, parent=self)
         progdialog.setWindowTitle("Adding Files")
         progdialog.setWindowModality(Qt.ApplicationModal)
         progdialog.setMinimumDuration(300)
         centerWindowOnParent(progdialog)
-        # QCoreApplication.processEvents()
-        # progdialog.show()
 
-        QCoreApplication.processEvents()
-        firstAdded = None
-        self.twList.setSortingEnabled(False)
-        for idx, f in enumerate(filelist):
-            QCoreApplication.processEvents()
-            if progdialog.wasCanceled():
-                break
-            progdialog.setValue(idx + 1)
-            progdialog.setLabelText(f)
-            centerWindowOnParent(progdialog)
-            QCoreApplication.processEvents()
-            row = self.addPathItem(f)
-            if firstAdded is None and row is not None:
-                firstAdded = row
+        pending = []
+        first_added = []
+
+        def archiveLoaded(result):
+            if loader.abandoned:
+                return
+            progdialog.setValue(0)
+            progdialog.setLabelText(result.path)
+            if result.ca is not None:
+                pending.append((result.ca, result.writable))
+            if len(first_added) == 0 and (result.known or result.ca is not None):
+                first_added.append(result.path)
+
+        def addPending():
+            self.model.addArchives(pending)
+            del pending[:]
+
+        timer = QTimer()
+        timer.timeout.connect(addPending)
+        timer.start(self.add_batch_interval)
+
+        # callers expect the rows to be in place when we return, so wait
+        # for the loader in a local event loop; the GUI stays live meanwhile
+        loop = QEventLoop()
+        loader.archiveLoaded.connect(archiveLoaded)
+        loader.finished.connect(loop.quit)
+        progdialog.canceled.connect(loader.abandon)
+        loader.start()
+        loop.exec_()
+        loader.wait()
+        timer.stop()
+        addPending()
+        self.model.resort()
 
         progdialog.hide()
         QCoreApplication.processEvents()
 
-        if firstAdded is not None:
-            self.twList.selectRow(firstAdded)
-        else:
+        first_row = -1
+        if len(first_added) > 0:
+            first_row = self.getCurrentListRow(first_added[0])
+        if first_row != -1:
+            self.twList.selectRow(first_row)
+        elif len(first_added) == 0:
             if len(pathlist) == 1 and os.path.isfile(pathlist[0]):
                 QMessageBox.information(self, self.tr("File Open"), self.tr("Selected file doesn't seem to be a comic archive."))
             else:
                 QMessageBox.information(self, self.tr("File/Folder Open"), self.tr("No readable comic archives were found."))
 
-        self.twList.setSortingEnabled(True)
-
         # Adjust column size
         self.twList.resizeColumnsToContents()
         self.twList.setColumnWidth(FileSelectionList.CRFlagColNum, 35)
@@ -221,24 +550,10 @@ class FileSelectionList(QWidget):
             self.twList.setColumnWidth(FileSelectionList.folderColNum, 200)
 
     def isListDupe(self, path):
-        r = 0
-        while r < self.twList.rowCount():
-            ca = self.getArchiveByRow(r)
-            if ca.path == path:
-                return True
-            r = r + 1
-
-        return False
+        return self.model.storeIndex(path) is not None
 
     def getCurrentListRow(self, path):
-        r = 0
-        while r < self.twList.rowCount():
-            ca = self.getArchiveByRow(r)
-            if ca.path == path:
-                return r
-            r = r + 1
-
-        return -1
+        return self.model.rowForPath(path)
 
     def addPathItem(self, path):
         path = str(path)
@@ -251,122 +566,37 @@ class FileSelectionList(QWidget):
         ca = ComicArchive(path, self.settings.rar_exe_path, ComicTaggerSettings.getGraphic("nocover.png"))
 
         if ca.seemsToBeAComicArchive():
-            row = self.twList.rowCount()
-            self.twList.insertRow(row)
-
-            fi = FileInfo(ca)
-
-            filename_item = QTableWidgetItem()
-            folder_item = QTableWidgetItem()
-            cix_item = FileTableWidgetItem()
-            cbi_item = FileTableWidgetItem()
-            readonly_item = FileTableWidgetItem()
-            type_item = QTableWidgetItem()
-
-            filename_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            filename_item.setData(Qt.UserRole, fi)
-            self.twList.setItem(row, FileSelectionList.fileColNum, filename_item)
-
-            folder_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            self.twList.setItem(row, FileSelectionList.folderColNum, folder_item)
-
-            type_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            self.twList.setItem(row, FileSelectionList.typeColNum, type_item)
-
-            cix_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            cix_item.setTextAlignment(Qt.AlignHCenter)
-            self.twList.setItem(row, FileSelectionList.CRFlagColNum, cix_item)
-
-            cbi_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            cbi_item.setTextAlignment(Qt.AlignHCenter)
-            self.twList.setItem(row, FileSelectionList.CBLFlagColNum, cbi_item)
-
-            readonly_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            readonly_item.setTextAlignment(Qt.AlignHCenter)
-            self.twList.setItem(row, FileSelectionList.readonlyColNum, readonly_item)
-
-            self.updateRow(row)
+            self.model.addArchives([(ca, None)])
+            return self.getCurrentListRow(path)
 
-            return row
+    def resort(self):
+        self.model.resort()
 
     def updateRow(self, row):
-        fi = self.twList.item(row, FileSelectionList.dataColNum).data(Qt.UserRole)  # .toPyObject()
-
-        filename_item = self.twList.item(row, FileSelectionList.fileColNum)
-        folder_item = self.twList.item(row, FileSelectionList.folderColNum)
-        cix_item = self.twList.item(row, FileSelectionList.CRFlagColNum)
-        cbi_item = self.twList.item(row, FileSelectionList.CBLFlagColNum)
-        type_item = self.twList.item(row, FileSelectionList.typeColNum)
-        readonly_item = self.twList.item(row, FileSelectionList.readonlyColNum)
-
-        item_text = os.path.split(fi.ca.path)[0]
-        folder_item.setText(item_text)
-        folder_item.setData(Qt.ToolTipRole, item_text)
-
-        item_text = os.path.split(fi.ca.path)[1]
-        filename_item.setText(item_text)
-        filename_item.setData(Qt.ToolTipRole, item_text)
-
-        if fi.ca.isZip():
-            item_text = "ZIP"
-        elif fi.ca.isRar():
-            item_text = "RAR"
-        else:
-            item_text = ""
-        type_item.setText(item_text)
-        type_item.setData(Qt.ToolTipRole, item_text)
-
-        if fi.ca.hasCIX():
-            cix_item.setCheckState(Qt.Checked)
-            cix_item.setData(Qt.UserRole, True)
-        else:
-            cix_item.setData(Qt.UserRole, False)
-            cix_item.setCheckState(Qt.Unchecked)
-
-        if fi.ca.hasCBI():
-            cbi_item.setCheckState(Qt.Checked)
-            cbi_item.setData(Qt.UserRole, True)
-        else:
-            cbi_item.setData(Qt.UserRole, False)
-            cbi_item.setCheckState(Qt.Unchecked)
-
-        if not fi.ca.isWritable():
-            readonly_item.setCheckState(Qt.Checked)
-            readonly_item.setData(Qt.UserRole, True)
-        else:
-            readonly_item.setData(Qt.UserRole, False)
-            readonly_item.setCheckState(Qt.Unchecked)
-
-        # Reading these will force them into the ComicArchive's cache
-        fi.ca.readCIX()
-        fi.ca.hasCBI()
+        self.model.updateRow(row)
 
     def getSelectedArchiveList(self):
         ca_list = []
-        for r in range(self.twList.rowCount()):
-            item = self.twList.item(r, FileSelectionList.dataColNum)
-            if item.isSelected():
-                fi = item.data(Qt.UserRole)
-                ca_list.append(fi.ca)
+        for r in self.getSelectedRows():
+            ca_list.append(self.getArchiveByRow(r))
 
         return ca_list
 
     def updateCurrentRow(self):
-        self.updateRow(self.twList.currentRow())
+        self.updateRow(self.twList.currentIndex().row())
 
     def updateSelectedRows(self):
-        self.twList.setSortingEnabled(False)
-        for r in range(self.twList.rowCount()):
-            item = self.twList.item(r, FileSelectionList.dataColNum)
-            if item.isSelected():
-                self.updateRow(r)
-        self.twList.setSortingEnabled(True)
+        for r in self.getSelectedRows():
+            self.updateRow(r)
 
     def currentItemChangedCB(self, curr, prev):
 
+        if not curr.isValid():
+            return
+
         new_idx = curr.row()
         old_idx = -1
-        if prev is not None:
+        if prev.isValid():
             old_idx = prev.row()
         # print("old {0} new {1}".format(old_idx, new_idx))
 
@@ -374,20 +604,20 @@ class FileSelectionList(QWidget):
             return
 
         # don't allow change if modified
-        if prev is not None and new_idx != old_idx:
+        if prev.isValid() and new_idx != old_idx:
             if not self.modifiedFlagVerification("Change Archive", "If you change archives now, data in the form will be lost.  Are you sure?"):
-                self.twList.currentItemChanged.disconnect(self.currentItemChangedCB)
-                self.twList.setCurrentItem(prev)
-                self.twList.currentItemChanged.connect(self.currentItemChangedCB)
+                self.twList.selectionModel().currentRowChanged.disconnect(self.currentItemChangedCB)
+                self.twList.setCurrentIndex(prev)
+                self.twList.selectionModel().currentRowChanged.connect(self.currentItemChangedCB)
                 # Need to defer this revert selection, for some reason
                 QTimer.singleShot(1, self.revertSelection)
                 return
 
-        fi = self.twList.item(new_idx, FileSelectionList.dataColNum).data(Qt.UserRole)  # .toPyObject()
+        fi = FileInfo(self.getArchiveByRow(new_idx))
         self.selectionChanged.emit(QVariant(fi))
 
     def revertSelection(self):
-        self.twList.selectRow(self.twList.currentRow())
+        self.twList.selectRow(self.twList.currentIndex().row())
 
     def modifiedFlagVerification(self, title, desc):
         if self.modifiedFlag:
@@ -396,16 +626,3 @@ class FileSelectionList(QWidget):
             if reply != QMessageBox.Yes:
                 return False
         return True
-
-
-# Attempt to use a special checkbox widget in the cell.
-# Couldn't figure out how to disable it with "enabled" colors
-# w = QWidget()
-# cb = QCheckBox(w)
-# cb.setCheckState(Qt.Checked)
-# layout = QHBoxLayout()
-# layout.addWidget(cb)
-# layout.setAlignment(Qt.AlignHCenter)
-# layout.setMargin(2)
-# w.setLayout(layout)
-# self.twList.setCellWidget(row, 2, w)
@@ -0,0 +1,132 @@
+"""Pluggable HTTP transports, for recording and replaying Comic Vine traffic"""
+
+# Copyright 2012-2014 Anthony Beville
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.parse
+
+import requests
+
+
+def without_api_key(url):
+    """url with any api_key taken out of its query string"""
+    parts = urllib.parse.urlsplit(url)
+    if "api_key" not in parts.query:
+        return url
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if k != "api_key"]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+def request_key(url, params=None):
+    """A file name for a request; the API key is left out so recordings can be shared"""
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k != "api_key")
+    return hashlib.sha1((without_api_key(url) + "?" + urllib.parse.urlencode(items)).encode("utf-8")).hexdigest()
+
+
+class Response:
+
+    """The parts of a requests.Response that the talkers use"""
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class RequestsTransport:
+    def get(self, url, params=None, headers=None):
+        return requests.get(url, params=params, headers=headers)
+
+
+class RecordingTransport:
+
+    """
+    Passes requests on to another transport and saves each response in
+    directory: <key>.json holds the request and status, <key>.body the
+    response body.
+    """
+
+    def __init__(self, directory, transport=None):
+        self.directory = directory
+        self.transport = transport if transport is not None else RequestsTransport()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, url, params=None, headers=None):
+        resp = self.transport.get(url, params=params, headers=headers)
+
+        key = request_key(url, params)
+        with open(os.path.join(self.directory, key + ".body"), "wb") as f:
+            f.write(resp.content)
+        meta = {
+            "url": without_api_key(url),
+            "params": {k: str(v) for k, v in (params or {}).items() if k != "api_key"},
+            "status_code": resp.status_code,
+        }
+        with open(os.path.join(self.directory, key + ".json"), "w") as f:
+            json.dump(meta, f, indent=1)
+
+        return resp
+
+
+class ReplayTransport:
+
+    """
+    Answers requests from a directory made by RecordingTransport, after
+    waiting latency seconds to stand in for the network.  Requests that
+    weren't recorded get a 404.
+    """
+
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+
+    def get(self, url, params=None, headers=None):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        key = request_key(url, params)
+        try:
+            with open(os.path.join(self.directory, key + ".json")) as f:
+                meta = json.load(f)
+            with open(os.path.join(self.directory, key + ".body"), "rb") as f:
+                content = f.read()
+        except (IOError, ValueError):
+            params = {k: v for k, v in (params or {}).items() if k != "api_key"}
+            print("No recording for {0} {1}".format(without_api_key(url), params), file=sys.stderr)
+            return Response(404, b"")
+
+        return Response(meta["status_code"], content)
+
+
+_transport = RequestsTransport()
+
+
+def get_transport():
+    return _transport
+
+
+def set_transport(transport):
+    global _transport
+    _transport = transport
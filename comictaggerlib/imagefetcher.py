@@ -14,19 +14,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import concurrent.futures
 import datetime
+import functools
 import os
 import shutil
 import sqlite3 as lite
+import sys
 import tempfile
+import weakref
 
-import requests
-
-from . import ctversion
+from . import ctversion, httptransport, stats
 from .settings import ComicTaggerSettings
 
 try:
-    from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest
+    from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkReply, QNetworkRequest
     from PyQt5.QtCore import QUrl, pyqtSignal, QObject, QByteArray
     from PyQt5 import QtGui
 except ImportError:
@@ -69,55 +72,46 @@ class ImageFetcher(QObject):
         if os.path.isdir(self.cache_folder):
             shutil.rmtree(self.cache_folder)
 
+    @stats.timing("image.fetch")
     def fetch(self, url, user_data=None, blocking=False):
         """
         If called with blocking=True, this will block until the image is
         fetched.
         If called with blocking=False, this will run the fetch in the
-        background, and emit a signal when done
+        background, and emit a signal when done.  Each call gets its own
+        user_data back, so one fetcher can have several fetches going.
         """
 
-        self.user_data = user_data
-        self.fetched_url = url
-
-        # first look in the DB
-        image_data = self.get_image_from_cache(url)
         if blocking:
+            # first look in the DB
+            image_data = self.get_image_from_cache(url)
             if image_data is None:
+                stats.count("image.download")
                 try:
                     print(url)
-                    image_data = requests.get(url, headers={"user-agent": "comictagger/" + ctversion.version}).content
+                    image_data = httptransport.get_transport().get(url, headers={"user-agent": "comictagger/" + ctversion.version}).content
                 except Exception as e:
                     print(e)
                     raise ImageFetcherException("Network Error!")
 
-            # save the image to the cache
-            self.add_image_to_cache(self.fetched_url, image_data)
+                # save the image to the cache
+                self.add_image_to_cache(url, image_data)
+            else:
+                stats.count("image.cache_hit")
             return image_data
 
         else:
 
+            service = ImageFetchService.instance()
+
             # if we found it, just emit the signal asap
+            image_data = service.cachedImage(url)
             if image_data is not None:
-                self.fetchComplete.emit(QByteArray(image_data), self.user_data)
+                self.fetchComplete.emit(QByteArray(image_data), user_data)
                 return
 
-            # didn't find it.  look online
-            self.nam = QNetworkAccessManager()
-            self.nam.finished.connect(self.finishRequest)
-            self.nam.get(QNetworkRequest(QUrl(url)))
-
-            # we'll get called back when done...
-
-    def finishRequest(self, reply):
-
-        # read in the image data
-        image_data = reply.readAll()
-
-        # save the image to the cache
-        self.add_image_to_cache(self.fetched_url, image_data)
-
-        self.fetchComplete.emit(QByteArray(image_data), self.user_data)
+            # didn't find it.  look online; we'll get called back when done...
+            service.request(url, self, user_data)
 
     def create_image_db(self):
 
@@ -155,6 +149,17 @@ class ImageFetcher(QObject):
 
             cur.execute("INSERT or REPLACE INTO Images VALUES(?, ?, ?)", (url, filename, timestamp))
 
+    def is_image_cached(self, url):
+
+        con = lite.connect(self.db_file)
+        with con:
+            cur = con.cursor()
+
+            cur.execute("SELECT filename FROM Images WHERE url=?", [url])
+            row = cur.fetchone()
+
+            return row is not None and os.path.exists(row[0])
+
     def get_image_from_cache(self, url):
 
         con = lite.connect(self.db_file)
@@ -178,3 +183,135 @@ class ImageFetcher(QObject):
                     pass
 
                 return image_data
+
+
+class ImagePrefetcher:
+
+    """
+    Warms the image cache in the background for URLs that are likely to be
+    shown soon, e.g. the covers of the rows next to the selected one.  Each
+    call to prefetch() replaces whatever was still queued, so the queue
+    follows the selection; requests already on the wire are left to finish.
+
+    The downloads go through ImageFetchService, so a prefetch and a fetch of
+    the same URL share one request.
+    """
+
+    max_in_flight = 4
+
+    @staticmethod
+    def instance():
+        return ImageFetchService.instance().prefetcher
+
+    def __init__(self, service):
+        self.service = service
+        self.queue = collections.deque()
+        self.in_flight = set()
+
+    def prefetch(self, url_list):
+        self.queue.clear()
+        for url in url_list:
+            if url and url not in self.in_flight and url not in self.queue:
+                self.queue.append(url)
+        self.startRequests()
+
+    def startRequests(self):
+        while self.queue and len(self.in_flight) < self.max_in_flight:
+            url = self.queue.popleft()
+            if self.service.isFetchingOrCached(url):
+                continue
+            self.in_flight.add(url)
+            self.service.startRequest(url)
+
+    def requestFinished(self, url):
+        self.in_flight.discard(url)
+        self.startRequests()
+
+
+class ImageFetchService(QObject):
+
+    """
+    The app-wide side of the async fetches.  All requests go through one
+    QNetworkAccessManager, and concurrent requests for the same URL share
+    a single download; every requesting ImageFetcher gets its own
+    fetchComplete with its own user_data.  Fetchers that have been thrown
+    away by the time the image arrives are skipped.
+
+    Downloaded images are written to the cache on a background thread;
+    until that finishes they are served from memory.  Prefetching is done
+    by its ImagePrefetcher.
+    """
+
+    # emitted from the cache writer thread
+    imageSaved = pyqtSignal(str)
+
+    _instance = None
+
+    @staticmethod
+    def instance():
+        if ImageFetchService._instance is None:
+            ImageFetchService._instance = ImageFetchService()
+        return ImageFetchService._instance
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.cache = ImageFetcher()
+        self.nam = QNetworkAccessManager()
+        # url -> QNetworkReply; holding on to the reply keeps PyQt from
+        # deleting it mid-request
+        self.replies = dict()
+        # url -> list of (weakref to ImageFetcher, user_data)
+        self.waiters = dict()
+        self.prefetcher = ImagePrefetcher(self)
+        # url -> image data not yet written to the cache
+        self.unsaved = dict()
+        self.cache_writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.imageSaved.connect(self.imageSavedToCache)
+
+    def cachedImage(self, url):
+        image_data = self.unsaved.get(url)
+        if image_data is None:
+            image_data = self.cache.get_image_from_cache(url)
+        return image_data
+
+    def request(self, url, fetcher, user_data):
+        self.waiters.setdefault(url, []).append((weakref.ref(fetcher), user_data))
+        if url not in self.replies:
+            self.startRequest(url)
+
+    def isFetchingOrCached(self, url):
+        return url in self.replies or url in self.unsaved or self.cache.is_image_cached(url)
+
+    def startRequest(self, url):
+        reply = self.nam.get(QNetworkRequest(QUrl(url)))
+        reply.finished.connect(functools.partial(self.finishRequest, url))
+        self.replies[url] = reply
+
+    def finishRequest(self, url):
+        reply = self.replies.pop(url)
+        image_data = bytes(reply.readAll())
+        if reply.error() == QNetworkReply.NoError:
+            self.unsaved[url] = image_data
+            self.cache_writer.submit(self.saveImage, url, image_data)
+        else:
+            print("Error fetching {0}: {1}".format(url, reply.errorString()), file=sys.stderr)
+        reply.deleteLater()
+
+        for ref, user_data in self.waiters.pop(url, []):
+            fetcher = ref()
+            if fetcher is not None:
+                fetcher.fetchComplete.emit(QByteArray(image_data), user_data)
+
+        self.prefetcher.requestFinished(url)
+
+    def saveImage(self, url, image_data):
+        # runs on the cache writer thread
+        try:
+            self.cache.add_image_to_cache(url, image_data)
+        except Exception as e:
+            print("Error caching {0}:".format(url), e, file=sys.stderr)
+        finally:
+            self.imageSaved.emit(url)
+
+    def imageSavedToCache(self, url):
+        self.unsaved.pop(url, None)
@@ -48,7 +48,7 @@ class ImageHasher(object):
 
     def average_hash(self):
         try:
-            image = self.image.resize((self.width, self.height), Image.ANTIALIAS).convert("L")
+            image = self.image.resize((self.width, self.height), Image.LANCZOS).convert("L")
         except Exception as e:
             print("average_hash error:", e)
             return int(0)
@@ -14,10 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import io
+import re
 import sys
+import unicodedata
 
-from . import utils
+from . import stats, utils
 from .comicvinetalker import ComicVineTalker, ComicVineTalkerException
 from .genericmetadata import GenericMetadata
 from .imagefetcher import ImageFetcher, ImageFetcherException
@@ -89,6 +92,9 @@ class IssueIdentifier:
         self.cover_page_index = 0
         self.cancel = False
         self.waitAndRetryOnRateLimit = False
+        # candidate volumes already worked out for these search keys, e.g.
+        # by an IdentificationPlanner; if set, the series search is skipped
+        self.series_candidates = None
 
     def setScoreMinThreshold(self, thresh):
         self.min_score_thresh = thresh
@@ -99,6 +105,9 @@ class IssueIdentifier:
     def setAdditionalMetadata(self, md):
         self.additional_metadata = md
 
+    def setSeriesCandidates(self, series_list):
+        self.series_candidates = series_list
+
     def setNameLengthDeltaThreshold(self, delta):
         self.length_delta_thresh = delta
 
@@ -113,6 +122,7 @@ class IssueIdentifier:
         self.output_function = func
         pass
 
+    @stats.timing("hash")
     def calculateHash(self, image_data):
         if self.image_hasher == "3":
             return ImageHasher(data=image_data).dct_average_hash()
@@ -237,6 +247,7 @@ class IssueIdentifier:
         if newline:
             self.output_function("\n")
 
+    @stats.timing("identify.cover_match")
     def getIssueCoverMatchScore(
         self, comicVine, issue_id, primary_img_url, primary_thumb_url, page_url, localCoverHashList, useRemoteAlternates=False, useLog=True
     ):
@@ -331,6 +342,43 @@ class IssueIdentifier:
     #    else:
     #        return False
 
+    def filterSeriesCandidates(self, cv_search_results, keys):
+
+        series_second_round_list = []
+
+        # self.log_msg("Removing results with too long names, banned publishers, or future start dates")
+        for item in cv_search_results:
+            length_approved = False
+            publisher_approved = True
+            date_approved = True
+
+            # remove any series that starts after the issue year
+            if keys["year"] is not None and str(keys["year"]).isdigit() and item["start_year"] is not None and str(item["start_year"]).isdigit():
+                if int(keys["year"]) < int(item["start_year"]):
+                    date_approved = False
+
+            # assume that our search name is close to the actual name, say
+            # within ,e.g. 5 chars
+            shortened_key = utils.removearticles(keys["series"])
+            shortened_item_name = utils.removearticles(item["name"])
+            if len(shortened_item_name) < (len(shortened_key) + self.length_delta_thresh):
+                length_approved = True
+
+            # remove any series from publishers on the blacklist
+            if item["publisher"] is not None:
+                publisher = item["publisher"]["name"]
+                if publisher is not None and publisher.lower() in self.publisher_blacklist:
+                    publisher_approved = False
+
+            if length_approved and publisher_approved and date_approved:
+                series_second_round_list.append(item)
+
+        # now sort the list by name length
+        series_second_round_list.sort(key=lambda x: len(x["name"]), reverse=False)
+
+        return series_second_round_list
+
+    @stats.timing("identify")
     def search(self):
 
         ca = self.comic_archive
@@ -386,65 +434,42 @@ class IssueIdentifier:
 
         comicVine.setLogFunc(self.output_function)
 
-        # self.log_msg(("Searching for " + keys['series'] + "...")
-        self.log_msg("Searching for  {0} #{1} ...".format(keys["series"], keys["issue_number"]))
-        try:
-            cv_search_results = comicVine.searchForSeries(keys["series"])
-        except ComicVineTalkerException:
-            self.log_msg("Network issue while searching for series. Aborting...")
-            return []
-
-        # self.log_msg("Found " + str(len(cv_search_results)) + " initial results")
-        if self.cancel:
-            return []
-
-        if cv_search_results is None:
-            return []
-
-        series_second_round_list = []
-
-        # self.log_msg("Removing results with too long names, banned publishers, or future start dates")
-        for item in cv_search_results:
-            length_approved = False
-            publisher_approved = True
-            date_approved = True
-
-            # remove any series that starts after the issue year
-            if keys["year"] is not None and str(keys["year"]).isdigit() and item["start_year"] is not None and str(item["start_year"]).isdigit():
-                if int(keys["year"]) < int(item["start_year"]):
-                    date_approved = False
+        if self.series_candidates is not None:
+            series_second_round_list = list(self.series_candidates)
+        else:
+            # self.log_msg(("Searching for " + keys['series'] + "...")
+            self.log_msg("Searching for  {0} #{1} ...".format(keys["series"], keys["issue_number"]))
+            try:
+                with stats.timed("identify.series_search"):
+                    cv_search_results = comicVine.searchForSeries(keys["series"])
+            except ComicVineTalkerException:
+                self.log_msg("Network issue while searching for series. Aborting...")
+                return []
 
-            # assume that our search name is close to the actual name, say
-            # within ,e.g. 5 chars
-            shortened_key = utils.removearticles(keys["series"])
-            shortened_item_name = utils.removearticles(item["name"])
-            if len(shortened_item_name) < (len(shortened_key) + self.length_delta_thresh):
-                length_approved = True
+            # self.log_msg("Found " + str(len(cv_search_results)) + " initial results")
+            if self.cancel:
+                return []
 
-            # remove any series from publishers on the blacklist
-            if item["publisher"] is not None:
-                publisher = item["publisher"]["name"]
-                if publisher is not None and publisher.lower() in self.publisher_blacklist:
-                    publisher_approved = False
+            if cv_search_results is None:
+                return []
 
-            if length_approved and publisher_approved and date_approved:
-                series_second_round_list.append(item)
+            series_second_round_list = self.filterSeriesCandidates(cv_search_results, keys)
 
         self.log_msg("Searching in " + str(len(series_second_round_list)) + " series")
 
         if self.callback is not None:
             self.callback(0, len(series_second_round_list))
 
-        # now sort the list by name length
-        series_second_round_list.sort(key=lambda x: len(x["name"]), reverse=False)
-
         # build a list of volume IDs
         volume_id_list = list()
+        issue_counts = dict()
         for series in series_second_round_list:
             volume_id_list.append(series["id"])
+            issue_counts[series["id"]] = series.get("count_of_issues")
 
         try:
-            issue_list = comicVine.fetchIssuesByVolumeIssueNumAndYear(volume_id_list, keys["issue_number"], keys["year"])
+            with stats.timed("identify.issue_lists"):
+                issue_list = comicVine.fetchIssuesByVolumeIssueNumAndYear(volume_id_list, keys["issue_number"], keys["year"], issue_counts)
 
         except ComicVineTalkerException:
             self.log_msg("Network issue while searching for series details. Aborting...")
@@ -647,3 +672,78 @@ class IssueIdentifier:
             self.log_msg("--------------------------------------------------------------------------")
 
         return self.match_list
+
+
+class IdentificationPlanner:
+
+    """
+    Plans the online identification of a batch of files.  Files are
+    grouped by series name (normalized the way Comic Vine searches it),
+    year and volume.  resolve() runs the series search and volume
+    filtering once per group, for the groups added since the last call,
+    and fetches the candidate volumes' issue lists into the cache for
+    groups of more than one file, so identifying each file only needs its
+    own issue lookup and cover comparison.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        # group key -> [metadata of the first file, number of files]
+        self.groups = collections.OrderedDict()
+        # group key -> candidate volumes, or None if the search failed
+        self.candidates = dict()
+        self.waitAndRetryOnRateLimit = False
+        self.output_function = IssueIdentifier.defaultWriteOutput
+
+    def setOutputFunction(self, func):
+        self.output_function = func
+
+    @staticmethod
+    def groupKey(md):
+        if md is None or md.series is None:
+            return None
+
+        # normalize unicode and convert to ascii, drop punctuation and articles
+        series = unicodedata.normalize("NFKD", md.series).encode("ascii", "ignore").decode("ascii")
+        series = re.sub(r"[^A-Za-z0-9]+", " ", series)
+        series = utils.removearticles(series).lower().strip()
+
+        return (series, str(md.year) if md.year is not None else None, str(md.volume) if md.volume is not None else None)
+
+    def addFile(self, md):
+        key = self.groupKey(md)
+        if key is None:
+            return
+        if key in self.groups:
+            self.groups[key][1] += 1
+        else:
+            self.groups[key] = [md, 1]
+
+    def resolve(self):
+        comicVine = ComicVineTalker()
+        comicVine.wait_for_rate_limit = self.waitAndRetryOnRateLimit
+        comicVine.setLogFunc(self.output_function)
+
+        ii = IssueIdentifier(None, self.settings)
+        ii.setOutputFunction(self.output_function)
+
+        for key, (md, count) in self.groups.items():
+            if key in self.candidates:
+                # planned with an earlier batch of files
+                continue
+            ii.log_msg("Searching for {0} ({1} files) ...".format(md.series, count))
+            keys = {"series": md.series, "year": md.year}
+            try:
+                cv_search_results = comicVine.searchForSeries(md.series)
+                series_list = ii.filterSeriesCandidates(cv_search_results, keys)
+                # one file only needs its own issue looked up
+                if count > 1:
+                    comicVine.prefetchIssuesByVolume(series_list)
+            except ComicVineTalkerException:
+                # leave it to each file to search on its own
+                ii.log_msg("Network issue while searching for series. Skipping...")
+                series_list = None
+            self.candidates[key] = series_list
+
+    def candidatesFor(self, md):
+        return self.candidates.get(self.groupKey(md))
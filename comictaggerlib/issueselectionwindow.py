@@ -24,6 +24,7 @@ from comictaggerlib.ui.qtutils import reduceWidgetFontSize
 
 from .comicvinetalker import ComicVineTalker, ComicVineTalkerException
 from .coverimagewidget import CoverImageWidget
+from .imagefetcher import ImagePrefetcher
 from .issuestring import IssueString
 from .settings import ComicTaggerSettings
 
@@ -46,6 +47,9 @@ class IssueSelectionWindow(QtWidgets.QDialog):
 
     volume_id = 0
 
+    # how many rows either side of the selection to fetch covers for
+    prefetch_count = 4
+
     def __init__(self, parent, settings, series_id, issue_number):
         super(IssueSelectionWindow, self).__init__(parent)
 
@@ -175,3 +179,18 @@ class IssueSelectionWindow(QtWidgets.QDialog):
                     self.teDescription.setText(record["description"])
 
                 break
+
+        self.prefetchCovers(curr.row())
+
+    def prefetchCovers(self, row):
+        # warm the image cache with the covers of the neighbouring rows,
+        # nearest first, so browsing the list doesn't wait on the network
+        records = {record["id"]: record for record in self.issue_list}
+        url_list = []
+        for i in range(1, self.prefetch_count + 1):
+            for r in (row + i, row - i):
+                if 0 <= r < self.twList.rowCount():
+                    record = records.get(self.twList.item(r, 0).data(QtCore.Qt.UserRole))
+                    if record is not None and record["image"] is not None:
+                        url_list.append(record["image"]["super_url"])
+        ImagePrefetcher.instance().prefetch(url_list)
@@ -14,13 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import cProfile
+import multiprocessing
 import os
 import platform
 import signal
 import sys
 import traceback
 
-from . import cli, utils
+from . import cli, httptransport, stats, utils
 from .comicvinetalker import ComicVineTalker
 from .options import Options
 from .settings import ComicTaggerSettings
@@ -37,6 +39,9 @@ except ImportError as e:
 
 
 def ctmain():
+    # the GUI exports archives on a process pool
+    multiprocessing.freeze_support()
+
     opts = Options()
     opts.parseCmdLineArgs()
 
@@ -50,6 +55,12 @@ def ctmain():
         return
 
     ComicVineTalker.api_key = SETTINGS.cv_api_key
+    if opts.cv_url is not None:
+        ComicVineTalker.api_base_url = opts.cv_url
+    if opts.record_folder is not None:
+        httptransport.set_transport(httptransport.RecordingTransport(opts.record_folder))
+    if opts.replay_folder is not None:
+        httptransport.set_transport(httptransport.ReplayTransport(opts.replay_folder, opts.replay_latency))
 
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
@@ -57,8 +68,23 @@ def ctmain():
         opts.no_gui = True
         print("PyQt5 is not available.  ComicTagger is limited to command-line mode.", file=sys.stderr)
 
+    if opts.show_stats or opts.trace_file is not None:
+        stats.enable(opts.trace_file)
+
     if opts.no_gui:
-        cli.cli_mode(opts, SETTINGS)
+        profiler = None
+        if opts.profile_file is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            cli.cli_mode(opts, SETTINGS)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(opts.profile_file)
+            if opts.show_stats:
+                stats.print_summary()
+            stats.close()
     else:
 
         os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
@@ -21,6 +21,7 @@ from PyQt5 import QtCore, QtGui, QtWidgets, uic
 from comictaggerlib.ui.qtutils import reduceWidgetFontSize
 
 from .coverimagewidget import CoverImageWidget
+from .imagefetcher import ImagePrefetcher
 from .settings import ComicTaggerSettings
 
 # import sys
@@ -39,6 +40,9 @@ class MatchSelectionWindow(QtWidgets.QDialog):
 
     volume_id = 0
 
+    # how many rows either side of the selection to fetch covers for
+    prefetch_count = 2
+
     def __init__(self, parent, matches, comic_archive):
         super(MatchSelectionWindow, self).__init__(parent)
 
@@ -150,6 +154,17 @@ class MatchSelectionWindow(QtWidgets.QDialog):
         else:
             self.teDescription.setText(self.currentMatch()["description"])
 
+        self.prefetchCovers(curr.row())
+
+    def prefetchCovers(self, row):
+        # warm the image cache with the covers of the neighbouring matches
+        url_list = []
+        for i in range(1, self.prefetch_count + 1):
+            for r in (row + i, row - i):
+                if 0 <= r < self.twList.rowCount():
+                    url_list.append(self.twList.item(r, 0).data(QtCore.Qt.UserRole)[0]["image_url"])
+        ImagePrefetcher.instance().prefetch(url_list)
+
     def setCoverImage(self):
         self.archiveCoverWidget.setArchive(self.comic_archive)
 
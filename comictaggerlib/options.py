@@ -20,7 +20,7 @@ import platform
 import sys
 import traceback
 
-from . import ctversion, utils
+from . import ctversion
 from .comicarchive import MetaDataStyle
 from .genericmetadata import GenericMetadata
 from .versionchecker import VersionChecker
@@ -92,12 +92,28 @@ If no options are given, {0} will run in windowed mode.
                             ComicTagger library for custom processing.
                             Script arguments can follow the script name.
 -R, --recursive             Recursively include files in sub-folders.
+                            Files that aren't comic archives are skipped.
     --cv-api-key=KEY        Use the given Comic Vine API Key (persisted
                             in settings).
     --only-set-cv-key       Only set the Comic Vine API key and quit.
+    --cv-url=URL            Use the Comic Vine API at URL, e.g. a local
+                            stand-in (see comictaggerlib/cvstandin.py).
+    --record=DIR            Save every Comic Vine and image request and
+                            its response in DIR.
+    --replay=DIR            Answer requests from the responses saved in
+                            DIR with --record, without going online.
+    --replay-latency=SECS   Wait SECS seconds before each replayed
+                            response.
 -w, --wait-on-cv-rate-limit When encountering a Comic Vine rate limit
                             error, wait and retry query.
 -v, --verbose               Be noisy when doing what it does.
+    --stats                 Print where the time went (archive I/O,
+                            hashing, Comic Vine requests, cover
+                            downloads, writes...) when done.
+    --trace=FILE            Write the timings for each file as a line
+                            of JSON to FILE.
+    --profile=FILE          Run under cProfile and save the profile to
+                            FILE (command-line mode only).
     --terse                 Don't say much (for print mode).
     --version               Display version.
 -h, --help                  Display this message.
@@ -128,6 +144,13 @@ For more help visit the wiki at: http://code.google.com/p/comictagger/
         self.raw = False
         self.cv_api_key = None
         self.only_set_key = False
+        self.cv_url = None
+        self.record_folder = None
+        self.replay_folder = None
+        self.replay_latency = 0.0
+        self.show_stats = False
+        self.trace_file = None
+        self.profile_file = None
         self.rename_file = False
         self.no_overwrite = False
         self.interactive = False
@@ -286,6 +309,13 @@ For more help visit the wiki at: http://code.google.com/p/comictagger/
                     "assume-issue-one",
                     "cv-api-key=",
                     "only-set-cv-key",
+                    "cv-url=",
+                    "record=",
+                    "replay=",
+                    "replay-latency=",
+                    "stats",
+                    "trace=",
+                    "profile=",
                     "wait-on-cv-rate-limit",
                 ],
             )
@@ -360,6 +390,23 @@ For more help visit the wiki at: http://code.google.com/p/comictagger/
                 self.cv_api_key = a
             if o == "--only-set-cv-key":
                 self.only_set_key = True
+            if o == "--cv-url":
+                self.cv_url = a.rstrip("/")
+            if o == "--record":
+                self.record_folder = a
+            if o == "--replay":
+                self.replay_folder = a
+            if o == "--replay-latency":
+                try:
+                    self.replay_latency = float(a)
+                except ValueError:
+                    self.display_msg_and_quit("Invalid replay latency", 1)
+            if o == "--stats":
+                self.show_stats = True
+            if o == "--trace":
+                self.trace_file = a
+            if o == "--profile":
+                self.profile_file = a
             if o == "--version":
                 print("ComicTagger {0}:  Copyright (c) 2012-2014 Anthony Beville".format(ctversion.version))
                 print("Distributed under Apache License 2.0 (http://www.apache.org/licenses/LICENSE-2.0)")
@@ -418,6 +465,9 @@ For more help visit the wiki at: http://code.google.com/p/comictagger/
         if self.only_set_key and self.cv_api_key is None:
             self.display_msg_and_quit("Key not given!", 1)
 
+        if self.record_folder is not None and self.replay_folder is not None:
+            self.display_msg_and_quit("Can't record and replay at the same time", 1)
+
         if (self.only_set_key == False) and self.no_gui and (self.filename is None):
             self.display_msg_and_quit("Command requires at least one filename!", 1)
 
@@ -432,6 +482,3 @@ For more help visit the wiki at: http://code.google.com/p/comictagger/
 
         # if self.rename_file and self.data_style is None:
         #    self.display_msg_and_quit("Please specify the type to use for renaming with -t", 1)
-
-        if self.recursive:
-            self.file_list = utils.get_recursive_filelist(self.file_list)
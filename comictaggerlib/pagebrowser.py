@@ -26,6 +26,10 @@ from .settings import ComicTaggerSettings
 
 
 class PageBrowserWindow(QtWidgets.QDialog):
+
+    # pages either side of the current one to have decoded ahead of time
+    prefetch_count = 3
+
     def __init__(self, parent, metadata):
         super(PageBrowserWindow, self).__init__(parent)
 
@@ -98,10 +102,19 @@ class PageBrowserWindow(QtWidgets.QDialog):
         self.setPage()
 
     def setPage(self):
-        if self.metadata is not None:
-            archive_page_index = self.metadata.getArchivePageIndex(self.current_page_num)
-        else:
-            archive_page_index = self.current_page_num
+        archive_page_index = self.getArchivePageIndex(self.current_page_num)
 
-        self.pageWidget.setPage(archive_page_index)
+        # next pages first, since that's the usual direction of travel
+        prefetch_pages = []
+        for i in range(1, self.prefetch_count + 1):
+            prefetch_pages.append(self.getArchivePageIndex((self.current_page_num + i) % self.page_count))
+        for i in range(1, self.prefetch_count + 1):
+            prefetch_pages.append(self.getArchivePageIndex((self.current_page_num - i) % self.page_count))
+
+        self.pageWidget.setPage(archive_page_index, prefetch_pages)
         self.setWindowTitle("Page Browser - Page {0} (of {1}) ".format(self.current_page_num + 1, self.page_count))
+
+    def getArchivePageIndex(self, page_num):
+        if self.metadata is not None:
+            return self.metadata.getArchivePageIndex(page_num)
+        return page_num
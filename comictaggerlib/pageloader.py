@@ -1,4 +1,4 @@
-"""A PyQT4 class to load a page image from a ComicArchive in a background thread"""
+"""A PyQt5 service to load page images from ComicArchives in background threads"""
 
 # Copyright 2012-2014 Anthony Beville
 
@@ -14,6 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import concurrent.futures
+import os
+import sys
+import threading
+import weakref
+
 from PyQt5 import QtCore, QtGui, uic
 from PyQt5.QtCore import pyqtSignal
 
@@ -23,49 +30,133 @@ from comictaggerlib.ui.qtutils import getQImageFromData
 # import utils
 
 
-class PageLoader(QtCore.QThread):
+class PageLoader(QtCore.QObject):
 
     """
-    This class holds onto a reference of each instance in a list since
-    problems occur if the ref count goes to zero and the GC tries to reap
-    the object while the thread is going.
-    If the client class wants to stop the thread, they should mark it as
-    "abandoned", and no signals will be issued.
+    A shared service that loads page images from ComicArchives on a fixed
+    pool of worker threads and keeps the decoded images in an LRU cache
+    sized by memory.
+
+    Clients call request() with themselves as the owner.  A cached image is
+    returned right away; otherwise None is returned and pageLoaded is
+    emitted with the archive path and page number once the image is ready.
+    Asking for a new page drops the owner's interest in the pages it asked
+    for before, and anything nobody wants any more is cancelled if it
+    hasn't started yet.
+
+    Cached images are keyed on the archive's size and mtime as well as its
+    path, so once it's rewritten the old pages are no longer found.
     """
 
-    loadComplete = pyqtSignal(QtGui.QImage)
+    pageLoaded = pyqtSignal(str, int, QtGui.QImage)
+
+    # emitted from the worker threads, handled on the GUI thread
+    imageReady = pyqtSignal(object, object)
+
+    max_workers = 3
+    cache_budget = 192 * 1024 * 1024
 
-    instanceList = []
-    mutex = QtCore.QMutex()
+    _instance = None
 
-    # Remove all finished threads from the list
     @staticmethod
-    def reapInstances():
-        for obj in reversed(PageLoader.instanceList):
-            if obj.isFinished():
-                PageLoader.instanceList.remove(obj)
-
-    def __init__(self, ca, page_num):
-        QtCore.QThread.__init__(self)
-        self.ca = ca
-        self.page_num = page_num
-        self.abandoned = False
-
-        # remove any old instances, and then add ourself
-        PageLoader.mutex.lock()
-        PageLoader.reapInstances()
-        PageLoader.instanceList.append(self)
-        PageLoader.mutex.unlock()
-
-    def run(self):
-        image_data = self.ca.getPage(self.page_num)
-        if self.abandoned:
+    def instance():
+        if PageLoader._instance is None:
+            PageLoader._instance = PageLoader()
+        return PageLoader._instance
+
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+
+        self.cache = collections.OrderedDict()
+        self.cache_size = 0
+
+        # (path, size, mtime, page) -> [future, weak set of owners]
+        self.pending = dict()
+
+        # pages from the same archive are read one at a time
+        self.archive_locks = dict()
+        self.archive_locks_mutex = threading.Lock()
+
+        self.imageReady.connect(self.storeImage)
+
+    def request(self, owner, ca, page_num, prefetch_pages=()):
+        pages = [page_num] + [p for p in prefetch_pages if p != page_num]
+        stamp = self.fileStamp(ca.path)
+        keys = [(ca.path,) + stamp + (p,) for p in pages]
+
+        self.cancel(owner, keep=keys)
+
+        for key in reversed(keys):
+            if key in self.cache:
+                self.cache.move_to_end(key)
+
+        for key in keys:
+            if key not in self.cache:
+                self.submit(owner, ca, key)
+
+        return self.cache.get(keys[0])
+
+    @staticmethod
+    def fileStamp(path):
+        try:
+            st = os.stat(path)
+            return st.st_size, st.st_mtime_ns
+        except OSError:
+            return None, None
+
+    def cancel(self, owner, keep=()):
+        for key in list(self.pending):
+            if key in keep:
+                continue
+            future, owners = self.pending[key]
+            owners.discard(owner)
+            if len(owners) == 0 and future.cancel():
+                del self.pending[key]
+
+    def submit(self, owner, ca, key):
+        if key in self.pending:
+            self.pending[key][1].add(owner)
+            return
+        future = self.pool.submit(self.loadPage, ca, key)
+        self.pending[key] = [future, weakref.WeakSet([owner])]
+
+    def archiveLock(self, path):
+        with self.archive_locks_mutex:
+            lock = self.archive_locks.get(path)
+            if lock is None:
+                lock = self.archive_locks[path] = threading.Lock()
+            return lock
+
+    def loadPage(self, ca, key):
+        img = None
+        try:
+            with self.archiveLock(key[0]):
+                image_data = ca.getPage(key[-1])
+            if image_data is not None:
+                img = getQImageFromData(image_data)
+        except Exception as e:
+            print("Error loading page {0} of {1}:".format(key[-1], key[0]), e, file=sys.stderr)
+        self.imageReady.emit(key, img)
+
+    def storeImage(self, key, img):
+        self.pending.pop(key, None)
+        if img is None or img.isNull():
             return
 
-        if image_data is not None:
-            img = getQImageFromData(image_data)
+        old = self.cache.pop(key, None)
+        if old is not None:
+            self.cache_size -= self.imageSize(old)
+        self.cache[key] = img
+        self.cache_size += self.imageSize(img)
+        while self.cache_size > self.cache_budget and len(self.cache) > 1:
+            evicted_key, evicted = self.cache.popitem(last=False)
+            self.cache_size -= self.imageSize(evicted)
 
-            if self.abandoned:
-                return
+        self.pageLoaded.emit(key[0], key[-1], img)
 
-            self.loadComplete.emit(img)
+    @staticmethod
+    def imageSize(img):
+        if hasattr(img, "sizeInBytes"):
+            return img.sizeInBytes()
+        return img.byteCount()
@@ -15,14 +15,15 @@
 # limitations under the License.
 
 import os
+import sys
 
 from PyQt5 import QtCore, QtGui, QtWidgets, uic
+from PyQt5.QtCore import pyqtSignal
 
 from comictaggerlib.ui.qtutils import centerWindowOnParent
 
-from . import utils
 from .comicarchive import MetaDataStyle
-from .filerenamer import FileRenamer
+from .filerenamer import FileRenamer, RenamePlanner
 from .settings import ComicTaggerSettings
 from .settingswindow import SettingsWindow
 
@@ -50,12 +51,19 @@ class RenameWindow(QtWidgets.QDialog):
         self.renamer.setIssueZeroPadding(self.settings.rename_issue_number_padding)
         self.renamer.setSmartCleanup(self.settings.rename_use_smart_string_cleanup)
 
+    def targetFolder(self, ca):
+        folder = os.path.dirname(os.path.abspath(ca.path))
+        if self.settings.rename_move_dir and len(self.settings.rename_dir.strip()) > 3:
+            folder = self.settings.rename_dir.strip()
+        return folder
+
     def doPreview(self):
         self.rename_list = []
-        while self.twList.rowCount() > 0:
-            self.twList.removeRow(0)
-
         self.twList.setSortingEnabled(False)
+        self.twList.setRowCount(0)
+
+        planner = RenamePlanner()
+        self.renamer.move = self.settings.rename_move_dir
 
         for ca in self.comic_archive_list:
 
@@ -70,7 +78,6 @@ class RenameWindow(QtWidgets.QDialog):
             if md.isEmpty:
                 md = ca.metadataFromFilename(self.settings.parse_scan_info)
             self.renamer.setMetadata(md)
-            self.renamer.move = self.settings.rename_move_dir
 
             try:
                 new_name = self.renamer.determineName(ca.path, ext=new_ext)
@@ -87,8 +94,24 @@ class RenameWindow(QtWidgets.QDialog):
                 )
                 return
 
-            row = self.twList.rowCount()
-            self.twList.insertRow(row)
+            # show the name the file will really get, after any clashes
+            # with existing files or other files in this batch
+            folder = self.targetFolder(ca)
+            new_path = planner.plan(ca.path, os.path.join(folder, new_name))
+            if new_path is not None:
+                new_name = os.path.relpath(new_path, folder)
+
+            dict_item = dict()
+            dict_item["archive"] = ca
+            dict_item["new_name"] = new_name
+            dict_item["new_path"] = new_path
+            self.rename_list.append(dict_item)
+
+        self.twList.setRowCount(len(self.rename_list))
+        for row, dict_item in enumerate(self.rename_list):
+            ca = dict_item["archive"]
+            new_name = dict_item["new_name"]
+
             folder_item = QtWidgets.QTableWidgetItem()
             old_name_item = QtWidgets.QTableWidgetItem()
             new_name_item = QtWidgets.QTableWidgetItem()
@@ -110,11 +133,6 @@ class RenameWindow(QtWidgets.QDialog):
             new_name_item.setText(new_name)
             new_name_item.setData(QtCore.Qt.ToolTipRole, new_name)
 
-            dict_item = dict()
-            dict_item["archive"] = ca
-            dict_item["new_name"] = new_name
-            self.rename_list.append(dict_item)
-
         # Adjust column sizes
         self.twList.setVisible(False)
         self.twList.resizeColumnsToContents()
@@ -140,39 +158,62 @@ class RenameWindow(QtWidgets.QDialog):
         progdialog.setWindowModality(QtCore.Qt.WindowModal)
         progdialog.setMinimumDuration(100)
         centerWindowOnParent(progdialog)
-        # progdialog.show()
+
+        def renameProgress(idx, new_abs_path):
+            item = self.rename_list[idx]
+            if new_abs_path:
+                item["archive"].rename(new_abs_path)
+            progdialog.setValue(idx + 1)
+            progdialog.setLabelText(item["new_name"])
+
+        # the renames happen on a worker thread; wait for it here so the
+        # dialog keeps repainting
+        thread = RenameThread(self.rename_list)
+        thread.renameProgress.connect(renameProgress)
+        progdialog.canceled.connect(thread.abandon)
+
+        loop = QtCore.QEventLoop()
+        thread.finished.connect(loop.quit)
+        thread.start()
+        loop.exec_()
+        thread.wait()
+
+        progdialog.hide()
         QtCore.QCoreApplication.processEvents()
 
-        for idx, item in enumerate(self.rename_list):
+        QtWidgets.QDialog.accept(self)
 
-            QtCore.QCoreApplication.processEvents()
-            if progdialog.wasCanceled():
-                break
-            idx += 1
-            progdialog.setValue(idx)
-            progdialog.setLabelText(item["new_name"])
-            centerWindowOnParent(progdialog)
-            QtCore.QCoreApplication.processEvents()
 
-            folder = os.path.dirname(os.path.abspath(item["archive"].path))
-            if self.settings.rename_move_dir and len(self.settings.rename_dir.strip()) > 3:
-                folder = self.settings.rename_dir.strip()
+class RenameThread(QtCore.QThread):
 
-            new_abs_path = utils.unique_file(os.path.join(folder, item["new_name"]))
+    """
+    Carries out a planned batch rename.  renameProgress is emitted with
+    the index of each item and its new path, or an empty string if it
+    wasn't renamed; the ComicArchive is left for the receiver to update.
+    """
 
-            if os.path.join(folder, item["new_name"]) == item["archive"].path:
-                print(item["new_name"], "Filename is already good!")
-                continue
+    renameProgress = pyqtSignal(int, str)
 
-            if not item["archive"].isWritable(check_rar_status=False):
-                continue
+    def __init__(self, rename_list):
+        QtCore.QThread.__init__(self)
+        self.rename_list = rename_list
+        self.abandoned = False
 
-            os.makedirs(os.path.dirname(new_abs_path), 0o777, True)
-            os.rename(item["archive"].path, new_abs_path)
+    def abandon(self):
+        self.abandoned = True
 
-            item["archive"].rename(new_abs_path)
+    def run(self):
+        for idx, item in enumerate(self.rename_list):
+            if self.abandoned:
+                break
 
-        progdialog.hide()
-        QtCore.QCoreApplication.processEvents()
+            new_abs_path = ""
+            if item["new_path"] is None:
+                print(item["new_name"], "Filename is already good!")
+            elif item["archive"].isWritable(check_rar_status=False):
+                try:
+                    new_abs_path = RenamePlanner.apply(item["archive"].path, item["new_path"])
+                except OSError as e:
+                    print("Couldn't rename {0}:".format(item["archive"].path), e, file=sys.stderr)
 
-        QtWidgets.QDialog.accept(self)
+            self.renameProgress.emit(idx, new_abs_path)
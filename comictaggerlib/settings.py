@@ -121,6 +121,7 @@ class ComicTaggerSettings:
         self.ignore_leading_numbers_in_filename = False
         self.remove_archive_after_successful_match = False
         self.wait_and_retry_on_rate_limit = False
+        self.autotag_workers = 2
 
     def __init__(self):
 
@@ -277,6 +278,8 @@ class ComicTaggerSettings:
             self.wait_and_retry_on_rate_limit = self.config.getboolean("autotag", "wait_and_retry_on_rate_limit")
         if self.config.has_option("autotag", "auto_imprint"):
             self.auto_imprint = self.config.getboolean("autotag", "auto_imprint")
+        if self.config.has_option("autotag", "autotag_workers"):
+            self.autotag_workers = self.config.getint("autotag", "autotag_workers")
 
     def save(self):
 
@@ -362,6 +365,7 @@ class ComicTaggerSettings:
         self.config.set("autotag", "remove_archive_after_successful_match", self.remove_archive_after_successful_match)
         self.config.set("autotag", "wait_and_retry_on_rate_limit", self.wait_and_retry_on_rate_limit)
         self.config.set("autotag", "auto_imprint", self.auto_imprint)
+        self.config.set("autotag", "autotag_workers", self.autotag_workers)
 
         with codecs.open(self.settings_file, "wb", "utf8") as configfile:
             self.config.write(configfile)
@@ -0,0 +1 @@
+from comicapi.stats import *
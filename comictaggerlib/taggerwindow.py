@@ -23,7 +23,6 @@ import os
 import pickle
 import platform
 import pprint
-import re
 import sys
 import webbrowser
 
@@ -36,12 +35,14 @@ from . import ctversion, utils
 from .autotagmatchwindow import AutoTagMatchWindow
 from .autotagprogresswindow import AutoTagProgressWindow
 from .autotagstartwindow import AutoTagStartWindow
+from .autotagthread import AutoTagThread
 from .cbltransformer import CBLTransformer
 from .comicarchive import MetaDataStyle
 from .comicinfoxml import ComicInfoXml
 from .comicvinetalker import ComicVineTalker, ComicVineTalkerException
 from .coverimagewidget import CoverImageWidget
 from .crediteditorwindow import CreditEditorWindow
+from .exportthread import ExportThread, unique_export_name
 from .exportwindow import ExportConflictOpts, ExportWindow
 from .filenameparser import FileNameParser
 from .fileselectionlist import FileSelectionList
@@ -64,22 +65,6 @@ from .volumeselectionwindow import VolumeSelectionWindow
 # import signal
 
 
-class OnlineMatchResults:
-    def __init__(self):
-        self.goodMatches = []
-        self.noMatches = []
-        self.multipleMatches = []
-        self.lowConfidenceMatches = []
-        self.writeFailures = []
-        self.fetchDataFailures = []
-
-
-class MultipleMatch:
-    def __init__(self, ca, match_list):
-        self.ca = ca
-        self.matches = match_list
-
-
 class TaggerWindow(QtWidgets.QMainWindow):
 
     appName = "ComicTagger"
@@ -454,55 +439,78 @@ class TaggerWindow(QtWidgets.QMainWindow):
             progdialog.setMinimumDuration(300)
             centerWindowOnParent(progdialog)
             QtCore.QCoreApplication.processEvents()
-            prog_idx = 0
 
-            new_archives_to_add = []
-            archives_to_remove = []
             skipped_list = []
             failed_list = []
             success_count = 0
 
+            # settle all the export names up front, since the exports run at
+            # the same time and can't see each other's output
+            jobs = []
+            job_archives = []
+            planned = set()
             for ca in ca_list:
                 if ca.isRar():
-                    QtCore.QCoreApplication.processEvents()
-                    if progdialog.wasCanceled():
-                        break
-                    prog_idx += 1
-                    progdialog.setValue(prog_idx)
-                    progdialog.setLabelText(ca.path)
-                    centerWindowOnParent(progdialog)
-                    QtCore.QCoreApplication.processEvents()
-
                     original_path = os.path.abspath(ca.path)
                     export_name = os.path.splitext(original_path)[0] + ".cbz"
 
-                    if os.path.lexists(export_name):
+                    if os.path.lexists(export_name) or export_name in planned:
                         if dlg.fileConflictBehavior == ExportConflictOpts.dontCreate:
                             export_name = None
                             skipped_list.append(ca.path)
                         elif dlg.fileConflictBehavior == ExportConflictOpts.createUnique:
-                            export_name = utils.unique_file(export_name)
+                            export_name = unique_export_name(export_name, planned)
+                        elif export_name in planned:
+                            # two archives in this batch would overwrite
+                            # the same file; only the first one gets it
+                            export_name = None
+                            skipped_list.append(ca.path)
 
                     if export_name is not None:
-                        if ca.exportAsZip(export_name):
-                            success_count += 1
-                            if dlg.addToList:
-                                new_archives_to_add.append(export_name)
-                            if dlg.deleteOriginal:
-                                archives_to_remove.append(ca)
-                                os.unlink(ca.path)
+                        planned.add(export_name)
+                        jobs.append((ca.path, export_name))
+                        job_archives.append(ca)
+
+            prog_idx = len(skipped_list)
+            progdialog.setValue(prog_idx)
+            added_any = False
+
+            def archiveExported(i, success):
+                nonlocal prog_idx, success_count, added_any
+                ca = job_archives[i]
+                export_name = jobs[i][1]
+
+                prog_idx += 1
+                progdialog.setValue(prog_idx)
+                progdialog.setLabelText(ca.path)
+
+                if success:
+                    success_count += 1
+                    if dlg.addToList:
+                        self.fileSelectionList.addPathItem(export_name)
+                        added_any = True
+                    if dlg.deleteOriginal:
+                        os.unlink(ca.path)
+                        self.fileSelectionList.removeArchiveList([ca])
+                else:
+                    failed_list.append(ca.path)
+                    if os.path.lexists(export_name):
+                        os.remove(export_name)
 
-                        else:
-                            # last export failed, so remove the zip, if it
-                            # exists
-                            failed_list.append(ca.path)
-                            if os.path.lexists(export_name):
-                                os.remove(export_name)
+            thread = ExportThread(jobs, self.settings.rar_exe_path, ComicTaggerSettings.getGraphic("nocover.png"))
+            thread.archiveExported.connect(archiveExported)
+            progdialog.canceled.connect(thread.abandon)
+
+            loop = QtCore.QEventLoop()
+            thread.finished.connect(loop.quit)
+            thread.start()
+            loop.exec_()
+            thread.wait()
 
             progdialog.hide()
             QtCore.QCoreApplication.processEvents()
-            self.fileSelectionList.addPathList(new_archives_to_add)
-            self.fileSelectionList.removeArchiveList(archives_to_remove)
+            if added_any:
+                self.fileSelectionList.resort()
 
             summary = "Successfully created {0} Zip archive(s).".format(success_count)
             if len(skipped_list) > 0:
@@ -1058,8 +1066,12 @@ class TaggerWindow(QtWidgets.QMainWindow):
                 QtWidgets.QApplication.setOverrideCursor(QtGui.QCursor(QtCore.Qt.WaitCursor))
                 self.formToMetadata()
 
-                success = self.comic_archive.writeMetadata(self.metadata, self.save_data_style)
-                self.comic_archive.loadCache([MetaDataStyle.CBI, MetaDataStyle.CIX])
+                if self.comic_archive.tagsUnchanged(self.metadata, self.save_data_style):
+                    # the archive already has these tags
+                    success = True
+                else:
+                    success = self.comic_archive.writeMetadata(self.metadata, self.save_data_style)
+                    self.comic_archive.loadCache([MetaDataStyle.CBI, MetaDataStyle.CIX])
                 QtWidgets.QApplication.restoreOverrideCursor()
 
                 if not success:
@@ -1638,107 +1650,14 @@ class TaggerWindow(QtWidgets.QMainWindow):
     def autoTagLog(self, text):
         IssueIdentifier.defaultWriteOutput(text)
         if self.atprogdialog is not None:
+            self.atprogdialog.textEdit.moveCursor(QtGui.QTextCursor.End)
             self.atprogdialog.textEdit.insertPlainText(text)
             self.atprogdialog.textEdit.ensureCursorVisible()
-            QtCore.QCoreApplication.processEvents()
-            QtCore.QCoreApplication.processEvents()
-            QtCore.QCoreApplication.processEvents()
-
-    def identifyAndTagSingleArchive(self, ca, match_results, dlg):
-        success = False
-        ii = IssueIdentifier(ca, self.settings)
-
-        # read in metadata, and parse file name if not there
-        md = ca.readMetadata(self.save_data_style)
-        if md.isEmpty:
-            md = ca.metadataFromFilename(self.settings.parse_scan_info)
-            if dlg.ignoreLeadingDigitsInFilename and md.series is not None:
-                # remove all leading numbers
-                md.series = re.sub("([\d.]*)(.*)", "\\2", md.series)
-
-        # use the dialog specified search string
-        if dlg.searchString is not None:
-            md.series = dlg.searchString
-
-        if md is None or md.isEmpty:
-            print("No metadata given to search online with!")
-            return False, match_results
-
-        if dlg.dontUseYear:
-            md.year = None
-        if dlg.assumeIssueOne and (md.issue is None or md.issue == ""):
-            md.issue = "1"
-        ii.setAdditionalMetadata(md)
-        ii.onlyUseAdditionalMetaData = True
-        ii.waitAndRetryOnRateLimit = dlg.waitAndRetryOnRateLimit
-        ii.setOutputFunction(self.autoTagLog)
-        ii.cover_page_index = md.getCoverPageIndexList()[0]
-        ii.setCoverURLCallback(self.atprogdialog.setTestImage)
-        ii.setNameLengthDeltaThreshold(dlg.nameLengthMatchTolerance)
-
-        matches = ii.search()
-
-        result = ii.search_result
-
-        found_match = False
-        choices = False
-        low_confidence = False
-        no_match = False
-
-        if result == ii.ResultNoMatches:
-            pass
-        elif result == ii.ResultFoundMatchButBadCoverScore:
-            low_confidence = True
-            found_match = True
-        elif result == ii.ResultFoundMatchButNotFirstPage:
-            found_match = True
-        elif result == ii.ResultMultipleMatchesWithBadImageScores:
-            low_confidence = True
-            choices = True
-        elif result == ii.ResultOneGoodMatch:
-            found_match = True
-        elif result == ii.ResultMultipleGoodMatches:
-            choices = True
-
-        if choices:
-            if low_confidence:
-                self.autoTagLog("Online search: Multiple low-confidence matches.  Save aborted\n")
-                match_results.lowConfidenceMatches.append(MultipleMatch(ca, matches))
-            else:
-                self.autoTagLog("Online search: Multiple matches.  Save aborted\n")
-                match_results.multipleMatches.append(MultipleMatch(ca, matches))
-        elif low_confidence and not dlg.autoSaveOnLow:
-            self.autoTagLog("Online search: Low confidence match.  Save aborted\n")
-            match_results.lowConfidenceMatches.append(MultipleMatch(ca, matches))
-        elif not found_match:
-            self.autoTagLog("Online search: No match found.  Save aborted\n")
-            match_results.noMatches.append(ca.path)
-        else:
-            #  a single match!
-            if low_confidence:
-                self.autoTagLog("Online search: Low confidence match, but saving anyways, as indicated...\n")
 
-            # now get the particular issue data
-            cv_md = self.actualIssueDataFetch(matches[0])
-            if cv_md is None:
-                match_results.fetchDataFailures.append(ca.path)
-
-            if cv_md is not None:
-                md.overlay(cv_md)
-
-                if self.settings.auto_imprint:
-                    md.fixPublisher()
-
-                if not ca.writeMetadata(md, self.save_data_style):
-                    match_results.writeFailures.append(ca.path)
-                    self.autoTagLog("Save failed ;-(\n")
-                else:
-                    match_results.goodMatches.append(ca.path)
-                    success = True
-                    self.autoTagLog("Save complete!\n")
-                ca.loadCache([MetaDataStyle.CBI, MetaDataStyle.CIX])
-
-        return success, match_results
+    def autoTagProgress(self, done, total, path):
+        if self.atprogdialog is not None:
+            self.atprogdialog.progressBar.setValue(done)
+            self.atprogdialog.label.setText(path)
 
     def autoTag(self):
         ca_list = self.fileSelectionList.getSelectedArchiveList()
@@ -1776,33 +1695,23 @@ class TaggerWindow(QtWidgets.QMainWindow):
         self.autoTagLog("==========================================================================\n")
         self.autoTagLog("Auto-Tagging Started for {0} items\n".format(len(ca_list)))
 
-        prog_idx = 0
-
-        match_results = OnlineMatchResults()
-        archives_to_remove = []
-        for ca in ca_list:
-            self.autoTagLog("==========================================================================\n")
-            self.autoTagLog("Auto-Tagging {0} of {1}\n".format(prog_idx + 1, len(ca_list)))
-            self.autoTagLog("{0}\n".format(ca.path))
-            cover_idx = ca.readMetadata(style).getCoverPageIndexList()[0]
-            image_data = ca.getPage(cover_idx)
-            self.atprogdialog.setArchiveImage(image_data)
-            self.atprogdialog.setTestImage(None)
-
-            QtCore.QCoreApplication.processEvents()
-            if self.atprogdialog.isdone:
-                break
-            self.atprogdialog.progressBar.setValue(prog_idx)
-            prog_idx += 1
-            self.atprogdialog.label.setText(ca.path)
-            centerWindowOnParent(self.atprogdialog)
-            QtCore.QCoreApplication.processEvents()
-
-            if ca.isWritable():
-                success, match_results = self.identifyAndTagSingleArchive(ca, match_results, atstartdlg)
-
-                if success and atstartdlg.removeAfterSuccess:
-                    archives_to_remove.append(ca)
+        # the archives are identified on a pool of worker threads; wait for
+        # them in a local event loop so the window keeps repainting
+        thread = AutoTagThread(ca_list, self.settings, style, atstartdlg)
+        thread.logMsg.connect(self.autoTagLog)
+        thread.archiveImage.connect(self.atprogdialog.setArchiveImage)
+        thread.testImage.connect(self.atprogdialog.setTestImage)
+        thread.progressUpdate.connect(self.autoTagProgress)
+        self.atprogdialog.rejected.connect(thread.abandon)
+
+        loop = QtCore.QEventLoop()
+        thread.finished.connect(loop.quit)
+        thread.start()
+        loop.exec_()
+        thread.wait()
+
+        match_results = thread.match_results
+        archives_to_remove = thread.archives_to_remove
 
         self.atprogdialog.close()
 
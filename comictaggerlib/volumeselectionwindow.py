@@ -18,7 +18,7 @@
 # import time
 # import os
 
-from PyQt5 import QtCore, QtGui, QtWidgets, uic
+from PyQt5 import QtCore, QtGui, QtWidgets, sip, uic
 from PyQt5.QtCore import QUrl, pyqtSignal
 
 from comictaggerlib.ui.qtutils import centerWindowOnParent, reduceWidgetFontSize
@@ -42,7 +42,14 @@ from .settings import ComicTaggerSettings
 
 class SearchThread(QtCore.QThread):
 
+    """
+    Emits searchResults once per page of results, in relevance order, so
+    they can be shown while later pages are still being fetched.  Calling
+    stop() halts the search after the page in flight.
+    """
+
     searchComplete = pyqtSignal()
+    searchResults = pyqtSignal(list)
     progressUpdate = pyqtSignal(int, int)
 
     def __init__(self, series_name, refresh, literal=False):
@@ -51,15 +58,23 @@ class SearchThread(QtCore.QThread):
         self.refresh = refresh
         self.error_code = None
         self.literal = literal
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
 
     def run(self):
         comicVine = ComicVineTalker()
         try:
             self.cv_error = False
             if self.literal:
-                self.cv_search_results = comicVine.literalSearchForSeries(self.series_name, callback=self.prog_callback)
+                self.cv_search_results = comicVine.literalSearchForSeries(
+                    self.series_name, callback=self.prog_callback, page_callback=self.page_callback
+                )
             else:
-                self.cv_search_results = comicVine.searchForSeries(self.series_name, callback=self.prog_callback, refresh_cache=self.refresh)
+                self.cv_search_results = comicVine.searchForSeries(
+                    self.series_name, callback=self.prog_callback, refresh_cache=self.refresh, page_callback=self.page_callback
+                )
         except ComicVineTalkerException as e:
             self.cv_search_results = []
             self.cv_error = True
@@ -71,6 +86,11 @@ class SearchThread(QtCore.QThread):
     def prog_callback(self, current, total):
         self.progressUpdate.emit(current, total)
 
+    def page_callback(self, results):
+        if not self.stopped and len(results) > 0:
+            self.searchResults.emit(results)
+        return self.stopped
+
 
 class IdentifyThread(QtCore.QThread):
 
@@ -124,6 +144,7 @@ class VolumeSelectionWindow(QtWidgets.QDialog):
         self.immediate_autoselect = autoselect
         self.cover_index_list = cover_index_list
         self.cv_search_results = None
+        self.search_thread = None
         self.literal = literal
 
         self.twList.resizeColumnsToContents()
@@ -132,10 +153,10 @@ class VolumeSelectionWindow(QtWidgets.QDialog):
         self.btnRequery.clicked.connect(self.requery)
         self.btnIssues.clicked.connect(self.showIssues)
         self.btnAutoSelect.clicked.connect(self.autoSelect)
+        self.btnStop.clicked.connect(self.stopSearch)
 
         self.updateButtons()
         self.performQuery()
-        self.twList.selectRow(0)
 
     def updateButtons(self):
         if self.cv_search_results is not None and len(self.cv_search_results) > 0:
@@ -143,14 +164,17 @@ class VolumeSelectionWindow(QtWidgets.QDialog):
         else:
             enabled = False
 
-        self.btnRequery.setEnabled(enabled)
+        searching = self.search_thread is not None
+        self.btnStop.setVisible(searching)
+        self.progressBar.setVisible(searching)
+
+        self.btnRequery.setEnabled(enabled and not searching)
         self.btnIssues.setEnabled(enabled)
         self.btnAutoSelect.setEnabled(enabled)
         self.buttonBox.button(QtWidgets.QDialogButtonBox.Ok).setEnabled(enabled)
 
     def requery(self,):
         self.performQuery(refresh=True)
-        self.twList.selectRow(0)
 
     def autoSelect(self):
 
@@ -272,99 +296,116 @@ class VolumeSelectionWindow(QtWidgets.QDialog):
 
     def performQuery(self, refresh=False):
 
-        self.progdialog = QtWidgets.QProgressDialog("Searching Online", "Cancel", 0, 100, self)
-        self.progdialog.setWindowTitle("Online Search")
-        self.progdialog.canceled.connect(self.searchCanceled)
-        self.progdialog.setModal(True)
-        self.progdialog.setMinimumDuration(300)
-        QtCore.QCoreApplication.processEvents()
+        self.cv_search_results = []
+        self.twList.setSortingEnabled(False)
+        self.twList.setRowCount(0)
+
+        self.progressBar.setMaximum(0)
+        self.progressBar.setValue(0)
+
         self.search_thread = SearchThread(self.series_name, refresh, self.literal)
+        self.search_thread.searchResults.connect(self.searchResults)
         self.search_thread.searchComplete.connect(self.searchComplete)
         self.search_thread.progressUpdate.connect(self.searchProgressUpdate)
+        self.updateButtons()
         self.search_thread.start()
-        self.progdialog.exec_()
 
-    def searchCanceled(self):
-        print("query cancelled")
-        self.search_thread.searchComplete.disconnect(self.searchComplete)
-        self.search_thread.progressUpdate.disconnect(self.searchProgressUpdate)
-        self.progdialog.canceled.disconnect(self.searchCanceled)
-        self.progdialog.reject()
-        QtCore.QTimer.singleShot(200, self.closeMe)
-
-    def closeMe(self):
-        print("closeme")
-        self.reject()
+    def stopSearch(self):
+        if self.search_thread is not None:
+            self.search_thread.stop()
+            self.btnStop.setEnabled(False)
+
+    def done(self, result):
+        # don't leave a search running once the dialog is gone, but don't
+        # wait on the request in flight either; the thread stops after it,
+        # and deletes itself once it's finished
+        if self.search_thread is not None:
+            search_thread = self.search_thread
+            self.search_thread = None
+            search_thread.stop()
+            search_thread.searchResults.disconnect(self.searchResults)
+            search_thread.searchComplete.disconnect(self.searchComplete)
+            search_thread.progressUpdate.disconnect(self.searchProgressUpdate)
+            if not search_thread.isFinished():
+                search_thread.finished.connect(search_thread.deleteLater)
+                sip.transferto(search_thread, None)
+        super(VolumeSelectionWindow, self).done(result)
 
     def searchProgressUpdate(self, current, total):
-        self.progdialog.setMaximum(total)
-        self.progdialog.setValue(current + 1)
-
-    def searchComplete(self):
-        self.progdialog.accept()
-        del self.progdialog
-        QtCore.QCoreApplication.processEvents()
-        if self.search_thread.cv_error:
-            if self.search_thread.error_code == ComicVineTalkerException.RateLimit:
-                QtWidgets.QMessageBox.critical(self, self.tr("Comic Vine Error"), ComicVineTalker.getRateLimitMessage())
-            else:
-                QtWidgets.QMessageBox.critical(self, self.tr("Network Issue"), self.tr("Could not connect to Comic Vine to search for series!"))
-            return
+        self.progressBar.setMaximum(total)
+        self.progressBar.setValue(min(current, total))
 
-        self.cv_search_results = self.search_thread.cv_search_results
-        self.updateButtons()
-
-        self.twList.setSortingEnabled(False)
+    def searchResults(self, results):
+        self.cv_search_results.extend(results)
 
-        while self.twList.rowCount() > 0:
-            self.twList.removeRow(0)
-
-        row = 0
-        for record in self.cv_search_results:
-            self.twList.insertRow(row)
+        row = self.twList.rowCount()
+        self.twList.setRowCount(row + len(results))
+        for record in results:
+            self.setRecordRow(row, record)
+            row += 1
 
-            item_text = record["name"]
-            item = QtWidgets.QTableWidgetItem(item_text)
-            item.setData(QtCore.Qt.ToolTipRole, item_text)
-            item.setData(QtCore.Qt.UserRole, record["id"])
-            item.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
-            self.twList.setItem(row, 0, item)
+        self.twList.resizeColumnsToContents()
+        if self.twList.currentRow() < 0:
+            self.twList.selectRow(0)
+        self.updateButtons()
 
-            item_text = str(record["start_year"])
-            item = QtWidgets.QTableWidgetItem(item_text)
+    def setRecordRow(self, row, record):
+        item_text = record["name"]
+        item = QtWidgets.QTableWidgetItem(item_text)
+        item.setData(QtCore.Qt.ToolTipRole, item_text)
+        item.setData(QtCore.Qt.UserRole, record["id"])
+        item.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
+        self.twList.setItem(row, 0, item)
+
+        item_text = str(record["start_year"])
+        item = QtWidgets.QTableWidgetItem(item_text)
+        item.setData(QtCore.Qt.ToolTipRole, item_text)
+        item.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
+        self.twList.setItem(row, 1, item)
+
+        item_text = record["count_of_issues"]
+        item = QtWidgets.QTableWidgetItem(item_text)
+        item.setData(QtCore.Qt.ToolTipRole, item_text)
+        item.setData(QtCore.Qt.DisplayRole, record["count_of_issues"])
+        item.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
+        self.twList.setItem(row, 2, item)
+
+        if record["publisher"] is not None:
+            item_text = record["publisher"]["name"]
             item.setData(QtCore.Qt.ToolTipRole, item_text)
-            item.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
-            self.twList.setItem(row, 1, item)
-
-            item_text = record["count_of_issues"]
             item = QtWidgets.QTableWidgetItem(item_text)
-            item.setData(QtCore.Qt.ToolTipRole, item_text)
-            item.setData(QtCore.Qt.DisplayRole, record["count_of_issues"])
             item.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
-            self.twList.setItem(row, 2, item)
+            self.twList.setItem(row, 3, item)
 
-            if record["publisher"] is not None:
-                item_text = record["publisher"]["name"]
-                item.setData(QtCore.Qt.ToolTipRole, item_text)
-                item = QtWidgets.QTableWidgetItem(item_text)
-                item.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
-                self.twList.setItem(row, 3, item)
+    def searchComplete(self):
+        # may have been queued before done() stopped the search
+        if self.search_thread is None:
+            return
+        search_thread = self.search_thread
+        search_thread.wait()
+        self.search_thread = None
+        self.btnStop.setEnabled(True)
+        self.updateButtons()
 
-            row += 1
+        if search_thread.cv_error:
+            if search_thread.error_code == ComicVineTalkerException.RateLimit:
+                QtWidgets.QMessageBox.critical(self, self.tr("Comic Vine Error"), ComicVineTalker.getRateLimitMessage())
+            else:
+                QtWidgets.QMessageBox.critical(self, self.tr("Network Issue"), self.tr("Could not connect to Comic Vine to search for series!"))
+            return
 
-        self.twList.resizeColumnsToContents()
+        # rows went in by relevance as they arrived; now that they're all
+        # here, sort by issue count as before and keep the selection
         self.twList.setSortingEnabled(True)
         self.twList.sortItems(2, QtCore.Qt.DescendingOrder)
-        self.twList.selectRow(0)
+        self.selectByID()
         self.twList.resizeColumnsToContents()
 
         if len(self.cv_search_results) == 0:
-            QtCore.QCoreApplication.processEvents()
             QtWidgets.QMessageBox.information(self, "Search Result", "No matches found!")
 
         if self.immediate_autoselect and len(self.cv_search_results) > 0:
             # defer the immediate autoselect so this dialog has time to pop up
-            QtCore.QCoreApplication.processEvents()
             QtCore.QTimer.singleShot(10, self.doImmediateAutoselect)
 
     def doImmediateAutoselect(self):